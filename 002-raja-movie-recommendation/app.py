@@ -1,13 +1,24 @@
+import math
+import os
+import re
+import time
+import uuid
 import streamlit as st
 import pandas as pd
 from datetime import datetime, timedelta
+from typing import Optional
+from background_jobs import JobRunner
+from exporter import EXPORT_FORMATS, export_recommendations, format_for_file
 from movie_agent import MovieRecommendationAgent
+from recommendation_store import get_recommendation_store
 from utils import (
     load_recommendations, save_recommendations, 
-    format_movie_for_display, get_genre_for_date, get_stats,
-    export_recommendations_csv
+    format_movie_for_display, get_genre_for_date, get_stats
+)
+from config import (
+    MOVIE_GENRES, JOB_POLL_SECONDS, HISTORY_PAGE_DAYS, HISTORY_CACHED_PAGES, HISTORY_SEARCH_LIMIT,
+    EXPORT_DIR
 )
-from config import MOVIE_GENRES
 
 
 # Page configuration
@@ -49,9 +60,123 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 
+@st.cache_resource
+def get_shared_agent() -> MovieRecommendationAgent:
+    """One agent (LLM client, searcher, compiled graph) for every session."""
+    return MovieRecommendationAgent()
+
+
+@st.cache_resource
+def get_job_runner() -> JobRunner:
+    """Process-wide background job runner shared by every session."""
+    return JobRunner()
+
+
+@st.cache_data(max_entries=HISTORY_CACHED_PAGES, show_spinner=False)
+def load_history_page(page: int, genre: Optional[str], start: Optional[str], end: Optional[str],
+                      revision: int) -> pd.DataFrame:
+    """One page of history as a table; revision changes with every store write."""
+    rows = []
+    for day in get_recommendation_store().iter_range(
+        start, end, descending=True, limit=HISTORY_PAGE_DAYS,
+        offset=page * HISTORY_PAGE_DAYS, genre=genre
+    ):
+        day_genre = day['genre'] or get_genre_for_date(datetime.strptime(day['date'], "%Y-%m-%d"))
+        for movie in day['recommendations']:
+            youtube_data = movie.get('youtube_data') or {}
+            rows.append({
+                'Date': day['date'],
+                'Title': movie.get('title', ''),
+                'Year': movie.get('year', ''),
+                'Genre': day_genre,
+                'Available on YouTube': '✅' if youtube_data else '❌',
+                'Duration': youtube_data.get('duration', 'N/A')
+            })
+    return pd.DataFrame(rows)
+
+
+EXPORT_REVISION = re.compile(r"_r(\d+)\.\w+$")
+
+
+def prepare_export(fmt: str, start: Optional[str], end: Optional[str], revision: int) -> str:
+    """Stream an export to disk once per store revision and return its path."""
+    extension = EXPORT_FORMATS[fmt][0]
+    export_file = os.path.join(
+        EXPORT_DIR, f"recommendations_{start or 'all'}_{end or 'all'}_r{revision}{extension}"
+    )
+    if os.path.exists(export_file):
+        return export_file
+    
+    if not os.path.exists(EXPORT_DIR):
+        os.makedirs(EXPORT_DIR)
+    # Earlier revisions are stale once the store changes; other ranges and formats of
+    # this revision may still be waiting for another session's download
+    for name in os.listdir(EXPORT_DIR):
+        match = EXPORT_REVISION.search(name)
+        if name.startswith("recommendations_") and match and int(match.group(1)) < revision:
+            try:
+                os.remove(os.path.join(EXPORT_DIR, name))
+            except FileNotFoundError:
+                pass  # Another session cleaned it up first
+    
+    # Stream to a private file and rename it into place, so a partial export is never
+    # mistaken for a finished one by this or another session
+    temp_file = f"{export_file}.{uuid.uuid4().hex}.tmp"
+    try:
+        export_recommendations(temp_file, fmt, start, end)
+        os.replace(temp_file, export_file)
+    except Exception:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        raise
+    return export_file
+
+
 class StreamlitMovieApp:
     def __init__(self):
-        self.agent = MovieRecommendationAgent()
+        self.agent = get_shared_agent()
+        self.jobs = get_job_runner()
+    
+    @staticmethod
+    def daily_job_key(date_str: str) -> tuple:
+        """Job key for a date's daily generation, shared by submitters and the status view."""
+        return ("daily", date_str, get_genre_for_date(datetime.strptime(date_str, "%Y-%m-%d")))
+    
+    def generate_daily_job(self, date_str: str):
+        """Submit (or join) the daily generation job for a date."""
+        def run():
+            recommendations = self.agent.get_daily_recommendations(date_str)
+            save_recommendations(recommendations, date_str)
+            return recommendations
+        
+        return self.jobs.submit(self.daily_job_key(date_str), run)
+    
+    def generate_genre_job(self, genre: str):
+        """Submit (or join) a genre recommendation job for today."""
+        date_str = datetime.now().strftime("%Y-%m-%d")
+        return self.jobs.submit(
+            ("genre", date_str, genre),
+            lambda: self.agent.get_genre_recommendations(genre)
+        )
+    
+    def render_job_status(self, job, label: str) -> bool:
+        """Show a running job's status and schedule a refresh; True while it runs."""
+        if job is None:
+            return False
+        
+        if job.running:
+            st.info(f"⏳ {label} in progress ({job.elapsed:.0f}s). This page refreshes automatically.")
+            return True
+        
+        if job.status == "failed":
+            st.error(f"Error generating recommendations: {job.error}")
+        
+        return False
+    
+    def poll_running_job(self):
+        """Rerun shortly so a running job's result appears without a click."""
+        time.sleep(JOB_POLL_SECONDS)
+        st.rerun()
     
     def render_movie_card(self, movie, index):
         """Render a movie recommendation card."""
@@ -106,24 +231,27 @@ class StreamlitMovieApp:
                 help="Choose a date to view recommendations"
             )
         
+        date_str = selected_date.strftime("%Y-%m-%d")
+        job_key = self.daily_job_key(date_str)
+        
         with col2:
             if st.button("🎲 Generate New", help="Generate new recommendations for selected date"):
-                with st.spinner("Generating recommendations..."):
-                    try:
-                        date_str = selected_date.strftime("%Y-%m-%d")
-                        recommendations = self.agent.get_daily_recommendations()
-                        save_recommendations(recommendations, date_str)
-                        st.success(f"Generated {len(recommendations)} new recommendations!")
-                        st.rerun()
-                    except Exception as e:
-                        st.error(f"Error generating recommendations: {str(e)}")
+                # Joins the running job if another user already started this one
+                job = self.generate_daily_job(date_str)
+                st.session_state.daily_job_key = job.key
         
         with col3:
             if st.button("📊 Show Stats"):
                 st.session_state.show_stats = True
         
+        job = self.jobs.get(job_key)
+        job_running = self.render_job_status(job, f"Generating recommendations for {selected_date}")
+        if (job is not None and job.status == "done"
+                and st.session_state.get('daily_job_key') == job_key):
+            st.success(f"Generated {len(job.result)} new recommendations!")
+            st.session_state.daily_job_key = None
+        
         # Load and display recommendations
-        date_str = selected_date.strftime("%Y-%m-%d")
         recommendations = load_recommendations(date_str)
         
         if recommendations:
@@ -138,6 +266,9 @@ class StreamlitMovieApp:
         if st.session_state.get('show_stats', False):
             self.show_stats_section()
             st.session_state.show_stats = False
+        
+        if job_running:
+            self.poll_running_job()
     
     def genre_page(self):
         """Genre-specific recommendations page."""
@@ -155,13 +286,19 @@ class StreamlitMovieApp:
         
         with col2:
             if st.button("🔍 Get Recommendations"):
-                with st.spinner(f"Finding {selected_genre} movies..."):
-                    try:
-                        recommendations = self.agent.get_genre_recommendations(selected_genre)
-                        st.session_state.genre_recommendations = recommendations
-                        st.session_state.selected_genre = selected_genre
-                    except Exception as e:
-                        st.error(f"Error getting {selected_genre} recommendations: {str(e)}")
+                job = self.generate_genre_job(selected_genre)
+                st.session_state.genre_job_key = job.key
+        
+        job_running = False
+        job_key = st.session_state.get('genre_job_key')
+        if job_key:
+            job = self.jobs.get(job_key)
+            job_running = self.render_job_status(job, f"Finding {job_key[2]} movies")
+            if job is not None and job.status == "done":
+                st.session_state.genre_recommendations = job.result
+                st.session_state.selected_genre = job_key[2]
+            if not job_running:
+                st.session_state.genre_job_key = None
         
         # Display genre recommendations
         if st.session_state.get('genre_recommendations'):
@@ -172,74 +309,98 @@ class StreamlitMovieApp:
             
             for i, movie in enumerate(recommendations):
                 self.render_movie_card(movie, i)
+        
+        if job_running:
+            self.poll_running_job()
     
     def history_page(self):
         """Historical recommendations page."""
         st.title("📚 Recommendation History")
         
-        # Load all recommendations
-        from utils import load_all_recommendations
-        all_recommendations = load_all_recommendations()
-        
-        if not all_recommendations:
-            st.info("No recommendation history found. Generate some recommendations first!")
-            return
-        
-        # Create DataFrame for display
-        history_data = []
-        for date, day_data in all_recommendations.items():
-            for movie in day_data.get('recommendations', []):
-                history_data.append({
-                    'Date': date,
-                    'Title': movie.get('title', ''),
-                    'Year': movie.get('year', ''),
-                    'Genre': get_genre_for_date(datetime.strptime(date, "%Y-%m-%d")),
-                    'Available on YouTube': '✅' if movie.get('youtube_data') else '❌',
-                    'Duration': movie.get('youtube_data', {}).get('duration', 'N/A')
-                })
-        
-        if history_data:
-            df = pd.DataFrame(history_data)
-            
-            # Filters
-            col1, col2, col3 = st.columns(3)
+        # Charts come from the running aggregates, not a scan of the history
+        stats = get_stats()
+        if stats['genre_distribution'] or stats['channel_distribution']:
+            col1, col2 = st.columns(2)
             
             with col1:
-                date_filter = st.selectbox(
-                    "Filter by Date",
-                    options=['All'] + sorted(df['Date'].unique(), reverse=True)
-                )
+                st.markdown("#### 🎭 Movies by Genre")
+                st.bar_chart(pd.Series(stats['genre_distribution'], name="Movies"))
             
             with col2:
-                genre_filter = st.selectbox(
-                    "Filter by Genre",
-                    options=['All'] + sorted(df['Genre'].unique())
-                )
-            
-            with col3:
-                year_filter = st.selectbox(
-                    "Filter by Year",
-                    options=['All'] + sorted(df['Year'].unique())
+                st.markdown("#### 📺 Top Channels")
+                top_channels = dict(list(stats['channel_distribution'].items())[:10])
+                st.bar_chart(pd.Series(top_channels, name="Movies"))
+        
+        store = get_recommendation_store()
+        search = st.text_input("🔍 Search titles and cast", placeholder="e.g. Hitchcock or Vertigo")
+        if search.strip():
+            matches = store.search(search, limit=HISTORY_SEARCH_LIMIT)
+            if matches:
+                st.markdown(f"#### {len(matches)} matches")
+                st.dataframe(pd.DataFrame([
+                    {
+                        'Date': match['date'],
+                        'Title': match['title'],
+                        'Year': match['year'],
+                        'Cast & Crew': match['cast_crew']
+                    }
+                    for match in matches
+                ]), use_container_width=True)
+            else:
+                st.info(f"No recommended movies match '{search}'.")
+            return
+        
+        # Filters
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            genre_filter = st.selectbox("Filter by Genre", options=['All'] + MOVIE_GENRES)
+        
+        with col2:
+            date_range = st.date_input("Filter by Date Range", value=(), help="Leave empty for all dates")
+        
+        genre = None if genre_filter == 'All' else genre_filter
+        start = date_range[0].strftime("%Y-%m-%d") if len(date_range) > 0 else None
+        end = date_range[1].strftime("%Y-%m-%d") if len(date_range) > 1 else None
+        
+        # Only the selected page of dates is read from the store
+        total_days = store.count_days(start, end, genre)
+        if not total_days:
+            if genre or start:
+                st.info("No recommendations match these filters.")
+            else:
+                st.info("No recommendation history found. Generate some recommendations first!")
+            return
+        
+        page_count = math.ceil(total_days / HISTORY_PAGE_DAYS)
+        page = st.number_input(f"Page (1-{page_count})", min_value=1, max_value=page_count, value=1, step=1)
+        first_day = (page - 1) * HISTORY_PAGE_DAYS + 1
+        st.caption(f"Days {first_day}-{min(total_days, page * HISTORY_PAGE_DAYS)} of {total_days}, newest first")
+        
+        history_df = load_history_page(page - 1, genre, start, end, store.revision())
+        st.dataframe(history_df, use_container_width=True)
+        
+        # Export the selected date range
+        col1, col2 = st.columns([1, 2])
+        
+        with col1:
+            export_format = st.selectbox("Export Format", options=list(EXPORT_FORMATS), format_func=str.upper)
+        
+        with col2:
+            st.markdown("<br>", unsafe_allow_html=True)
+            if st.button("📥 Prepare Export"):
+                st.session_state.history_export = prepare_export(export_format, start, end, store.revision())
+        
+        export_file = st.session_state.get('history_export')
+        if export_file and os.path.exists(export_file):
+            # download_button reads the whole file into memory; only writing the export is streamed
+            with open(export_file, 'rb') as f:
+                st.download_button(
+                    "⬇️ Download Export",
+                    data=f,
+                    file_name=os.path.basename(export_file),
+                    mime=EXPORT_FORMATS[format_for_file(export_file)][1]
                 )
-            
-            # Apply filters
-            filtered_df = df.copy()
-            if date_filter != 'All':
-                filtered_df = filtered_df[filtered_df['Date'] == date_filter]
-            if genre_filter != 'All':
-                filtered_df = filtered_df[filtered_df['Genre'] == genre_filter]
-            if year_filter != 'All':
-                filtered_df = filtered_df[filtered_df['Year'] == year_filter]
-            
-            # Display table
-            st.dataframe(filtered_df, use_container_width=True)
-            
-            # Export option
-            if st.button("📥 Export to CSV"):
-                csv_file = export_recommendations_csv()
-                st.success(f"Exported to {csv_file}")
-        else:
-            st.info("No recommendations found in history.")
     
     def show_stats_section(self):
         """Show system statistics."""
@@ -261,6 +422,41 @@ class StreamlitMovieApp:
         with col4:
             if stats['last_recommendation_date']:
                 st.metric("Last Update", stats['last_recommendation_date'])
+        
+        cache_stats = self.agent.youtube_searcher.cache_stats()
+        col1, col2, col3, col4 = st.columns(4)
+        
+        with col1:
+            st.metric("Search Cache Entries", cache_stats['entries'])
+        
+        with col2:
+            st.metric("Searches Saved", cache_stats['total_hits'])
+        
+        with col3:
+            st.metric("Cache Hit Rate", f"{cache_stats['hit_rate']:.0%}")
+        
+        with col4:
+            if stats['average_duration_minutes']:
+                st.metric("Avg. Duration", f"{stats['average_duration_minutes']} min")
+        
+        # The request scheduler is shared by every session of this server
+        request_stats = self.agent.youtube_searcher.request_stats()
+        col1, col2, col3, col4 = st.columns(4)
+        
+        with col1:
+            st.metric("YouTube Circuit", request_stats['circuit'].title())
+        
+        with col2:
+            st.metric("Request Queue", request_stats['queue_depth'])
+        
+        with col3:
+            st.metric("Requests Rejected", request_stats['rejected'])
+        
+        with col4:
+            st.metric("Requests Retried", request_stats['retries'])
+        
+        if stats['genre_distribution']:
+            st.bar_chart(pd.Series(stats['genre_distribution'], name="Movies"))
     
     def sidebar(self):
         """Render sidebar navigation."""
@@ -0,0 +1,69 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Optional
+from config import BACKGROUND_JOB_WORKERS
+
+
+class Job:
+    """Status of one background run."""
+
+    __slots__ = ('key', 'status', 'started_at', 'finished_at', 'result', 'error', 'future')
+
+    def __init__(self, key: Hashable):
+        self.key = key
+        self.status = "running"
+        self.started_at = time.time()
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self.future = None
+
+    @property
+    def running(self) -> bool:
+        return self.status == "running"
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished_at or time.time()) - self.started_at
+
+
+class JobRunner:
+    """Thread-pool job runner that collapses concurrent submissions with the same key."""
+
+    def __init__(self, max_workers: int = BACKGROUND_JOB_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="movie-job")
+        self._jobs: Dict[Hashable, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key: Hashable, func: Callable[[], Any]) -> Job:
+        """Start func in the background unless a job with this key is already running."""
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and job.running:
+                return job
+
+            job = Job(key)
+            self._jobs[key] = job
+            job.future = self._executor.submit(self._run, job, func)
+            return job
+
+    def _run(self, job: Job, func: Callable[[], Any]):
+        try:
+            job.result = func()
+            job.status = "done"
+        except Exception as e:
+            job.error = str(e)
+            job.status = "failed"
+            print(f"❌ Background job {job.key} failed: {job.error}")
+        finally:
+            job.finished_at = time.time()
+
+    def get(self, key: Hashable) -> Optional[Job]:
+        """Return the latest job for a key, if any."""
+        with self._lock:
+            return self._jobs.get(key)
+
+    def running_jobs(self) -> Dict[Hashable, Job]:
+        with self._lock:
+            return {key: job for key, job in self._jobs.items() if job.running}
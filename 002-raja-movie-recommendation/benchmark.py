@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark for the Classic Movie Recommendation pipeline
+Runs the real agent against a deterministic fake Gemini and the simulated
+YouTube backend from demo.py, with injected latency (no API keys or network)
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import re
+import shutil
+import tempfile
+import threading
+import time
+import tracemalloc
+import zlib
+from typing import Dict, List
+from langchain.schema.messages import AIMessage, AIMessageChunk
+from langchain.schema.runnable import Runnable
+from candidate_pool import CandidatePoolCache
+from config import MOVIE_GENRES, CATALOG_FILE, YOUTUBE_REQUESTS_PER_SECOND
+from demo import simulate_youtube_search
+from metrics import record, stage_summary
+from movie_agent import MovieRecommendationAgent
+from movie_catalog import MovieCatalog
+from ranking import is_feature_length, parse_duration_seconds, parse_view_count
+from search_cache import SearchCache
+from youtube_search import YouTubeRequestScheduler, YouTubeSearcher
+
+
+class FakeGeminiLLM(Runnable):
+    """Deterministic stand-in for ChatGoogleGenerativeAI with injected latency."""
+
+    def __init__(self, latency: float = 1.0, token_delay: float = 0.0, chunk_chars: int = 16):
+        self.latency = latency
+        self.token_delay = token_delay
+        self.chunk_chars = chunk_chars
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def _prompt_values(self, prompt) -> Dict:
+        if isinstance(prompt, dict):
+            return prompt
+        text = prompt.to_string() if hasattr(prompt, "to_string") else str(prompt)
+        match = re.search(r"Generate (\d+) classic (.+?) movies", text)
+        return {"count": int(match.group(1)), "genre": match.group(2)} if match else {}
+
+    def _response_text(self, prompt) -> str:
+        values = self._prompt_values(prompt)
+        genre = values.get("genre", "Drama")
+        count = int(values.get("count", 5))
+
+        # Each call for a genre returns the next titles, like a fresh generation would
+        with self._lock:
+            offset = self._calls.get(genre, 0)
+            self._calls[genre] = offset + count
+
+        movies = [
+            {
+                "title": f"The Lost {genre} Reel No. {offset + i + 1}",
+                "year": 1950 + (offset + i) % 31,
+                "description": f"A forgotten {genre.lower()} picture used for benchmarking.",
+                "genre_analysis": f"Textbook {genre.lower()} conventions.",
+                "cast_crew": "Benchmark Players"
+            }
+            for i in range(count)
+        ]
+        return "```json\n" + json.dumps(movies, indent=2) + "\n```"
+
+    def invoke(self, input, config=None, **kwargs):
+        text = self._response_text(input)
+        time.sleep(self.latency + self.token_delay * len(text) / self.chunk_chars)
+        return AIMessage(content=text)
+
+    def stream(self, input, config=None, **kwargs):
+        text = self._response_text(input)
+        # Latency is time to first token; token_delay is paid per chunk after that
+        time.sleep(self.latency)
+        for start in range(0, len(text), self.chunk_chars):
+            if self.token_delay:
+                time.sleep(self.token_delay)
+            yield AIMessageChunk(content=text[start:start + self.chunk_chars])
+
+
+class SimulatedYouTubeSearcher(YouTubeSearcher):
+    """YouTubeSearcher whose scrape is replaced by demo.simulate_youtube_search."""
+
+    def __init__(self, latency: float = 0.5, availability: float = 0.8, cache: SearchCache = None,
+                 scheduler: YouTubeRequestScheduler = None):
+        super().__init__(cache, scheduler)
+        self.latency = latency
+        self.availability = availability
+        self._random_lock = threading.Lock()
+
+    def _fetch_results(self, title: str, year: int) -> List[Dict]:
+        record("youtube_requests")
+        time.sleep(self.latency)
+
+        seed = zlib.crc32(f"{title}|{year}".encode("utf-8"))
+        movie = {
+            "title": title,
+            "year": year,
+            "likely_youtube_available": (seed % 1000) / 1000 < self.availability
+        }
+        # demo.py draws from the global RNG; seed it per title for repeatable results
+        with self._random_lock:
+            random.seed(seed)
+            video = simulate_youtube_search(movie)
+
+        if not video:
+            return []
+
+        duration_seconds = parse_duration_seconds(video['duration'])
+        if not is_feature_length(duration_seconds):
+            return []
+        return [{
+            **video,
+            'description': '',
+            'duration_seconds': duration_seconds,
+            'view_count': parse_view_count(video['views'])
+        }]
+
+
+def build_agent(args) -> MovieRecommendationAgent:
+    """Agent wired to the offline backends, optionally with every cache disabled."""
+    cache = SearchCache(ttl_seconds=0 if args.cold else 3600)
+    agent = MovieRecommendationAgent(
+        llm=FakeGeminiLLM(args.llm_latency, args.token_delay),
+        youtube_searcher=SimulatedYouTubeSearcher(
+            args.youtube_latency, cache=cache,
+            scheduler=YouTubeRequestScheduler(rate=args.youtube_rate)
+        )
+    )
+    if args.cold:
+        agent.candidate_pool = CandidatePoolCache(ttl_seconds=0)
+        agent.catalog = MovieCatalog([])
+    return agent
+
+
+def run_path(label: str, runs: int, func) -> Dict:
+    """Time func() over several runs and return latency and throughput."""
+    latencies = []
+    start = time.perf_counter()
+    for i in range(runs):
+        run_start = time.perf_counter()
+        func(i)
+        latencies.append(time.perf_counter() - run_start)
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "path": label,
+        "runs": runs,
+        "throughput_per_min": runs / elapsed * 60 if elapsed else 0.0,
+        "p50_s": latencies[len(latencies) // 2],
+        "max_s": latencies[-1]
+    }
+
+
+def run_benchmark(args) -> Dict:
+    """Run both recommendation paths in an isolated data directory."""
+    source_catalog = os.path.abspath(CATALOG_FILE)
+    original_dir = os.getcwd()
+    work_dir = tempfile.mkdtemp(prefix="movie-bench-")
+
+    try:
+        # Every store, cache and metrics file is relative to the data directory
+        os.chdir(work_dir)
+        os.makedirs(os.path.dirname(CATALOG_FILE))
+        if os.path.exists(source_catalog):
+            shutil.copy(source_catalog, CATALOG_FILE)
+
+        tracemalloc.start()
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output) if not args.verbose else contextlib.nullcontext():
+            agent = build_agent(args)
+            results = [
+                run_path("daily", args.runs, lambda i: agent.get_daily_recommendations()),
+                run_path("genre", args.runs,
+                         lambda i: agent.get_genre_recommendations(MOVIE_GENRES[i % len(MOVIE_GENRES)]))
+            ]
+        _, peak_bytes = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        return {
+            "settings": {
+                "runs": args.runs,
+                "llm_latency_s": args.llm_latency,
+                "token_delay_s": args.token_delay,
+                "youtube_latency_s": args.youtube_latency,
+                "youtube_rate": args.youtube_rate,
+                "cold": args.cold
+            },
+            "paths": results,
+            "stages": stage_summary(limit=args.runs * 2),
+            "search_cache": agent.youtube_searcher.cache_stats(),
+            "youtube_requests": agent.youtube_searcher.request_stats(),
+            "peak_memory_mb": round(peak_bytes / 1024 / 1024, 2)
+        }
+    finally:
+        os.chdir(original_dir)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def print_report(report: Dict):
+    settings = report["settings"]
+    print("🏁 Movie Pipeline Benchmark (offline)")
+    print("=" * 60)
+    print(f"Runs per path: {settings['runs']} | LLM latency: {settings['llm_latency_s']}s "
+          f"| YouTube latency: {settings['youtube_latency_s']}s | "
+          f"{'cold (no caches)' if settings['cold'] else 'warm caches'}")
+
+    print("\n🚀 Paths:")
+    for path in report["paths"]:
+        print(f"  - {path['path']:<6} {path['throughput_per_min']:7.1f} runs/min, "
+              f"p50 {path['p50_s'] * 1000:7.0f} ms, max {path['max_s'] * 1000:7.0f} ms")
+
+    print("\n⏱️ Stages:")
+    for name, stage in report["stages"].items():
+        counters = ", ".join(f"{key}={value:g}" for key, value in stage["counters"].items())
+        print(f"  - {name:<22} p50 {stage['p50_ms']:7.0f} ms, p95 {stage['p95_ms']:7.0f} ms"
+              + (f" ({counters})" if counters else ""))
+
+    cache = report["search_cache"]
+    print(f"\n🔍 Search cache: {cache['hits']} hits / {cache['misses']} misses")
+    requests_sent = report["youtube_requests"]
+    print(f"🚦 YouTube requests: {requests_sent['requests']} sent at {settings['youtube_rate'] or 'unlimited'}/s, "
+          f"{requests_sent['rejected']} rejected")
+    print(f"💾 Peak traced memory: {report['peak_memory_mb']} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark for the movie pipeline")
+    parser.add_argument('--runs', type=int, default=10, help='Runs per recommendation path')
+    parser.add_argument('--llm-latency', type=float, default=1.0, help='Seconds to first LLM token')
+    parser.add_argument('--token-delay', type=float, default=0.01, help='Seconds per streamed chunk')
+    parser.add_argument('--youtube-latency', type=float, default=0.5, help='Seconds per YouTube search')
+    parser.add_argument('--youtube-rate', type=float, default=YOUTUBE_REQUESTS_PER_SECOND,
+                        help='YouTube requests per second (0 = unlimited)')
+    parser.add_argument('--cold', action='store_true', help='Disable search cache, candidate pool and catalog')
+    parser.add_argument('--json', help='Also write the report to this JSON file')
+    parser.add_argument('--verbose', action='store_true', help='Show pipeline output')
+    args = parser.parse_args()
+
+    report = run_benchmark(args)
+    print_report(report)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n📄 Report written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing, contextmanager
+from typing import Dict, List
+from config import (
+    DATA_DIR, CANDIDATE_POOL_FILE, CANDIDATE_POOL_TTL_DAYS, CANDIDATE_POOL_MAX_PER_GENRE
+)
+from search_cache import normalize_key
+
+
+def prompt_hash(prompt_template: str) -> str:
+    """Short, stable fingerprint of a prompt template."""
+    return hashlib.sha256(prompt_template.encode("utf-8")).hexdigest()[:16]
+
+
+class CandidatePoolCache:
+    """YouTube-verified movies generated by Gemini, reusable across days.
+
+    Pools are keyed by (genre, model, prompt hash) so a prompt or model change
+    starts a fresh pool. A separate index of already recommended titles keeps
+    a pool from serving the same movie twice.
+    """
+
+    def __init__(self, db_path: str = CANDIDATE_POOL_FILE,
+                 ttl_seconds: float = CANDIDATE_POOL_TTL_DAYS * 86400,
+                 max_per_genre: int = CANDIDATE_POOL_MAX_PER_GENRE):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_per_genre = max_per_genre
+        self._lock = threading.Lock()
+        self._init_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=10)
+
+    @contextmanager
+    def _transaction(self):
+        """Connection that commits on success and is always closed afterwards."""
+        with closing(self._connect()) as conn, conn:
+            yield conn
+
+    def _init_db(self):
+        directory = os.path.dirname(self.db_path) or DATA_DIR
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+        with self._transaction() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS candidate_pool (
+                    genre TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    prompt_hash TEXT NOT NULL,
+                    title_key TEXT NOT NULL,
+                    year TEXT NOT NULL,
+                    movie TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (genre, model, prompt_hash, title_key, year)
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS recommended_titles (
+                    title_key TEXT NOT NULL,
+                    year TEXT NOT NULL,
+                    genre TEXT,
+                    recommended_on TEXT,
+                    PRIMARY KEY (title_key, year)
+                )
+            """)
+
+    def add(self, genre: str, model: str, prompt_key: str, movies: List[Dict]):
+        """Add verified movies to a pool and evict expired or surplus entries."""
+        now = time.time()
+        rows = []
+        for movie in movies:
+            title_key, year = normalize_key(movie['title'], movie['year'])
+            rows.append((genre, model, prompt_key, title_key, year, json.dumps(movie), now))
+
+        with self._lock, self._transaction() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO candidate_pool "
+                "(genre, model, prompt_hash, title_key, year, movie, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            conn.execute(
+                "DELETE FROM candidate_pool WHERE created_at < ?", (now - self.ttl_seconds,)
+            )
+            conn.execute("""
+                DELETE FROM candidate_pool WHERE rowid IN (
+                    SELECT rowid FROM candidate_pool
+                    WHERE genre = ? AND model = ? AND prompt_hash = ?
+                    ORDER BY created_at DESC LIMIT -1 OFFSET ?
+                )
+            """, (genre, model, prompt_key, self.max_per_genre))
+
+    def unseen(self, genre: str, model: str, prompt_key: str, limit: int = None) -> List[Dict]:
+        """Return pooled movies that have not been recommended yet, oldest first."""
+        query = """
+            SELECT movie FROM candidate_pool AS pool
+            WHERE genre = ? AND model = ? AND prompt_hash = ? AND created_at >= ?
+              AND NOT EXISTS (
+                  SELECT 1 FROM recommended_titles AS seen
+                  WHERE seen.title_key = pool.title_key AND seen.year = pool.year
+              )
+            ORDER BY created_at, rowid
+        """
+        params = [genre, model, prompt_key, time.time() - self.ttl_seconds]
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+
+        with self._transaction() as conn:
+            rows = conn.execute(query, params).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def is_recommended(self, title: str, year) -> bool:
+        """Whether a title has already been served on some day."""
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT 1 FROM recommended_titles WHERE title_key = ? AND year = ?",
+                normalize_key(title, year)
+            ).fetchone()
+        return row is not None
+
+    def claim(self, movies: List[Dict], limit: int, genre: str = None, date: str = None) -> List[Dict]:
+        """Mark up to `limit` movies as recommended, in order, skipping any already taken.
+
+        Checking and recording happen in one write transaction, so concurrent runs (threads
+        or processes) that ranked the same title can't both serve it. Returns the claimed movies.
+        """
+        claimed, keys = [], set()
+        with self._lock, self._transaction() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            for movie in movies:
+                if len(claimed) >= limit:
+                    break
+                key = normalize_key(movie['title'], movie['year'])
+                if key in keys:
+                    continue
+                taken = conn.execute(
+                    "SELECT 1 FROM recommended_titles WHERE title_key = ? AND year = ?", key
+                ).fetchone()
+                if taken is None:
+                    conn.execute(
+                        "INSERT INTO recommended_titles (title_key, year, genre, recommended_on) "
+                        "VALUES (?, ?, ?, ?)",
+                        (*key, genre, date)
+                    )
+                    keys.add(key)
+                    claimed.append(movie)
+        return claimed
+
+    def stats(self) -> Dict:
+        """Return pooled and recommended title counts."""
+        with self._transaction() as conn:
+            pooled = conn.execute("SELECT COUNT(*) FROM candidate_pool").fetchone()[0]
+            recommended = conn.execute("SELECT COUNT(*) FROM recommended_titles").fetchone()[0]
+        return {"pooled_movies": pooled, "recommended_titles": recommended}
+
+
+_shared_pool = None
+_shared_pool_lock = threading.Lock()
+
+
+def get_candidate_pool() -> CandidatePoolCache:
+    """Return the process-wide candidate pool cache."""
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is None:
+            _shared_pool = CandidatePoolCache()
+        return _shared_pool
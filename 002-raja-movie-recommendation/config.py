@@ -18,17 +18,83 @@ MOVIE_GENRES = [
 # YouTube Search Configuration
 MAX_SEARCH_RESULTS = 10
 SEARCH_QUERY_TEMPLATE = "{title} {year} full movie"
+MIN_MOVIE_MINUTES = 60  # Shorter uploads are treated as clips or trailers
+YOUTUBE_SEARCH_WORKERS = 5  # Concurrent YouTube lookups per graph run
+YOUTUBE_SEARCH_TIMEOUT = 30  # Seconds before a movie lookup is abandoned
+YOUTUBE_REQUESTS_PER_SECOND = 2.0  # Shared token-bucket rate for every search in the process (0 = unlimited)
+YOUTUBE_REQUEST_BURST = 5
+YOUTUBE_QUEUE_TIMEOUT = 20  # Seconds a search waits for a token before it is rejected
+YOUTUBE_MAX_RETRIES = 2
+YOUTUBE_RETRY_BASE_SECONDS = 1.0  # Retry delays are drawn from [0, base * 2^attempt]
+YOUTUBE_BREAKER_FAILURES = 5  # Consecutive failed requests that open the circuit
+YOUTUBE_BREAKER_COOLDOWN_SECONDS = 120  # How long an open circuit fails fast before a trial request
+
+# Ranking Configuration
+RANKING_WEIGHTS = {
+    "duration": 1.0,  # Per minute of runtime
+    "views": 5.0,  # Per order of magnitude of views
+    "title_keywords": 1.0,
+    "channel": 1.0
+}
+TITLE_KEYWORD_BONUSES = {"full movie": 100, "complete": 50}
+CHANNEL_REPUTATION = {
+    "Timeless Classic Movies": 40,
+    "FilmRise Movies": 30,
+    "Popcornflix": 20
+}
 
 # Database Configuration
 DATA_DIR = "data"
 MOVIES_DB_FILE = f"{DATA_DIR}/movies.json"
-RECOMMENDATIONS_FILE = f"{DATA_DIR}/daily_recommendations.json"
+CATALOG_FILE = f"{DATA_DIR}/sample_movies.json"
+RECOMMENDATIONS_FILE = f"{DATA_DIR}/daily_recommendations.json"  # Legacy, migrated on first run
+RECOMMENDATIONS_DB_FILE = f"{DATA_DIR}/recommendations.db"
+
+# Search Cache Configuration
+SEARCH_CACHE_FILE = f"{DATA_DIR}/youtube_cache.db"
+SEARCH_CACHE_TTL_HOURS = 72
+SEARCH_CACHE_MAX_ENTRIES = 5000
+SEARCH_CACHE_MEMORY_ENTRIES = 256
+SEARCH_CACHE_FLUSH_EVERY = 100  # Memory hits between writes of the shared hit counters
+
+# Candidate Pool Configuration
+CANDIDATE_POOL_FILE = f"{DATA_DIR}/candidate_pools.db"
+CANDIDATE_POOL_TTL_DAYS = 90
+CANDIDATE_POOL_MAX_PER_GENRE = 200
+
+# Metrics Configuration
+METRICS_FILE = f"{DATA_DIR}/pipeline_metrics.jsonl"
+METRICS_RECENT_RUNS = 200  # Runs summarized by main.py --stats
+METRICS_PORT = 9108  # Prometheus endpoint started with --schedule (None to disable)
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")  # Set to 0.0.0.0 to let other hosts scrape it
 
 # LangChain Configuration
 MODEL_NAME = "gemini-pro"
 TEMPERATURE = 0.7
 MAX_TOKENS = 1000
+STREAM_GENERATION = True  # Start YouTube searches while Gemini is still streaming
 
 # Recommendation Configuration
 DAILY_RECOMMENDATION_COUNT = 3
-GENRE_ROTATION_DAYS = 7
+GENRE_ROTATION_DAYS = 7  # Days pre-generated by --ahead and the scheduler
+MAX_DAYS_PER_GENERATION = 4  # Days of one genre served by a single Gemini call
+BACKFILL_WORKERS = 3  # Genre batches generated concurrently
+BACKGROUND_JOB_WORKERS = 2  # Concurrent pipeline runs started from the web app
+JOB_POLL_SECONDS = 2  # How often the web app refreshes a running job's status
+HISTORY_PAGE_DAYS = 14  # Days rendered per page of the history view
+HISTORY_CACHED_PAGES = 32  # Rendered history pages kept in the web app's cache
+HISTORY_SEARCH_LIMIT = 100  # Maximum matches shown by the history search
+
+# Export Configuration
+EXPORT_DIR = f"{DATA_DIR}/exports"  # Files prepared for the web app's download button
+EXPORT_BATCH_ROWS = 500  # Rows encoded per streamed chunk / Parquet row group
+EXPORT_CHUNK_BYTES = 1024 * 1024
+
+# Scheduler Configuration
+PUBLISH_TIME = "09:00"  # Daily publication slot; publishing only reads the store
+GENERATION_LEAD_HOURS = 6  # Generation for the next slot starts this long before it
+GENERATION_MAX_ATTEMPTS = 6
+GENERATION_RETRY_BASE_SECONDS = 60  # Doubles after every failed attempt
+GENERATION_RETRY_MAX_SECONDS = 1800
+WARM_UP_INTERVAL_MINUTES = 30
+SCHEDULER_STATUS_FILE = f"{DATA_DIR}/scheduler_status.json"
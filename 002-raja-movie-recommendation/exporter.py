@@ -0,0 +1,147 @@
+import csv
+import io
+import json
+import os
+import tempfile
+from typing import Dict, Iterable, Iterator, List, Optional
+from config import EXPORT_BATCH_ROWS, EXPORT_CHUNK_BYTES
+from recommendation_store import get_recommendation_store
+
+EXPORT_FIELDS = [
+    'date', 'title', 'year', 'description', 'genre_analysis',
+    'cast_crew', 'youtube_url', 'youtube_title', 'duration', 'channel'
+]
+
+EXPORT_FORMATS = {
+    'csv': ('.csv', 'text/csv'),
+    'jsonl': ('.jsonl', 'application/x-ndjson'),
+    'parquet': ('.parquet', 'application/vnd.apache.parquet')
+}
+
+
+def iter_export_rows(start: str = None, end: str = None) -> Iterator[Dict]:
+    """Yield one flat row per recommended movie, reading the store a day at a time."""
+    for day in get_recommendation_store().iter_range(start, end):
+        for movie in day["recommendations"]:
+            youtube_data = movie.get('youtube_data') or {}
+            yield {
+                'date': day["date"],
+                'title': movie.get('title', ''),
+                'year': movie.get('year', ''),
+                'description': movie.get('description', ''),
+                'genre_analysis': movie.get('genre_analysis', ''),
+                'cast_crew': movie.get('cast_crew', ''),
+                'youtube_url': youtube_data.get('url', ''),
+                'youtube_title': youtube_data.get('title', ''),
+                'duration': youtube_data.get('duration', ''),
+                'channel': youtube_data.get('channel', '')
+            }
+
+
+def _batches(rows: Iterable[Dict], size: int = EXPORT_BATCH_ROWS) -> Iterator[List[Dict]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def iter_csv(rows: Iterable[Dict]) -> Iterator[bytes]:
+    """Encode rows as CSV, one chunk per batch."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    for batch in _batches(rows):
+        writer.writerows(batch)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        # Header only: nothing was exported
+        yield buffer.getvalue().encode('utf-8')
+
+
+def iter_jsonl(rows: Iterable[Dict]) -> Iterator[bytes]:
+    """Encode rows as JSON Lines, one chunk per batch."""
+    for batch in _batches(rows):
+        yield "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in batch).encode('utf-8')
+
+
+def _parquet_year(value) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def write_parquet(rows: Iterable[Dict], output) -> int:
+    """Write rows to a Parquet file or stream, one row group per batch; returns the row count."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet export needs pyarrow: pip install pyarrow")
+
+    schema = pa.schema([
+        (field, pa.int64() if field == 'year' else pa.string()) for field in EXPORT_FIELDS
+    ])
+    count = 0
+    with pq.ParquetWriter(output, schema) as writer:
+        for batch in _batches(rows):
+            columns = {field: [row[field] for row in batch] for field in EXPORT_FIELDS}
+            columns['year'] = [_parquet_year(year) for year in columns['year']]
+            writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+            count += len(batch)
+        if not count:
+            writer.write_table(schema.empty_table())
+    return count
+
+
+def iter_parquet(rows: Iterable[Dict]) -> Iterator[bytes]:
+    """Parquet needs its footer last, so spool to a temp file and stream that back."""
+    with tempfile.TemporaryFile() as spool:
+        write_parquet(rows, spool)
+        spool.seek(0)
+        while True:
+            chunk = spool.read(EXPORT_CHUNK_BYTES)
+            if not chunk:
+                break
+            yield chunk
+
+
+_ENCODERS = {'csv': iter_csv, 'jsonl': iter_jsonl, 'parquet': iter_parquet}
+
+
+def format_for_file(output_file: str) -> str:
+    """Pick the export format from a file extension (CSV by default)."""
+    extension = os.path.splitext(output_file)[1].lower()
+    for fmt, (fmt_extension, _) in EXPORT_FORMATS.items():
+        if extension == fmt_extension:
+            return fmt
+    return 'csv'
+
+
+def iter_export(fmt: str = 'csv', start: str = None, end: str = None) -> Iterator[bytes]:
+    """Stream an export of the recommendations between two dates as encoded chunks."""
+    if fmt not in _ENCODERS:
+        raise ValueError(f"Unknown export format {fmt!r}; choose from {', '.join(_ENCODERS)}")
+    return _ENCODERS[fmt](iter_export_rows(start, end))
+
+
+def export_recommendations(output_file: str, fmt: str = None, start: str = None,
+                           end: str = None) -> str:
+    """Write an export to a file without holding the whole history in memory."""
+    fmt = fmt or format_for_file(output_file)
+    if fmt == 'parquet':
+        # Parquet can be written straight to the file, no spooling needed
+        write_parquet(iter_export_rows(start, end), output_file)
+        return output_file
+
+    chunks = iter_export(fmt, start, end)
+    with open(output_file, 'wb') as f:
+        for chunk in chunks:
+            f.write(chunk)
+    return output_file
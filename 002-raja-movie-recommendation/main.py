@@ -5,15 +5,22 @@ Daily movie recommendations for classic films (1950-1980) available on YouTube.
 """
 
 import argparse
-import schedule
-import time
-from datetime import datetime
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List
+from metrics import stage_summary, start_metrics_server
 from movie_agent import MovieRecommendationAgent
+from recommendation_store import get_recommendation_store
+from scheduler import RecommendationScheduler, load_status
 from utils import (
     save_recommendations, load_recommendations, 
     format_movie_for_display, get_genre_for_date, get_stats
 )
-from config import MOVIE_GENRES
+from config import (
+    MOVIE_GENRES, GENRE_ROTATION_DAYS, MAX_DAYS_PER_GENERATION, BACKFILL_WORKERS,
+    METRICS_PORT, METRICS_RECENT_RUNS, PUBLISH_TIME, GENERATION_LEAD_HOURS
+)
 
 
 class MovieRecommendationSystem:
@@ -37,7 +44,7 @@ class MovieRecommendationSystem:
         
         try:
             # Generate new recommendations
-            recommendations = self.agent.get_daily_recommendations()
+            recommendations = self.agent.get_daily_recommendations(date)
             
             if not recommendations:
                 print("❌ No recommendations generated. Please check your API keys and internet connection.")
@@ -55,6 +62,79 @@ class MovieRecommendationSystem:
             print(f"❌ Error generating recommendations: {str(e)}")
             return []
     
+    def generate_date_range(self, start_date: str, end_date: str) -> Dict[str, List[Dict]]:
+        """Generate and save recommendations for every missing date in a range."""
+        start = datetime.strptime(start_date, "%Y-%m-%d")
+        end = datetime.strptime(end_date, "%Y-%m-%d")
+        if end < start:
+            print("❌ End date must not be before start date")
+            return {}
+        
+        store = get_recommendation_store()
+        existing_dates = set(store.dates(start_date, end_date))
+        
+        # Genre is a pure function of the date, so group missing dates by genre
+        dates_by_genre = {}
+        day = start
+        while day <= end:
+            date_str = day.strftime("%Y-%m-%d")
+            if date_str not in existing_dates:
+                dates_by_genre.setdefault(get_genre_for_date(day), []).append(date_str)
+            day += timedelta(days=1)
+        
+        missing_count = sum(len(dates) for dates in dates_by_genre.values())
+        print(f"🎬 Generating recommendations for {missing_count} days "
+              f"({len(existing_dates)} already exist) across {len(dates_by_genre)} genres")
+        print("=" * 50)
+        
+        if not dates_by_genre:
+            return {}
+        
+        def run_genre(genre, dates):
+            # A genre's batches draw on the same candidate pool, so they run one after
+            # another: each batch marks its titles before the next one reads the pool
+            days, genres = {}, {}
+            for i in range(0, len(dates), MAX_DAYS_PER_GENERATION):
+                batch = dates[i:i + MAX_DAYS_PER_GENERATION]
+                try:
+                    recommendations_per_day = self.agent.get_batch_recommendations(genre, len(batch))
+                except Exception as e:
+                    print(f"❌ Error generating {genre} batch for {', '.join(batch)}: {str(e)}")
+                    continue
+                for date, recommendations in zip(batch, recommendations_per_day):
+                    if recommendations:
+                        days[date] = recommendations
+                        genres[date] = genre
+            return days, genres
+        
+        # Genres run in parallel; a title two genres both picked goes to whichever batch
+        # claims it first, since claiming checks and records it in one transaction
+        days, genres = {}, {}
+        with ThreadPoolExecutor(max_workers=BACKFILL_WORKERS) as executor:
+            for genre_days, genre_genres in executor.map(lambda item: run_genre(*item), dates_by_genre.items()):
+                days.update(genre_days)
+                genres.update(genre_genres)
+        
+        # One transaction for the whole range
+        store.save_days(days, genres)
+        
+        for date in sorted(days):
+            print(f"✅ {date} ({genres[date]}): {len(days[date])} movies")
+        skipped = missing_count - len(days)
+        if skipped:
+            print(f"⚠️  {skipped} days could not be generated")
+        
+        return days
+    
+    def generate_ahead(self, days: int = GENRE_ROTATION_DAYS) -> Dict[str, List[Dict]]:
+        """Pre-generate recommendations for today and the following days."""
+        if days < 1:
+            print("Nothing to pre-generate for 0 days")
+            return {}
+        today = datetime.now()
+        end = today + timedelta(days=days - 1)
+        return self.generate_date_range(today.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d"))
+    
     def display_recommendations(self, recommendations):
         """Display movie recommendations in a formatted way."""
         if not recommendations:
@@ -124,32 +204,80 @@ class MovieRecommendationSystem:
         if stats['last_recommendation_date']:
             print(f"📆 Last recommendation date: {stats['last_recommendation_date']}")
         
+        if stats['average_duration_minutes']:
+            print(f"⏱️ Average YouTube duration: {stats['average_duration_minutes']} minutes")
+        
+        if stats['genre_distribution']:
+            print("\n🎭 Genre distribution:")
+            for genre, count in stats['genre_distribution'].items():
+                print(f"  - {genre}: {count} movies")
+        
+        if stats['channel_distribution']:
+            print("\n📺 Top channels:")
+            for channel, count in list(stats['channel_distribution'].items())[:5]:
+                print(f"  - {channel}: {count} movies")
+        
+        cache_stats = self.agent.youtube_searcher.cache_stats()
+        print(f"🔍 YouTube search cache: {cache_stats['entries']} entries, "
+              f"{cache_stats['total_hits']} hits / {cache_stats['total_misses']} misses "
+              f"({cache_stats['hit_rate']:.0%} hit rate)")
+        request_stats = self.agent.youtube_searcher.request_stats()
+        print(f"🚦 YouTube requests: {request_stats['requests']} sent, {request_stats['retries']} retried, "
+              f"{request_stats['rejected']} rejected, circuit {request_stats['circuit']}, "
+              f"queue depth {request_stats['queue_depth']}")
+        pool_stats = self.agent.candidate_pool.stats()
+        print(f"♻️ Candidate pool: {pool_stats['pooled_movies']} verified movies, "
+              f"{pool_stats['recommended_titles']} titles already recommended")
+        
+        stage_stats = stage_summary()
+        if stage_stats:
+            print(f"\n⏱️ Pipeline stages (last {METRICS_RECENT_RUNS} runs):")
+            for stage, summary in stage_stats.items():
+                counters = ", ".join(f"{name}={value:g}" for name, value in summary['counters'].items())
+                print(f"  - {stage}: p50 {summary['p50_ms']:.0f} ms, p95 {summary['p95_ms']:.0f} ms "
+                      f"over {summary['runs']} runs" + (f" ({counters})" if counters else ""))
+        
         print(f"\n🎭 Available genres: {', '.join(MOVIE_GENRES)}")
         print(f"📅 Today's genre: {get_genre_for_date()}")
     
     def run_scheduler(self):
         """Run the daily recommendation scheduler."""
         print("🕐 Starting daily movie recommendation scheduler...")
-        print("Recommendations will be generated daily at 9:00 AM")
-        
-        # Schedule daily recommendations
-        schedule.every().day.at("09:00").do(self.generate_daily_recommendations)
-        
-        # Generate today's recommendations if they don't exist
-        today = datetime.now().strftime("%Y-%m-%d")
-        if not load_recommendations(today):
-            print("Generating initial recommendations...")
-            self.generate_daily_recommendations()
-        
+        if METRICS_PORT:
+            start_metrics_server(METRICS_PORT)
+        print(f"Recommendations are generated {GENERATION_LEAD_HOURS}h before the {PUBLISH_TIME} "
+              f"slot, {GENRE_ROTATION_DAYS} days ahead; publishing only reads the store")
         print("✅ Scheduler started. Press Ctrl+C to stop.")
         
         try:
-            while True:
-                schedule.run_pending()
-                time.sleep(60)  # Check every minute
+            asyncio.run(RecommendationScheduler(self).run())
         except KeyboardInterrupt:
             print("\n👋 Scheduler stopped.")
-
+    
+    def show_scheduler_status(self):
+        """Display the scheduler's health/status file."""
+        status = load_status()
+        if not status:
+            print("❌ No scheduler status found. Start it with --schedule.")
+            return
+        
+        print("🕐 Scheduler Status")
+        print("=" * 50)
+        print(f"State: {status.get('state')} (pid {status.get('pid')}, last heartbeat {status.get('heartbeat_at')})")
+        for key in ("next_generation_at", "next_publish_at", "warmed_at"):
+            if status.get(key):
+                print(f"{key.replace('_', ' ').capitalize()}: {status[key]}")
+        
+        generation = status.get("last_generation")
+        if generation:
+            outcome = "succeeded" if generation["succeeded"] else f"failed ({generation.get('error')})"
+            print(f"Last generation {generation['dates'][0]}..{generation['dates'][1]}: {outcome} "
+                  f"after {generation['attempts']} attempts at {generation['finished_at']}")
+        
+        publish = status.get("last_publish")
+        if publish:
+            outcome = f"{publish['count']} movies" if publish["published"] else "nothing ready"
+            print(f"Last publish {publish['date']}: {outcome} at {publish['at']}")
 
 def main():
     parser = argparse.ArgumentParser(
@@ -161,6 +289,9 @@ Examples:
   python main.py --genre Thriller   # Get thriller recommendations
   python main.py --stats            # Show system statistics
   python main.py --schedule         # Run daily scheduler
+  python main.py --status           # Show the scheduler's health/status
+  python main.py --ahead 7          # Pre-generate the next 7 days
+  python main.py --backfill 2024-01-01 2024-01-31
         """
     )
     
@@ -182,21 +313,59 @@ Examples:
         help='Run the daily recommendation scheduler'
     )
     
+    parser.add_argument(
+        '--status',
+        action='store_true',
+        help="Show the scheduler's health/status file"
+    )
+    
     parser.add_argument(
         '--date',
         help='Generate recommendations for a specific date (YYYY-MM-DD)'
     )
     
+    parser.add_argument(
+        '--backfill',
+        nargs=2,
+        metavar=('START', 'END'),
+        help='Generate recommendations for every missing date in a range (YYYY-MM-DD)'
+    )
+    
+    parser.add_argument(
+        '--ahead',
+        type=int,
+        nargs='?',
+        const=GENRE_ROTATION_DAYS,
+        metavar='N',
+        help=f'Pre-generate recommendations for the next N days (default {GENRE_ROTATION_DAYS})'
+    )
+    
     args = parser.parse_args()
     
+    for value in (args.backfill or []) + ([args.date] if args.date else []):
+        try:
+            datetime.strptime(value, "%Y-%m-%d")
+        except ValueError:
+            parser.error(f"invalid date {value!r}, expected YYYY-MM-DD")
+    if args.backfill and args.backfill[1] < args.backfill[0]:
+        parser.error("--backfill END must not be before START")
+    if args.ahead is not None and args.ahead < 0:
+        parser.error("--ahead N must not be negative")
+    
     system = MovieRecommendationSystem()
     
     if args.stats:
         system.show_stats()
     elif args.genre:
         system.get_genre_recommendations(args.genre)
+    elif args.backfill:
+        system.generate_date_range(*args.backfill)
+    elif args.ahead is not None:
+        system.generate_ahead(args.ahead)
     elif args.schedule:
         system.run_scheduler()
+    elif args.status:
+        system.show_scheduler_status()
     else:
         system.generate_daily_recommendations(args.date)
 
@@ -0,0 +1,216 @@
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+from config import DATA_DIR, METRICS_FILE, METRICS_HOST, METRICS_RECENT_RUNS
+
+
+class StageMetrics:
+    """Wall time and counters for one graph node in one run."""
+
+    __slots__ = ('name', 'wall_ms', 'counters', '_lock')
+
+    def __init__(self, name: str):
+        self.name = name
+        self.wall_ms = 0.0
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def add(self, counter: str, value: float = 1):
+        # Lookups running in worker threads report into the same stage
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def to_dict(self) -> Dict:
+        return {"wall_ms": round(self.wall_ms, 1), **self.counters}
+
+
+class PipelineRun:
+    """Metrics for one pass through the recommendation pipeline."""
+
+    def __init__(self, kind: str):
+        self.run_id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.started_at = time.time()
+        self.stages: Dict[str, StageMetrics] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        stage = self.stages.setdefault(name, StageMetrics(name))
+        token = _current_stage.set(stage)
+        start = time.perf_counter()
+        try:
+            yield stage
+        finally:
+            stage.wall_ms += (time.perf_counter() - start) * 1000
+            _current_stage.reset(token)
+
+    def to_dict(self) -> Dict:
+        return {
+            "run_id": self.run_id,
+            "kind": self.kind,
+            "started_at": self.started_at,
+            "total_ms": round((time.time() - self.started_at) * 1000, 1),
+            "stages": {name: stage.to_dict() for name, stage in self.stages.items()}
+        }
+
+
+_current_stage: ContextVar[Optional[StageMetrics]] = ContextVar("movie_pipeline_stage", default=None)
+_active_runs: Dict[str, PipelineRun] = {}
+_totals: Dict[tuple, float] = {}
+_lock = threading.Lock()
+
+
+def record(counter: str, value: float = 1):
+    """Add to a counter of the stage running in this context (no-op outside a run)."""
+    stage = _current_stage.get()
+    if stage is not None:
+        stage.add(counter, value)
+
+
+@contextmanager
+def track_run(kind: str):
+    """Track a pipeline run; yields the run, whose id goes into the graph state."""
+    run = PipelineRun(kind)
+    with _lock:
+        _active_runs[run.run_id] = run
+    try:
+        yield run
+    finally:
+        with _lock:
+            _active_runs.pop(run.run_id, None)
+        _finish_run(run)
+
+
+def instrument_node(name: str, node: Callable) -> Callable:
+    """Wrap a LangGraph node so it reports into the run named by state["run_id"]."""
+    @wraps(node)
+    def wrapper(state):
+        with _lock:
+            run = _active_runs.get(state.get("run_id") or "")
+        if run is None:
+            return node(state)
+        with run.stage(name):
+            return node(state)
+    return wrapper
+
+
+def _finish_run(run: PipelineRun):
+    data = run.to_dict()
+
+    with _lock:
+        _totals[("runs", run.kind, "")] = _totals.get(("runs", run.kind, ""), 0) + 1
+        for name, stage in run.stages.items():
+            _totals[("seconds", name, "")] = _totals.get(("seconds", name, ""), 0) + stage.wall_ms / 1000
+            _totals[("calls", name, "")] = _totals.get(("calls", name, ""), 0) + 1
+            for counter, value in stage.counters.items():
+                _totals[("counter", name, counter)] = _totals.get(("counter", name, counter), 0) + value
+
+    try:
+        directory = os.path.dirname(METRICS_FILE) or DATA_DIR
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        with open(METRICS_FILE, 'a') as f:
+            f.write(json.dumps(data) + "\n")
+    except OSError as e:
+        print(f"⚠️  Could not write metrics: {str(e)}")
+
+
+def load_recent_runs(limit: int = METRICS_RECENT_RUNS) -> List[Dict]:
+    """Read the most recent runs from the JSON lines file."""
+    if not os.path.exists(METRICS_FILE):
+        return []
+
+    with open(METRICS_FILE, 'r') as f:
+        lines = deque(f, maxlen=limit)
+
+    runs = []
+    for line in lines:
+        try:
+            runs.append(json.loads(line))
+        except json.JSONDecodeError:
+            continue
+    return runs
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def stage_summary(limit: int = METRICS_RECENT_RUNS) -> Dict[str, Dict]:
+    """p50/p95 wall time and summed counters per stage across recent runs."""
+    wall_times, counters = {}, {}
+    for run in load_recent_runs(limit):
+        for name, stage in run.get("stages", {}).items():
+            wall_times.setdefault(name, []).append(stage.get("wall_ms", 0))
+            for counter, value in stage.items():
+                if counter != "wall_ms":
+                    stage_counters = counters.setdefault(name, {})
+                    stage_counters[counter] = stage_counters.get(counter, 0) + value
+
+    return {
+        name: {
+            "runs": len(values),
+            "p50_ms": _percentile(values, 0.5),
+            "p95_ms": _percentile(values, 0.95),
+            "counters": counters.get(name, {})
+        }
+        for name, values in wall_times.items()
+    }
+
+
+def render_prometheus() -> str:
+    """Prometheus text exposition of this process's totals."""
+    with _lock:
+        totals = dict(_totals)
+
+    families = {
+        "runs": ("movie_pipeline_runs_total", '{{kind="{0}"}}'),
+        "seconds": ("movie_stage_seconds_total", '{{stage="{0}"}}'),
+        "calls": ("movie_stage_calls_total", '{{stage="{0}"}}'),
+        "counter": ("movie_stage_events_total", '{{stage="{0}",event="{1}"}}')
+    }
+    lines = []
+    for kind, (metric, labels) in families.items():
+        lines.append(f"# TYPE {metric} counter")
+        for (total_kind, name, counter), value in sorted(totals.items()):
+            if total_kind == kind:
+                lines.append(f"{metric}{labels.format(name, counter)} {value:g}")
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") not in ("", "/metrics"):
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port: int, host: str = METRICS_HOST) -> Optional[ThreadingHTTPServer]:
+    """Serve /metrics in a daemon thread; returns None if the port can't be bound."""
+    try:
+        server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        print(f"⚠️  Metrics endpoint disabled, could not bind {host}:{port}: {str(e)}")
+        return None
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"📈 Metrics available at http://{host}:{port}/metrics")
+    return server
@@ -1,7 +1,10 @@
+import contextvars
 import json
 import random
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, TypedDict
+from typing import Dict, Iterable, List, Optional, Tuple, TypedDict
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.prompts import ChatPromptTemplate
 from langchain.schema import BaseMessage
@@ -9,9 +12,43 @@ from langgraph.graph import StateGraph, END
 from langgraph.graph.message import add_messages
 from config import (
     GOOGLE_API_KEY, MODEL_NAME, TEMPERATURE, MAX_TOKENS,
-    MOVIE_GENRES, CLASSIC_MOVIE_YEARS, DAILY_RECOMMENDATION_COUNT
+    CLASSIC_MOVIE_YEARS, DAILY_RECOMMENDATION_COUNT,
+    YOUTUBE_SEARCH_WORKERS, YOUTUBE_SEARCH_TIMEOUT, STREAM_GENERATION
 )
-from youtube_search import YouTubeSearcher
+from candidate_pool import get_candidate_pool, prompt_hash
+from metrics import instrument_node, record, track_run
+from movie_catalog import get_movie_catalog
+from ranking import VideoCandidate
+from utils import get_genre_for_date
+from youtube_search import YouTubeSearcher, YouTubeUnavailableError
+
+
+MOVIE_PROMPT_TEMPLATE = """
+You are a classic movie expert specializing in films from 1950-1980.
+
+Generate {count} classic {genre} movies from 1950-1980 that are likely to be available on YouTube.
+Focus on lesser-known gems, B-movies, and public domain films that would be freely available.
+
+For each movie, provide:
+1. Title
+2. Year
+3. Brief description (2-3 sentences)
+4. Why it's a good example of {genre}
+5. Notable actors/director if any
+
+Format as JSON array with objects containing: title, year, description, genre_analysis, cast_crew
+
+Example format:
+[
+    {{
+        "title": "Movie Title",
+        "year": 1973,
+        "description": "Brief description of the plot and significance.",
+        "genre_analysis": "Why this is a great example of the genre.",
+        "cast_crew": "Notable actors and director"
+    }}
+]
+"""
 
 
 class MovieRecommendationState(TypedDict):
@@ -20,17 +57,80 @@ class MovieRecommendationState(TypedDict):
     recommended_movies: List[Dict]
     search_results: List[Dict]
     final_recommendations: List[Dict]
+    candidate_count: int
+    required_count: int
+    run_id: str
+    target_date: str
 
 
-class MovieRecommendationAgent:
+class IncrementalJSONParser:
+    """Pull complete top-level JSON objects out of a token stream as they close."""
+    
     def __init__(self):
-        self.llm = ChatGoogleGenerativeAI(
+        self._buffer = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+    
+    def feed(self, text: str) -> List[Dict]:
+        """Consume the next chunk of text and return any objects it completed."""
+        objects = []
+        for char in text:
+            if self._depth:
+                self._buffer.append(char)
+            
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+            
+            if char == '"' and self._depth:
+                self._in_string = True
+            elif char == '{':
+                if self._depth == 0:
+                    self._buffer = ['{']
+                self._depth += 1
+            elif char == '}' and self._depth:
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        objects.append(json.loads(''.join(self._buffer)))
+                    except json.JSONDecodeError as e:
+                        print(f"Skipping malformed movie object: {e}")
+        
+        return objects
+
+
+class MovieRecommendationAgent:
+    def __init__(self, llm=None, youtube_searcher: Optional[YouTubeSearcher] = None):
+        # llm and youtube_searcher can be swapped for offline backends (see benchmark.py)
+        self.llm = llm or ChatGoogleGenerativeAI(
             model=MODEL_NAME,
             temperature=TEMPERATURE,
             max_tokens=MAX_TOKENS,
             google_api_key=GOOGLE_API_KEY
         )
-        self.youtube_searcher = YouTubeSearcher()
+        self.youtube_searcher = youtube_searcher or YouTubeSearcher()
+        self.candidate_pool = get_candidate_pool()
+        self.catalog = get_movie_catalog()
+        self.prompt_key = prompt_hash(MOVIE_PROMPT_TEMPLATE)
+        # Every node reports wall time and counters into the run named in its state
+        self.nodes = {
+            name: instrument_node(name, node) for name, node in (
+                ("select_genre", self._select_genre),
+                ("check_candidate_pool", self._check_candidate_pool),
+                ("search_catalog", self._search_catalog),
+                ("generate_and_search", self._generate_and_search),
+                ("generate_movies", self._generate_movies),
+                ("search_youtube", self._search_youtube),
+                ("update_candidate_pool", self._update_candidate_pool),
+                ("analyze_and_rank", self._analyze_and_rank)
+            )
+        }
         self.graph = self._create_graph()
         
     def _create_graph(self) -> StateGraph:
@@ -38,66 +138,128 @@ class MovieRecommendationAgent:
         workflow = StateGraph(MovieRecommendationState)
         
         # Add nodes
-        workflow.add_node("select_genre", self._select_genre)
-        workflow.add_node("generate_movies", self._generate_movies)
-        workflow.add_node("search_youtube", self._search_youtube)
-        workflow.add_node("analyze_and_rank", self._analyze_and_rank)
-        
-        # Add edges
+        workflow.add_node("select_genre", self.nodes["select_genre"])
+        workflow.add_node("check_candidate_pool", self.nodes["check_candidate_pool"])
+        workflow.add_node("search_catalog", self.nodes["search_catalog"])
+        workflow.add_node("update_candidate_pool", self.nodes["update_candidate_pool"])
+        workflow.add_node("analyze_and_rank", self.nodes["analyze_and_rank"])
         workflow.set_entry_point("select_genre")
-        workflow.add_edge("select_genre", "generate_movies")
-        workflow.add_edge("generate_movies", "search_youtube")
-        workflow.add_edge("search_youtube", "analyze_and_rank")
+        workflow.add_edge("select_genre", "check_candidate_pool")
+        
+        if STREAM_GENERATION:
+            # Generation and YouTube search overlap in a single pipelined node
+            workflow.add_node("generate_and_search", self.nodes["generate_and_search"])
+            generation_entry = "generate_and_search"
+            workflow.add_edge("generate_and_search", "update_candidate_pool")
+        else:
+            workflow.add_node("generate_movies", self.nodes["generate_movies"])
+            workflow.add_node("search_youtube", self.nodes["search_youtube"])
+            generation_entry = "generate_movies"
+            workflow.add_edge("generate_movies", "search_youtube")
+            workflow.add_edge("search_youtube", "update_candidate_pool")
+        
+        # Only call Gemini when neither the pool nor the local catalog has
+        # enough unseen, verified titles
+        workflow.add_conditional_edges(
+            "check_candidate_pool",
+            self._route_after_pool,
+            {"hit": "analyze_and_rank", "miss": "search_catalog"}
+        )
+        workflow.add_conditional_edges(
+            "search_catalog",
+            self._route_after_pool,
+            {"hit": "analyze_and_rank", "miss": generation_entry}
+        )
+        workflow.add_edge("update_candidate_pool", "analyze_and_rank")
         workflow.add_edge("analyze_and_rank", END)
         
         return workflow.compile()
     
     def _select_genre(self, state: MovieRecommendationState) -> MovieRecommendationState:
-        """Select today's genre based on date rotation."""
-        today = datetime.now()
-        genre_index = today.timetuple().tm_yday % len(MOVIE_GENRES)
-        selected_genre = MOVIE_GENRES[genre_index]
+        """Select the target day's genre based on date rotation."""
+        selected_genre = get_genre_for_date(datetime.strptime(state["target_date"], "%Y-%m-%d"))
         
         state["current_genre"] = selected_genre
-        print(f"Selected genre for today: {selected_genre}")
+        print(f"Selected genre for {state['target_date']}: {selected_genre}")
+        return state
+    
+    def _check_candidate_pool(self, state: MovieRecommendationState) -> MovieRecommendationState:
+        """Serve unseen, already verified movies from the candidate pool if there are enough."""
+        genre = state["current_genre"]
+        required = state.get("required_count") or DAILY_RECOMMENDATION_COUNT
+        pooled = self.candidate_pool.unseen(genre, MODEL_NAME, self.prompt_key)
+        
+        if len(pooled) >= required:
+            print(f"♻️ Serving {genre} from the candidate pool ({len(pooled)} unseen movies)")
+            record("pool_hits")
+            state["recommended_movies"] = pooled
+            state["search_results"] = pooled
+        else:
+            print(f"Candidate pool has {len(pooled)}/{required} unseen {genre} movies")
+            state["search_results"] = []
+        
         return state
     
+    def _route_after_pool(self, state: MovieRecommendationState) -> str:
+        """Route to ranking on a pool hit and to generation on a miss."""
+        required = state.get("required_count") or DAILY_RECOMMENDATION_COUNT
+        return "hit" if len(state["search_results"]) >= required else "miss"
+    
+    def _update_candidate_pool(self, state: MovieRecommendationState) -> MovieRecommendationState:
+        """Add freshly verified movies to the pool and rank from everything unseen in it."""
+        genre = state["current_genre"]
+        self.candidate_pool.add(genre, MODEL_NAME, self.prompt_key, state["search_results"])
+        state["search_results"] = self.candidate_pool.unseen(genre, MODEL_NAME, self.prompt_key)
+        return state
+    
+    def _search_catalog(self, state: MovieRecommendationState) -> MovieRecommendationState:
+        """Verify unseen movies from the local catalog before falling back to Gemini."""
+        genre = state["current_genre"]
+        candidates = self.catalog.query(
+            genre=genre,
+            exclude=lambda movie: self.candidate_pool.is_recommended(movie['title'], movie['year'])
+        )
+        
+        if not candidates:
+            print(f"No unseen {genre} movies in the local catalog")
+            return state
+        
+        print(f"📚 Checking {len(candidates)} unseen {genre} movies from the local catalog")
+        record("catalog_candidates", len(candidates))
+        state["recommended_movies"] = candidates
+        _, state["search_results"] = self._lookup_concurrently(candidates)
+        return self._update_candidate_pool(state)
+    
+    def _fill_candidates(self, state: MovieRecommendationState) -> MovieRecommendationState:
+        """Pool and catalog checks plus generation on a miss, for callers that bypass the graph."""
+        for stage in ("check_candidate_pool", "search_catalog"):
+            state = self.nodes[stage](state)
+            if self._route_after_pool(state) == "hit":
+                return state
+        
+        state = self.nodes["generate_and_search"](state)
+        return self.nodes["update_candidate_pool"](state)
+    
+    def _movie_prompt(self) -> ChatPromptTemplate:
+        """Prompt asking Gemini for a JSON array of classic movies."""
+        return ChatPromptTemplate.from_template(MOVIE_PROMPT_TEMPLATE)
+    
+    def _prompt_inputs(self, state: MovieRecommendationState) -> Dict:
+        """Template variables for the movie prompt."""
+        return {
+            "genre": state["current_genre"],
+            # Generate extra for filtering unless a batch asked for more
+            "count": state.get("candidate_count") or DAILY_RECOMMENDATION_COUNT + 2
+        }
+    
     def _generate_movies(self, state: MovieRecommendationState) -> MovieRecommendationState:
         """Generate movie recommendations using Gemini."""
         genre = state["current_genre"]
         
-        prompt = ChatPromptTemplate.from_template("""
-        You are a classic movie expert specializing in films from 1950-1980.
-        
-        Generate {count} classic {genre} movies from 1950-1980 that are likely to be available on YouTube.
-        Focus on lesser-known gems, B-movies, and public domain films that would be freely available.
-        
-        For each movie, provide:
-        1. Title
-        2. Year
-        3. Brief description (2-3 sentences)
-        4. Why it's a good example of {genre}
-        5. Notable actors/director if any
-        
-        Format as JSON array with objects containing: title, year, description, genre_analysis, cast_crew
-        
-        Example format:
-        [
-            {{
-                "title": "Movie Title",
-                "year": 1973,
-                "description": "Brief description of the plot and significance.",
-                "genre_analysis": "Why this is a great example of the genre.",
-                "cast_crew": "Notable actors and director"
-            }}
-        ]
-        """)
-        
-        chain = prompt | self.llm
-        response = chain.invoke({
-            "genre": genre,
-            "count": DAILY_RECOMMENDATION_COUNT + 2  # Generate extra for filtering
-        })
+        chain = self._movie_prompt() | self.llm
+        response = chain.invoke(self._prompt_inputs(state))
+        record("llm_calls")
+        record("llm_tokens", _token_count(response))
         
         try:
             # Extract JSON from response
@@ -119,31 +281,109 @@ class MovieRecommendationAgent:
         return state
     
     def _search_youtube(self, state: MovieRecommendationState) -> MovieRecommendationState:
-        """Search for movies on YouTube."""
-        movies = state["recommended_movies"]
+        """Search for movies on YouTube concurrently, keeping the generated order."""
+        _, state["search_results"] = self._lookup_concurrently(state["recommended_movies"])
+        return state
+    
+    def _generate_and_search(self, state: MovieRecommendationState) -> MovieRecommendationState:
+        """Stream movies from Gemini and start each YouTube search as soon as its movie is parsed."""
+        if not STREAM_GENERATION:
+            return self._search_youtube(self._generate_movies(state))
+        
+        genre = state["current_genre"]
+        chain = self._movie_prompt() | self.llm
+        inputs = self._prompt_inputs(state)
+        
+        def stream_movies():
+            parser = IncrementalJSONParser()
+            streamed_chars, usage_tokens = 0, 0
+            record("llm_calls")
+            try:
+                for chunk in chain.stream(inputs):
+                    streamed_chars += len(chunk.content)
+                    usage = getattr(chunk, "usage_metadata", None)
+                    if usage:
+                        usage_tokens = usage.get("total_tokens", usage_tokens)
+                    for movie in parser.feed(chunk.content):
+                        if movie.get('title') and movie.get('year'):
+                            yield movie
+            except Exception as e:
+                print(f"Error streaming movie recommendations: {e}")
+            finally:
+                record("llm_tokens", usage_tokens or streamed_chars // 4)
+        
+        movies, search_results = self._lookup_concurrently(stream_movies())
+        
+        if movies:
+            print(f"Generated {len(movies)} movie recommendations")
+        else:
+            print("No movies parsed from the stream, using fallback movies")
+            movies, search_results = self._lookup_concurrently(self._get_fallback_movies(genre))
+        
+        state["recommended_movies"] = movies
+        state["search_results"] = search_results
+        return state
+    
+    def _lookup_concurrently(self, movies: Iterable[Dict]) -> Tuple[List[Dict], List[Dict]]:
+        """Submit a lookup per movie as it arrives and collect matches in arrival order."""
+        executor = ThreadPoolExecutor(max_workers=YOUTUBE_SEARCH_WORKERS)
+        submitted = []
         search_results = []
         
-        for movie in movies:
-            print(f"Searching YouTube for: {movie['title']} ({movie['year']})")
-            youtube_results = self.youtube_searcher.search_movie(movie['title'], movie['year'])
+        try:
+            for movie in movies:
+                # Copy the context so lookups report into the current stage
+                context = contextvars.copy_context()
+                submitted.append((movie, executor.submit(context.run, self._lookup_movie, movie)))
             
-            if youtube_results:
-                best_match = self.youtube_searcher.get_best_match(movie['title'], movie['year'])
-                if best_match:
-                    movie_with_youtube = {
-                        **movie,
-                        'youtube_data': best_match,
-                        'available_on_youtube': True
-                    }
+            deadline = time.monotonic() + YOUTUBE_SEARCH_TIMEOUT
+            
+            # Collect in submission order so the ranking input is deterministic
+            for movie, future in submitted:
+                remaining = max(0.0, deadline - time.monotonic())
+                try:
+                    movie_with_youtube = future.result(timeout=remaining)
+                except FutureTimeoutError:
+                    future.cancel()
+                    print(f"✗ YouTube search timed out for {movie['title']}")
+                    continue
+                except YouTubeUnavailableError as e:
+                    # Throttled, not missing: the movie is neither kept nor ruled out
+                    record("youtube_unavailable")
+                    print(f"⚠️  YouTube unavailable while searching for {movie['title']}: {str(e)}")
+                    continue
+                except Exception as e:
+                    print(f"✗ YouTube search failed for {movie['title']}: {str(e)}")
+                    continue
+                
+                if movie_with_youtube:
                     search_results.append(movie_with_youtube)
-                    print(f"✓ Found on YouTube: {best_match['title']}")
-                else:
-                    print(f"✗ No suitable match found for {movie['title']}")
-            else:
-                print(f"✗ Not found on YouTube: {movie['title']}")
+        finally:
+            # Don't block the graph on lookups that overran the deadline
+            executor.shutdown(wait=False, cancel_futures=True)
         
-        state["search_results"] = search_results
-        return state
+        return [movie for movie, _ in submitted], search_results
+    
+    def _lookup_movie(self, movie: Dict) -> Optional[Dict]:
+        """Look up a single movie on YouTube and attach the best match."""
+        print(f"Searching YouTube for: {movie['title']} ({movie['year']})")
+        youtube_results = self.youtube_searcher.search_movie(movie['title'], movie['year'])
+        
+        if not youtube_results:
+            print(f"✗ Not found on YouTube: {movie['title']}")
+            return None
+        
+        best_match = self.youtube_searcher.pick_best_match(youtube_results)
+        if not best_match:
+            print(f"✗ No suitable match found for {movie['title']}")
+            return None
+        
+        print(f"✓ Found on YouTube: {best_match['title']}")
+        return {
+            **movie,
+            'youtube_data': best_match,
+            'available_on_youtube': True
+        }
     
     def _analyze_and_rank(self, state: MovieRecommendationState) -> MovieRecommendationState:
         """Analyze and rank the final recommendations."""
@@ -152,34 +392,24 @@ class MovieRecommendationAgent:
         if len(available_movies) < DAILY_RECOMMENDATION_COUNT:
             print(f"Warning: Only found {len(available_movies)} movies on YouTube")
         
-        # Sort by video quality indicators (duration, views, etc.)
-        def score_movie(movie):
-            youtube_data = movie.get('youtube_data', {})
-            duration = self.youtube_searcher._parse_duration(youtube_data.get('duration', '')) or 0
-            
-            # Simple scoring: prefer longer videos (more likely to be complete movies)
-            score = duration
-            
-            # Bonus for certain keywords in title that suggest full movie
-            title_lower = youtube_data.get('title', '').lower()
-            if 'full movie' in title_lower:
-                score += 100
-            if 'complete' in title_lower:
-                score += 50
-                
-            return score
-        
         # Select top recommendations
-        sorted_movies = sorted(available_movies, key=score_movie, reverse=True)
-        final_recommendations = sorted_movies[:DAILY_RECOMMENDATION_COUNT]
+        final_recommendations = self._rank_movies(available_movies)[:DAILY_RECOMMENDATION_COUNT]
         
         state["final_recommendations"] = final_recommendations
         print(f"Final recommendations: {len(final_recommendations)} movies")
         
         return state
     
+    def _rank_movies(self, movies: List[Dict]) -> List[Dict]:
+        """Sort movies by video quality (duration, views, title keywords, channel)."""
+        candidates = [VideoCandidate(movie.get('youtube_data') or {}) for movie in movies]
+        scores = self.youtube_searcher.ranking_engine.score(candidates)
+        order = sorted(range(len(movies)), key=lambda i: -scores[i])
+        return [movies[i] for i in order]
+    
     def _get_fallback_movies(self, genre: str) -> List[Dict]:
         """Fallback movies if AI generation fails."""
+        record("fallback_used")
         fallback_movies = {
             "Thriller": [
                 {
@@ -203,35 +433,100 @@ class MovieRecommendationAgent:
         
         return fallback_movies.get(genre, fallback_movies["Drama"])
     
-    def get_daily_recommendations(self) -> List[Dict]:
-        """Get today's movie recommendations."""
-        initial_state = MovieRecommendationState(
-            messages=[],
-            current_genre="",
-            recommended_movies=[],
-            search_results=[],
-            final_recommendations=[]
-        )
+    def get_daily_recommendations(self, date: Optional[str] = None) -> List[Dict]:
+        """Get a day's movie recommendations in that day's genre (default: today)."""
+        if date is None:
+            date = datetime.now().strftime("%Y-%m-%d")
         
-        final_state = self.graph.invoke(initial_state)
-        return final_state["final_recommendations"]
+        with track_run("daily") as run:
+            initial_state = MovieRecommendationState(
+                messages=[],
+                current_genre="",
+                recommended_movies=[],
+                search_results=[],
+                final_recommendations=[],
+                run_id=run.run_id,
+                target_date=date
+            )
+            
+            final_state = self.graph.invoke(initial_state)
+        
+        # Another run may have served some of these meanwhile; the next best replace them
+        final_recommendations = final_state["final_recommendations"]
+        candidates = final_recommendations + [
+            movie for movie in self._rank_movies(final_state["search_results"])
+            if movie not in final_recommendations
+        ]
+        return self.candidate_pool.claim(
+            candidates, len(final_recommendations),
+            genre=final_state["current_genre"],
+            date=date
+        )
     
     def get_genre_recommendations(self, genre: str) -> List[Dict]:
         """Get recommendations for a specific genre."""
-        initial_state = MovieRecommendationState(
-            messages=[],
-            current_genre=genre,
-            recommended_movies=[],
-            search_results=[],
-            final_recommendations=[]
-        )
-        
-        # Skip genre selection and start with movie generation
-        state = self._generate_movies(initial_state)
-        state = self._search_youtube(state)
-        state = self._analyze_and_rank(state)
+        with track_run("genre") as run:
+            initial_state = MovieRecommendationState(
+                messages=[],
+                current_genre=genre,
+                recommended_movies=[],
+                search_results=[],
+                final_recommendations=[],
+                run_id=run.run_id
+            )
+            
+            # Skip genre selection and start with the candidate pool
+            state = self._fill_candidates(initial_state)
+            state = self.nodes["analyze_and_rank"](state)
         
         return state["final_recommendations"]
+    
+    def get_batch_recommendations(self, genre: str, day_count: int) -> List[List[Dict]]:
+        """Get one list of recommendations per day for a genre from a single generation."""
+        with track_run("batch") as run:
+            initial_state = MovieRecommendationState(
+                messages=[],
+                current_genre=genre,
+                recommended_movies=[],
+                search_results=[],
+                final_recommendations=[],
+                candidate_count=DAILY_RECOMMENDATION_COUNT * day_count + 2,
+                required_count=DAILY_RECOMMENDATION_COUNT * day_count,
+                run_id=run.run_id
+            )
+            
+            state = self._fill_candidates(initial_state)
+            with run.stage("analyze_and_rank"):
+                ranked_movies = self._rank_movies(state["search_results"])
+        
+        # Claimed atomically: a concurrent batch of another genre may have taken some titles
+        claimed = self.candidate_pool.claim(ranked_movies, DAILY_RECOMMENDATION_COUNT * day_count, genre=genre)
+        
+        # Deal ranked movies round-robin so every day gets a comparable mix
+        days = [[] for _ in range(day_count)]
+        for i, movie in enumerate(claimed):
+            days[i % day_count].append(movie)
+        
+        if len(claimed) < DAILY_RECOMMENDATION_COUNT * day_count:
+            print(f"Warning: Only found {len(claimed)} {genre} movies for {day_count} days")
+        
+        return days
+
+    def warm_up(self) -> Dict:
+        """Touch the catalog, caches and candidate pool so the next run starts warm."""
+        return {
+            "catalog_movies": len(self.catalog),
+            "search_cache_entries": self.youtube_searcher.cache_stats()["entries"],
+            "pooled_movies": self.candidate_pool.stats()["pooled_movies"]
+        }
+
+
+def _token_count(message) -> int:
+    """Tokens reported by Gemini, or a rough 4-characters-per-token estimate."""
+    usage = getattr(message, "usage_metadata", None)
+    if usage and usage.get("total_tokens"):
+        return usage["total_tokens"]
+    return len(message.content) // 4
 
 
 def test_movie_agent():
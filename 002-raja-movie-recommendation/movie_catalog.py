@@ -0,0 +1,140 @@
+import json
+import os
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Callable, Dict, List, Optional, Tuple
+from config import CATALOG_FILE, CLASSIC_MOVIE_YEARS
+from utils import load_movie_database
+
+
+class MovieCatalog:
+    """Compact in-memory index over the curated movie catalog.
+
+    Movies are stored once in row order; genres, keywords and the year index
+    only hold integer row ids in typed arrays, so lookups never copy records.
+    """
+
+    def __init__(self, movies: List[Dict]):
+        self._movies = []
+        self._years = array('H')
+        self._available = array('B')
+        self._by_genre = {}
+        self._by_keyword = {}
+        seen = set()
+
+        for movie in movies:
+            if not movie.get('title') or not movie.get('year'):
+                continue
+            key = (movie['title'].lower(), int(movie['year']))
+            if key in seen:
+                continue
+            seen.add(key)
+
+            row = len(self._movies)
+            self._movies.append(movie)
+            self._years.append(int(movie['year']))
+            self._available.append(1 if movie.get('likely_youtube_available', True) else 0)
+            self._by_genre.setdefault(movie.get('genre', ''), array('I')).append(row)
+            for keyword in movie.get('keywords', []):
+                for token in keyword.lower().split():
+                    postings = self._by_keyword.setdefault(token, array('I'))
+                    if not postings or postings[-1] != row:
+                        postings.append(row)
+
+        # Year index: row ids sorted by year, searchable with bisect
+        self._year_order = array('I', sorted(range(len(self._movies)), key=self._years.__getitem__))
+        self._sorted_years = array('H', (self._years[row] for row in self._year_order))
+
+    def __len__(self) -> int:
+        return len(self._movies)
+
+    def genres(self) -> List[str]:
+        return sorted(genre for genre in self._by_genre if genre)
+
+    def _rows_in_years(self, year_range: Tuple[int, int]) -> set:
+        start = bisect_left(self._sorted_years, year_range[0])
+        end = bisect_right(self._sorted_years, year_range[1])
+        return set(self._year_order[start:end])
+
+    def query(self, genre: str = None, year_range: Tuple[int, int] = CLASSIC_MOVIE_YEARS,
+              keyword: str = None, available_only: bool = True,
+              exclude: Optional[Callable[[Dict], bool]] = None,
+              limit: int = None) -> List[Dict]:
+        """Return catalog movies matching every given filter, in catalog order."""
+        if genre is not None:
+            rows = self._by_genre.get(genre, array('I'))
+        else:
+            rows = range(len(self._movies))
+
+        # A blank keyword has no tokens and is treated like no keyword at all
+        tokens = keyword.lower().split() if keyword else []
+        if tokens:
+            keyword_rows = set(self._by_keyword.get(tokens[0], ()))
+            for token in tokens[1:]:
+                keyword_rows &= set(self._by_keyword.get(token, ()))
+            rows = [row for row in rows if row in keyword_rows]
+
+        if year_range:
+            year_rows = self._rows_in_years(year_range)
+            rows = [row for row in rows if row in year_rows]
+
+        results = []
+        for row in rows:
+            if available_only and not self._available[row]:
+                continue
+            movie = self._as_recommendation(self._movies[row])
+            if exclude and exclude(movie):
+                continue
+            results.append(movie)
+            if limit is not None and len(results) >= limit:
+                break
+
+        return results
+
+    @staticmethod
+    def _as_recommendation(movie: Dict) -> Dict:
+        """Shape a catalog record like a Gemini-generated movie."""
+        cast_crew = movie.get('cast_crew', '')
+        if movie.get('director'):
+            cast_crew = f"{cast_crew}; directed by {movie['director']}" if cast_crew else f"Directed by {movie['director']}"
+
+        genre_analysis = movie.get('genre_analysis')
+        if not genre_analysis and movie.get('keywords'):
+            genre_analysis = f"A curated {movie.get('genre', 'classic')} pick: {', '.join(movie['keywords'])}."
+
+        return {
+            'title': movie['title'],
+            'year': movie['year'],
+            'description': movie.get('description', ''),
+            'genre_analysis': genre_analysis or '',
+            'cast_crew': cast_crew,
+            'source': 'catalog'
+        }
+
+
+def load_catalog_movies(catalog_file: str = CATALOG_FILE) -> List[Dict]:
+    """Load curated sample movies plus anything saved to movies.json."""
+    movies = []
+    if os.path.exists(catalog_file):
+        try:
+            with open(catalog_file, 'r') as f:
+                movies.extend(json.load(f).get('classic_movies_1950_1980', []))
+        except (json.JSONDecodeError, FileNotFoundError) as e:
+            print(f"⚠️  Could not load catalog {catalog_file}: {str(e)}")
+
+    movies.extend(load_movie_database())
+    return movies
+
+
+_shared_catalog = None
+_shared_catalog_lock = threading.Lock()
+
+
+def get_movie_catalog() -> MovieCatalog:
+    """Return the process-wide catalog index, built on first use."""
+    global _shared_catalog
+    with _shared_catalog_lock:
+        if _shared_catalog is None:
+            _shared_catalog = MovieCatalog(load_catalog_movies())
+        return _shared_catalog
@@ -0,0 +1,210 @@
+import math
+import random
+import re
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from config import (
+    MIN_MOVIE_MINUTES, RANKING_WEIGHTS, TITLE_KEYWORD_BONUSES, CHANNEL_REPUTATION
+)
+
+
+def parse_duration_seconds(duration_str: str) -> Optional[int]:
+    """Parse a YouTube duration like "1:30:45" or "45:30" into seconds."""
+    if not duration_str:
+        return None
+
+    try:
+        seconds = 0
+        for part in duration_str.split(':'):
+            seconds = seconds * 60 + int(part)
+        return seconds
+    except (AttributeError, ValueError):
+        return None
+
+
+_VIEW_SUFFIXES = {'k': 1e3, 'm': 1e6, 'b': 1e9}
+
+
+def parse_view_count(views_str: str) -> int:
+    """Parse view text like "1.2M views" or "12,345 views" into a number."""
+    if not views_str or views_str == 'N/A':
+        return 0
+
+    match = re.search(r"([\d.,]+)\s*([kmb])?", str(views_str).lower())
+    if not match:
+        return 0
+
+    try:
+        number = float(match.group(1).replace(',', ''))
+    except ValueError:
+        return 0
+    return int(number * _VIEW_SUFFIXES.get(match.group(2), 1))
+
+
+class VideoCandidate:
+    """A YouTube result with its numeric features parsed once at ingest."""
+
+    __slots__ = ('title', 'title_lower', 'url', 'channel', 'duration_seconds', 'views', 'data')
+
+    def __init__(self, data: Dict):
+        self.data = data
+        self.title = data.get('title', '')
+        self.title_lower = self.title.lower()
+        self.url = data.get('url', '')
+        self.channel = data.get('channel', '')
+        # Prefer the numeric fields stored at search time, parse only older entries
+        duration_seconds = data.get('duration_seconds')
+        if duration_seconds is None:
+            duration_seconds = parse_duration_seconds(data.get('duration', ''))
+        self.duration_seconds = duration_seconds or 0
+        views = data.get('view_count')
+        if views is None:
+            views = parse_view_count(data.get('views', ''))
+        self.views = views
+
+    def __repr__(self) -> str:
+        return f"VideoCandidate({self.title!r}, {self.duration_seconds}s, {self.views} views)"
+
+
+class CandidateColumns:
+    """Column view of a candidate list, so each scorer makes one pass per feature."""
+
+    __slots__ = ('durations', 'views', 'titles', 'channels')
+
+    def __init__(self, candidates: Sequence[VideoCandidate]):
+        self.durations = [c.duration_seconds for c in candidates]
+        self.views = [c.views for c in candidates]
+        self.titles = [c.title_lower for c in candidates]
+        self.channels = [c.channel for c in candidates]
+
+
+Scorer = Callable[[CandidateColumns], Sequence[float]]
+
+
+def duration_scorer(columns: CandidateColumns) -> List[float]:
+    """Minutes of runtime; longer uploads are more likely to be complete films."""
+    return [seconds / 60 for seconds in columns.durations]
+
+
+def views_scorer(columns: CandidateColumns) -> List[float]:
+    """Order of magnitude of the view count."""
+    return [math.log10(views + 1) for views in columns.views]
+
+
+def title_keyword_scorer(columns: CandidateColumns) -> List[float]:
+    """Bonus for upload titles that promise the full movie."""
+    return [
+        sum(bonus for keyword, bonus in TITLE_KEYWORD_BONUSES.items() if keyword in title)
+        for title in columns.titles
+    ]
+
+
+def channel_reputation_scorer(columns: CandidateColumns) -> List[float]:
+    """Bonus for channels known to upload complete public-domain films."""
+    return [CHANNEL_REPUTATION.get(channel, 0) for channel in columns.channels]
+
+
+DEFAULT_SCORERS = {
+    'duration': duration_scorer,
+    'views': views_scorer,
+    'title_keywords': title_keyword_scorer,
+    'channel': channel_reputation_scorer
+}
+
+
+class RankingEngine:
+    """Weighted sum of pluggable scorers, computed over all candidates at once."""
+
+    def __init__(self, scorers: Dict[str, Scorer] = None, weights: Dict[str, float] = None):
+        self.scorers = dict(DEFAULT_SCORERS if scorers is None else scorers)
+        self.weights = dict(RANKING_WEIGHTS if weights is None else weights)
+
+    def register(self, name: str, scorer: Scorer, weight: float = 1.0):
+        """Add or replace a scorer."""
+        self.scorers[name] = scorer
+        self.weights[name] = weight
+
+    def score(self, candidates: Sequence[VideoCandidate]) -> List[float]:
+        """Return one score per candidate."""
+        if not candidates:
+            return []
+
+        columns = CandidateColumns(candidates)
+        totals = [0.0] * len(candidates)
+        for name, scorer in self.scorers.items():
+            weight = self.weights.get(name, 1.0)
+            if weight:
+                totals = [total + weight * value for total, value in zip(totals, scorer(columns))]
+        return totals
+
+    def rank(self, candidates: Sequence[VideoCandidate]) -> List[Tuple[float, VideoCandidate]]:
+        """Return (score, candidate) pairs, best first; ties keep input order."""
+        scores = self.score(candidates)
+        order = sorted(range(len(candidates)), key=lambda i: -scores[i])
+        return [(scores[i], candidates[i]) for i in order]
+
+    def best(self, candidates: Sequence[VideoCandidate]) -> Optional[VideoCandidate]:
+        """Return the top candidate, or None."""
+        ranked = self.rank(candidates)
+        return ranked[0][1] if ranked else None
+
+
+def is_feature_length(duration_seconds: Optional[int]) -> bool:
+    """Whether a runtime is long enough to be a full movie."""
+    return bool(duration_seconds) and duration_seconds > MIN_MOVIE_MINUTES * 60
+
+
+def benchmark_ranking(candidate_count: int = 10, rounds: int = 2000):
+    """Compare per-comparison string parsing with the single-pass engine."""
+    rng = random.Random(42)
+    results = [
+        {
+            'title': rng.choice(["Classic Full Movie", "Complete Film", "Trailer", "Movie"]),
+            'url': f"https://youtube.com/watch?v={i}",
+            'duration': f"{rng.randint(1, 2)}:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d}",
+            'channel': rng.choice(list(CHANNEL_REPUTATION) + ["Someone"]),
+            'views': f"{rng.randint(1, 999)}K views"
+        }
+        for i in range(candidate_count)
+    ]
+    # What search_movie now stores: numeric fields parsed at ingest
+    ingested = [
+        {**result,
+         'duration_seconds': parse_duration_seconds(result['duration']),
+         'view_count': parse_view_count(result['views'])}
+        for result in results
+    ]
+
+    def legacy_score(video):
+        # Same features as the engine, but re-parsed on every key call
+        score = (parse_duration_seconds(video['duration']) or 0) / 60
+        score += RANKING_WEIGHTS['views'] * math.log10(parse_view_count(video['views']) + 1)
+        title_lower = video['title'].lower()
+        score += sum(bonus for keyword, bonus in TITLE_KEYWORD_BONUSES.items() if keyword in title_lower)
+        return score + CHANNEL_REPUTATION.get(video['channel'], 0)
+
+    def timed(label, func):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            func()
+        print(f"  {label:<32}: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    engine = RankingEngine()
+
+    def legacy():
+        # _analyze_and_rank sorts, get_best_match takes max: two parsing passes
+        sorted(results, key=legacy_score, reverse=True)
+        max(results, key=legacy_score)
+
+    def engine_from_ingested():
+        candidates = [VideoCandidate(result) for result in ingested]
+        engine.rank(candidates)
+
+    print(f"Ranking {candidate_count} candidates x {rounds} rounds")
+    timed("per-call parsing", legacy)
+    timed("engine (records from cache)", engine_from_ingested)
+    timed("engine (raw strings)", lambda: engine.rank([VideoCandidate(r) for r in results]))
+
+
+if __name__ == "__main__":
+    benchmark_ranking()
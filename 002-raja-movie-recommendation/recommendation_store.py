@@ -0,0 +1,350 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+from contextlib import closing, contextmanager
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+from config import DATA_DIR, RECOMMENDATIONS_DB_FILE, RECOMMENDATIONS_FILE
+from ranking import parse_duration_seconds
+
+
+class RecommendationStore:
+    """SQLite-backed store of daily recommendations, indexed by date."""
+
+    def __init__(self, db_path: str = RECOMMENDATIONS_DB_FILE,
+                 legacy_json_file: Optional[str] = RECOMMENDATIONS_FILE):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._init_db()
+        if legacy_json_file:
+            self.migrate_from_json(legacy_json_file)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=10)
+
+    @contextmanager
+    def _transaction(self):
+        """Connection that commits on success and is always closed afterwards."""
+        with closing(self._connect()) as conn, conn:
+            yield conn
+
+    def _init_db(self):
+        directory = os.path.dirname(self.db_path) or DATA_DIR
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+        with self._transaction() as conn:
+            # WAL lets the Streamlit app read while the scheduler writes
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS daily_recommendations (
+                    date TEXT PRIMARY KEY,
+                    recommendations TEXT NOT NULL,
+                    movie_count INTEGER NOT NULL,
+                    generated_at TEXT NOT NULL,
+                    genre TEXT
+                )
+            """)
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(daily_recommendations)")]
+            if "genre" not in columns:
+                conn.execute("ALTER TABLE daily_recommendations ADD COLUMN genre TEXT")
+            # Running aggregates, kept in step with every write so stats are O(1)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS stat_buckets (
+                    kind TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value REAL NOT NULL,
+                    PRIMARY KEY (kind, key)
+                )
+            """)
+            # Full-text index over title and cast for the history search box
+            conn.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS movie_search USING fts5(
+                    title, cast_crew, date UNINDEXED, position UNINDEXED, year UNINDEXED
+                )
+            """)
+            needs_rebuild = conn.execute("SELECT COUNT(*) FROM stat_buckets").fetchone()[0] == 0
+            if not needs_rebuild:
+                needs_rebuild = (
+                    conn.execute("SELECT COUNT(*) FROM movie_search").fetchone()[0] == 0
+                    and conn.execute("SELECT COUNT(*) FROM daily_recommendations").fetchone()[0] > 0
+                )
+
+        if needs_rebuild:
+            self.rebuild_stats()
+
+    @staticmethod
+    def _row_to_day(row) -> Dict:
+        return {
+            "date": row[0],
+            "recommendations": json.loads(row[1]),
+            "generated_at": row[2],
+            "genre": row[3]
+        }
+
+    @staticmethod
+    def _index_day(conn: sqlite3.Connection, date: str, recommendations: List[Dict]):
+        """Replace a date's rows in the search index."""
+        conn.execute("DELETE FROM movie_search WHERE date = ?", (date,))
+        conn.executemany(
+            "INSERT INTO movie_search (title, cast_crew, date, position, year) VALUES (?, ?, ?, ?, ?)",
+            [
+                (movie.get('title', ''), movie.get('cast_crew', ''), date, position, movie.get('year', ''))
+                for position, movie in enumerate(recommendations)
+            ]
+        )
+
+    @staticmethod
+    def _bump_revision(conn: sqlite3.Connection):
+        conn.execute(
+            "INSERT INTO stat_buckets (kind, key, value) VALUES ('meta', 'revision', 1) "
+            "ON CONFLICT(kind, key) DO UPDATE SET value = value + 1"
+        )
+
+    def save_day(self, date: str, recommendations: List[Dict], genre: str = None,
+                 generated_at: str = None):
+        """Insert or replace the recommendations for one date atomically."""
+        self.save_days({date: recommendations}, {date: genre}, generated_at)
+
+    def save_days(self, days: Dict[str, List[Dict]], genres: Dict[str, str] = None,
+                  generated_at: str = None):
+        """Write several dates, and their stats, in a single transaction."""
+        if generated_at is None:
+            generated_at = datetime.now().isoformat()
+        genres = genres or {}
+
+        with self._lock, self._transaction() as conn:
+            for date, recommendations in days.items():
+                previous = conn.execute(
+                    "SELECT recommendations, genre FROM daily_recommendations WHERE date = ?",
+                    (date,)
+                ).fetchone()
+                if previous:
+                    self._apply_stats(conn, json.loads(previous[0]), previous[1], -1)
+
+                genre = genres.get(date)
+                conn.execute(
+                    "INSERT OR REPLACE INTO daily_recommendations "
+                    "(date, recommendations, movie_count, generated_at, genre) VALUES (?, ?, ?, ?, ?)",
+                    (date, json.dumps(recommendations), len(recommendations), generated_at, genre)
+                )
+                self._apply_stats(conn, recommendations, genre, 1)
+                self._index_day(conn, date, recommendations)
+            self._bump_revision(conn)
+
+    def get_day(self, date: str) -> Optional[Dict]:
+        """Return the stored day record for a date, or None."""
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT date, recommendations, generated_at, genre FROM daily_recommendations WHERE date = ?",
+                (date,)
+            ).fetchone()
+        return self._row_to_day(row) if row else None
+
+    @staticmethod
+    def _range_filter(start: Optional[str], end: Optional[str], genre: Optional[str]):
+        clauses, params = [], []
+        if start:
+            clauses.append("date >= ?")
+            params.append(start)
+        if end:
+            clauses.append("date <= ?")
+            params.append(end)
+        if genre:
+            clauses.append("genre = ?")
+            params.append(genre)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def iter_range(self, start: str = None, end: str = None,
+                   descending: bool = False, limit: int = None,
+                   offset: int = 0, genre: str = None) -> Iterable[Dict]:
+        """Yield day records between two dates (inclusive), ordered by date."""
+        where, params = self._range_filter(start, end, genre)
+        query = "SELECT date, recommendations, generated_at, genre FROM daily_recommendations" + where
+        query += " ORDER BY date DESC" if descending else " ORDER BY date"
+        if limit is not None:
+            query += " LIMIT ? OFFSET ?"
+            params.extend([limit, offset])
+
+        conn = self._connect()
+        try:
+            for row in conn.execute(query, params):
+                yield self._row_to_day(row)
+        finally:
+            conn.close()
+
+    def get_range(self, start: str = None, end: str = None) -> Dict[str, Dict]:
+        """Return day records between two dates keyed by date."""
+        return {day["date"]: day for day in self.iter_range(start, end)}
+
+    def count_days(self, start: str = None, end: str = None, genre: str = None) -> int:
+        """Count stored dates in a range without decoding them."""
+        where, params = self._range_filter(start, end, genre)
+        with self._transaction() as conn:
+            return conn.execute(f"SELECT COUNT(*) FROM daily_recommendations{where}", params).fetchone()[0]
+
+    def search(self, text: str, limit: int = 50) -> List[Dict]:
+        """Find recommended movies whose title or cast match every word, best match first."""
+        words = re.findall(r"\w+", text.lower())
+        if not words:
+            return []
+        # Quote each word and prefix-match it so partial names still find the movie
+        query = " ".join(f'"{word}"*' for word in words)
+
+        with self._transaction() as conn:
+            rows = conn.execute(
+                "SELECT date, position, title, year, cast_crew FROM movie_search "
+                "WHERE movie_search MATCH ? ORDER BY rank LIMIT ?",
+                (query, limit)
+            ).fetchall()
+        return [
+            {"date": date, "position": position, "title": title, "year": year, "cast_crew": cast_crew}
+            for date, position, title, year, cast_crew in rows
+        ]
+
+    def revision(self) -> int:
+        """A number that changes on every write, for keying caches of rendered pages."""
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT value FROM stat_buckets WHERE kind = 'meta' AND key = 'revision'"
+            ).fetchone()
+        return int(row[0]) if row else 0
+
+    def dates(self, start: str = None, end: str = None, descending: bool = False) -> List[str]:
+        """Return stored dates without decoding their recommendations."""
+        query = "SELECT date FROM daily_recommendations WHERE date >= ? AND date <= ?"
+        query += " ORDER BY date DESC" if descending else " ORDER BY date"
+        with self._transaction() as conn:
+            rows = conn.execute(query, (start or "", end or "9999-99-99")).fetchall()
+        return [row[0] for row in rows]
+
+    def delete_before(self, cutoff: str) -> int:
+        """Delete every date older than the cutoff and return how many were removed."""
+        with self._lock, self._transaction() as conn:
+            for recommendations, genre in conn.execute(
+                "SELECT recommendations, genre FROM daily_recommendations WHERE date < ?",
+                (cutoff,)
+            ).fetchall():
+                self._apply_stats(conn, json.loads(recommendations), genre, -1)
+            cursor = conn.execute("DELETE FROM daily_recommendations WHERE date < ?", (cutoff,))
+            conn.execute("DELETE FROM movie_search WHERE date < ?", (cutoff,))
+            self._bump_revision(conn)
+            return cursor.rowcount
+
+    def _apply_stats(self, conn: sqlite3.Connection, recommendations: List[Dict],
+                     genre: Optional[str], sign: int):
+        """Add (sign=1) or remove (sign=-1) one day's contribution to the aggregates."""
+        deltas = {("total", "days"): 1, ("total", "movies"): len(recommendations)}
+        if genre:
+            deltas[("genre", genre)] = len(recommendations)
+
+        for movie in recommendations:
+            youtube_data = movie.get('youtube_data') or {}
+            channel = youtube_data.get('channel')
+            if channel:
+                deltas[("channel", channel)] = deltas.get(("channel", channel), 0) + 1
+            seconds = parse_duration_seconds(youtube_data.get('duration', ''))
+            if seconds:
+                deltas[("total", "duration_seconds")] = deltas.get(("total", "duration_seconds"), 0) + seconds
+                deltas[("total", "duration_samples")] = deltas.get(("total", "duration_samples"), 0) + 1
+
+        conn.executemany(
+            "INSERT INTO stat_buckets (kind, key, value) VALUES (?, ?, ?) "
+            "ON CONFLICT(kind, key) DO UPDATE SET value = value + excluded.value",
+            [(kind, key, sign * value) for (kind, key), value in deltas.items()]
+        )
+        conn.execute("DELETE FROM stat_buckets WHERE kind != 'total' AND value <= 0")
+
+    def rebuild_stats(self):
+        """Recompute the aggregates and search index from scratch (used once for older databases)."""
+        from utils import get_genre_for_date
+
+        with self._lock, self._transaction() as conn:
+            conn.execute("DELETE FROM stat_buckets WHERE kind != 'meta'")
+            conn.execute("DELETE FROM movie_search")
+            rows = conn.execute(
+                "SELECT date, recommendations, genre FROM daily_recommendations"
+            ).fetchall()
+            for date, recommendations, genre in rows:
+                if not genre:
+                    genre = get_genre_for_date(datetime.strptime(date, "%Y-%m-%d"))
+                    conn.execute(
+                        "UPDATE daily_recommendations SET genre = ? WHERE date = ?", (genre, date)
+                    )
+                recommendations = json.loads(recommendations)
+                self._apply_stats(conn, recommendations, genre, 1)
+                self._index_day(conn, date, recommendations)
+            self._bump_revision(conn)
+            # Marker row so an empty store isn't rebuilt on every start-up
+            conn.execute(
+                "INSERT OR IGNORE INTO stat_buckets (kind, key, value) VALUES ('total', 'days', 0)"
+            )
+
+    def stats(self) -> Dict:
+        """Return the running aggregates without touching the day rows."""
+        with self._transaction() as conn:
+            buckets = conn.execute("SELECT kind, key, value FROM stat_buckets").fetchall()
+            last_date = conn.execute("SELECT MAX(date) FROM daily_recommendations").fetchone()[0]
+
+        totals, genres, channels = {}, {}, {}
+        for kind, key, value in buckets:
+            target = {"total": totals, "genre": genres, "channel": channels}.get(kind)
+            if target is not None:
+                target[key] = int(value)
+
+        samples = totals.get("duration_samples", 0)
+        return {
+            "total_days": totals.get("days", 0),
+            "total_movies": totals.get("movies", 0),
+            "last_date": last_date,
+            "genre_distribution": dict(sorted(genres.items(), key=lambda item: -item[1])),
+            "channel_distribution": dict(sorted(channels.items(), key=lambda item: -item[1])),
+            "average_duration_minutes": round(totals.get("duration_seconds", 0) / samples / 60, 1) if samples else None
+        }
+
+    def migrate_from_json(self, json_file: str) -> int:
+        """Import a legacy daily_recommendations.json once, then rename it."""
+        if not os.path.exists(json_file):
+            return 0
+
+        try:
+            with open(json_file, 'r') as f:
+                legacy_data = json.load(f)
+        except (json.JSONDecodeError, FileNotFoundError) as e:
+            print(f"⚠️  Could not migrate {json_file}: {str(e)}")
+            return 0
+
+        with self._lock, self._transaction() as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO daily_recommendations "
+                "(date, recommendations, movie_count, generated_at) VALUES (?, ?, ?, ?)",
+                [
+                    (
+                        date,
+                        json.dumps(day_data.get("recommendations", [])),
+                        len(day_data.get("recommendations", [])),
+                        day_data.get("generated_at", datetime.now().isoformat())
+                    )
+                    for date, day_data in legacy_data.items()
+                ]
+            )
+
+        self.rebuild_stats()
+        os.replace(json_file, f"{json_file}.migrated")
+        print(f"✅ Migrated {len(legacy_data)} days from {json_file}")
+        return len(legacy_data)
+
+
+_shared_store = None
+_shared_store_lock = threading.Lock()
+
+
+def get_recommendation_store() -> RecommendationStore:
+    """Return the process-wide recommendation store."""
+    global _shared_store
+    with _shared_store_lock:
+        if _shared_store is None:
+            _shared_store = RecommendationStore()
+        return _shared_store
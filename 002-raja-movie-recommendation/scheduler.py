@@ -0,0 +1,211 @@
+import asyncio
+import json
+import os
+import random
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from config import (
+    DATA_DIR, GENRE_ROTATION_DAYS, PUBLISH_TIME, GENERATION_LEAD_HOURS,
+    GENERATION_MAX_ATTEMPTS, GENERATION_RETRY_BASE_SECONDS, GENERATION_RETRY_MAX_SECONDS,
+    WARM_UP_INTERVAL_MINUTES, SCHEDULER_STATUS_FILE
+)
+from recommendation_store import get_recommendation_store
+from utils import load_recommendations
+
+
+def next_slot(now: datetime, slot: str = PUBLISH_TIME) -> datetime:
+    """The next occurrence of an "HH:MM" slot strictly after now."""
+    hour, minute = (int(part) for part in slot.split(":"))
+    candidate = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    return candidate if candidate > now else candidate + timedelta(days=1)
+
+
+def backoff_delay(attempt: int) -> float:
+    """Exponential backoff with jitter for the given (1-based) failed attempt."""
+    delay = min(GENERATION_RETRY_MAX_SECONDS, GENERATION_RETRY_BASE_SECONDS * 2 ** (attempt - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+def load_status(path: str = SCHEDULER_STATUS_FILE) -> Dict:
+    """Read the scheduler's health/status file."""
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+class RecommendationScheduler:
+    """asyncio scheduler that generates ahead of the publish slot and publishes from the store."""
+
+    def __init__(self, system, status_file: str = SCHEDULER_STATUS_FILE):
+        self.system = system
+        self.status_file = status_file
+        self.status = {
+            "state": "starting",
+            "pid": os.getpid(),
+            "started_at": datetime.now().isoformat(),
+            "publish_time": PUBLISH_TIME
+        }
+        # One generation at a time; an attempt that outlives its deadline keeps the slot
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="movie-generation")
+        # Warm-ups get their own thread so they are not queued behind a long generation
+        self._warm_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="movie-warm-up")
+        self._generate_now = None
+
+    def _write_status(self, **updates):
+        self.status.update(updates)
+        self.status["heartbeat_at"] = datetime.now().isoformat()
+
+        directory = os.path.dirname(self.status_file) or DATA_DIR
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        # Write then rename so readers never see a half-written file
+        temp_file = f"{self.status_file}.tmp"
+        with open(temp_file, 'w') as f:
+            json.dump(self.status, f, indent=2)
+        os.replace(temp_file, self.status_file)
+
+    async def _in_thread(self, func, *args, executor: Optional[ThreadPoolExecutor] = None):
+        return await asyncio.get_running_loop().run_in_executor(executor or self._executor, func, *args)
+
+    async def run(self):
+        """Warm up, then run the generation, publish and keep-warm loops until cancelled."""
+        self._generate_now = asyncio.Event()
+        await self._warm_up()
+        self._write_status(state="idle")
+        try:
+            await asyncio.gather(
+                self._generation_loop(),
+                self._publish_loop(),
+                self._keep_warm_loop()
+            )
+        finally:
+            self._write_status(state="stopped")
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._warm_executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _warm_up(self):
+        warm = await self._in_thread(self.system.agent.warm_up, executor=self._warm_executor)
+        # Leaves "state" alone: a keep-warm pass can finish in the middle of a generation
+        self._write_status(warmed_at=datetime.now().isoformat(), warm_up=warm)
+
+    async def _keep_warm_loop(self):
+        while True:
+            await asyncio.sleep(WARM_UP_INTERVAL_MINUTES * 60)
+            await self._warm_up()
+
+    def _target_dates(self, now: datetime, publish_at: datetime) -> List[str]:
+        # From today (in case today's slot was missed) through the pre-generation window
+        days = (publish_at.date() - now.date()).days + GENRE_ROTATION_DAYS
+        return [(now + timedelta(days=offset)).strftime("%Y-%m-%d") for offset in range(days)]
+
+    def _missing_dates(self, dates: List[str]) -> List[str]:
+        existing = set(get_recommendation_store().dates(dates[0], dates[-1]))
+        return [date for date in dates if date not in existing]
+
+    async def _generation_loop(self):
+        while True:
+            now = datetime.now()
+            publish_at = next_slot(now)
+            generate_at = publish_at - timedelta(hours=GENERATION_LEAD_HOURS)
+            dates = self._target_dates(now, publish_at)
+            missing = self._missing_dates(dates)
+
+            # A date before the next slot is already late, so it never waits for the lead window
+            late = bool(missing) and missing[0] < publish_at.strftime("%Y-%m-%d")
+            if missing and (late or generate_at <= now):
+                await self.generate_with_retries(dates, deadline=publish_at)
+                if self._missing_dates(dates):
+                    # Out of attempts; try again once the next generation window opens
+                    await self._sleep_until(next_slot(publish_at) - timedelta(hours=GENERATION_LEAD_HOURS))
+                continue
+
+            # Each cycle adds a day to the window, so wake at every generation slot
+            wake_at = generate_at if generate_at > now else next_slot(publish_at) - timedelta(hours=GENERATION_LEAD_HOURS)
+            self._write_status(next_generation_at=wake_at.isoformat())
+            await self._sleep_until(wake_at)
+
+    async def _sleep_until(self, when: datetime):
+        timeout = max(0.0, (when - datetime.now()).total_seconds())
+        try:
+            await asyncio.wait_for(self._generate_now.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._generate_now.clear()
+
+    async def generate_with_retries(self, dates: List[str], deadline: datetime) -> bool:
+        """Fill every missing date, retrying with backoff until it succeeds or the deadline passes."""
+        attempt = 0
+        error = None
+
+        while attempt < GENERATION_MAX_ATTEMPTS:
+            remaining = (deadline - datetime.now()).total_seconds()
+            if remaining <= 0:
+                break
+
+            attempt += 1
+            self._write_status(
+                state="generating",
+                generation={"dates": [dates[0], dates[-1]], "attempt": attempt,
+                            "deadline": deadline.isoformat()}
+            )
+            try:
+                await asyncio.wait_for(
+                    self._in_thread(self.system.generate_date_range, dates[0], dates[-1]),
+                    timeout=remaining
+                )
+                missing = self._missing_dates(dates)
+                if not missing:
+                    self.status.pop("retry_at", None)
+                    self._write_status(
+                        state="idle",
+                        last_generation={"dates": [dates[0], dates[-1]], "attempts": attempt,
+                                         "succeeded": True, "finished_at": datetime.now().isoformat()}
+                    )
+                    return True
+                error = f"{len(missing)} dates still missing"
+            except asyncio.TimeoutError:
+                error = "deadline reached during generation"
+                break
+            except Exception as e:
+                error = str(e)
+
+            delay = backoff_delay(attempt)
+            if datetime.now() + timedelta(seconds=delay) >= deadline:
+                break
+            print(f"⚠️  Generation attempt {attempt} failed ({error}); retrying in {delay:.0f}s")
+            self._write_status(state="retrying", retry_at=(datetime.now() + timedelta(seconds=delay)).isoformat())
+            await asyncio.sleep(delay)
+
+        print(f"❌ Generation for {dates[0]}..{dates[-1]} gave up after {attempt} attempts: {error}")
+        self._write_status(
+            state="failed",
+            last_generation={"dates": [dates[0], dates[-1]], "attempts": attempt, "succeeded": False,
+                             "error": error, "finished_at": datetime.now().isoformat()}
+        )
+        return False
+
+    async def _publish_loop(self):
+        while True:
+            publish_at = next_slot(datetime.now())
+            self._write_status(next_publish_at=publish_at.isoformat())
+            await asyncio.sleep(max(0.0, (publish_at - datetime.now()).total_seconds()))
+            self.publish(publish_at.strftime("%Y-%m-%d"))
+
+    def publish(self, date: str) -> Optional[List[Dict]]:
+        """Publish a day's recommendations from the store; never generates."""
+        recommendations = load_recommendations(date)
+        if not recommendations:
+            print(f"❌ No recommendations ready for {date}; generation will retry now")
+            self._write_status(last_publish={"date": date, "published": False,
+                                             "at": datetime.now().isoformat()})
+            self._generate_now.set()
+            return None
+
+        print(f"📣 Publishing {len(recommendations)} recommendations for {date}")
+        self.system.display_recommendations(recommendations)
+        self._write_status(last_publish={"date": date, "published": True, "count": len(recommendations),
+                                         "at": datetime.now().isoformat()})
+        return recommendations
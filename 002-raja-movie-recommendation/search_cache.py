@@ -0,0 +1,223 @@
+import atexit
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing, contextmanager
+from typing import Dict, List, Optional, Tuple
+from config import (
+    DATA_DIR, SEARCH_CACHE_FILE, SEARCH_CACHE_TTL_HOURS, SEARCH_CACHE_MAX_ENTRIES,
+    SEARCH_CACHE_MEMORY_ENTRIES, SEARCH_CACHE_FLUSH_EVERY
+)
+from metrics import record
+
+
+def normalize_key(title: str, year) -> Tuple[str, str]:
+    """Normalize a (title, year) pair so trivial spelling differences share an entry."""
+    normalized_title = re.sub(r"[^\w\s]", "", str(title).lower())
+    normalized_title = re.sub(r"\s+", " ", normalized_title).strip()
+    return normalized_title, str(year).strip()
+
+
+class SearchCache:
+    """Two-level (memory + SQLite) cache for parsed YouTube search results."""
+
+    def __init__(self, db_path: str = SEARCH_CACHE_FILE,
+                 ttl_seconds: float = SEARCH_CACHE_TTL_HOURS * 3600,
+                 max_entries: int = SEARCH_CACHE_MAX_ENTRIES,
+                 memory_entries: int = SEARCH_CACHE_MEMORY_ENTRIES):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        # Memory hits only touch these; they reach SQLite on the next flush
+        self._pending_counters = {}
+        self._pending_accesses = {}
+        self._lock = threading.Lock()
+        self._init_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=10)
+
+    @contextmanager
+    def _transaction(self):
+        """Connection that commits on success and is always closed afterwards."""
+        with closing(self._connect()) as conn, conn:
+            yield conn
+
+    def _init_db(self):
+        directory = os.path.dirname(self.db_path) or DATA_DIR
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+        with self._transaction() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS search_results (
+                    title TEXT NOT NULL,
+                    year TEXT NOT NULL,
+                    results TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    PRIMARY KEY (title, year)
+                )
+            """)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_search_results_accessed "
+                "ON search_results (accessed_at)"
+            )
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache_counters (
+                    name TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL
+                )
+            """)
+
+    def _count(self, name: str):
+        self._pending_counters[name] = self._pending_counters.get(name, 0) + 1
+
+    def _flush(self, conn: sqlite3.Connection):
+        """Write counters and access times gathered from memory hits. Caller holds the lock."""
+        for name, value in self._pending_counters.items():
+            conn.execute(
+                "INSERT INTO cache_counters (name, value) VALUES (?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+                (name, value)
+            )
+        conn.executemany(
+            "UPDATE search_results SET accessed_at = MAX(accessed_at, ?) WHERE title = ? AND year = ?",
+            [(accessed_at, *key) for key, accessed_at in self._pending_accesses.items()]
+        )
+        self._pending_counters.clear()
+        self._pending_accesses.clear()
+
+    def get(self, title: str, year) -> Optional[List[Dict]]:
+        """Return cached results for a movie, or None on a miss or expired entry."""
+        key = normalize_key(title, year)
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and now - entry[1] < self.ttl_seconds:
+                self._memory.move_to_end(key)
+                self._pending_accesses[key] = now
+                self._count("hits")
+                self.hits += 1
+                record("cache_hits")
+                if sum(self._pending_counters.values()) >= SEARCH_CACHE_FLUSH_EVERY:
+                    with self._transaction() as conn:
+                        self._flush(conn)
+                return entry[0]
+
+            with self._transaction() as conn:
+                row = conn.execute(
+                    "SELECT results, created_at FROM search_results WHERE title = ? AND year = ?",
+                    key
+                ).fetchone()
+
+                if row is not None and now - row[1] < self.ttl_seconds:
+                    conn.execute(
+                        "UPDATE search_results SET accessed_at = ? WHERE title = ? AND year = ?",
+                        (now, *key)
+                    )
+                    self._count("hits")
+                    self._flush(conn)
+                    self.hits += 1
+                    record("cache_hits")
+                    results = json.loads(row[0])
+                    self._remember(key, results, row[1])
+                    return results
+
+                if row is not None:
+                    conn.execute(
+                        "DELETE FROM search_results WHERE title = ? AND year = ?", key
+                    )
+                self._memory.pop(key, None)
+                self._count("misses")
+                self._flush(conn)
+                self.misses += 1
+                record("cache_misses")
+                return None
+
+    def set(self, title: str, year, results: List[Dict]):
+        """Store parsed results for a movie and evict the oldest entries over the cap."""
+        key = normalize_key(title, year)
+        now = time.time()
+
+        with self._lock:
+            self._remember(key, results, now)
+            with self._transaction() as conn:
+                self._flush(conn)
+                conn.execute(
+                    "INSERT OR REPLACE INTO search_results "
+                    "(title, year, results, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                    (*key, json.dumps(results), now, now)
+                )
+                conn.execute(
+                    "DELETE FROM search_results WHERE created_at < ?",
+                    (now - self.ttl_seconds,)
+                )
+                conn.execute("""
+                    DELETE FROM search_results WHERE rowid IN (
+                        SELECT rowid FROM search_results
+                        ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                    )
+                """, (self.max_entries,))
+
+    def _remember(self, key: Tuple[str, str], results: List[Dict], created_at: float):
+        self._memory[key] = (results, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def flush(self):
+        """Write pending counters and access times to SQLite."""
+        with self._lock, self._transaction() as conn:
+            self._flush(conn)
+
+    def clear(self):
+        """Drop every cached entry (counters are kept)."""
+        with self._lock:
+            self._memory.clear()
+            with self._transaction() as conn:
+                conn.execute("DELETE FROM search_results")
+
+    def stats(self) -> Dict:
+        """Return hit/miss counters for this process and across all runs."""
+        with self._lock, self._transaction() as conn:
+            self._flush(conn)
+            counters = dict(conn.execute("SELECT name, value FROM cache_counters").fetchall())
+            entries = conn.execute("SELECT COUNT(*) FROM search_results").fetchone()[0]
+
+        total_hits = counters.get("hits", 0)
+        total_misses = counters.get("misses", 0)
+        total_lookups = total_hits + total_misses
+
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "total_hits": total_hits,
+            "total_misses": total_misses,
+            "hit_rate": total_hits / total_lookups if total_lookups else 0.0,
+            "entries": entries,
+            "memory_entries": len(self._memory)
+        }
+
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_search_cache() -> SearchCache:
+    """Return the process-wide search cache backed by the shared SQLite file."""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = SearchCache()
+            atexit.register(_shared_cache.flush)
+        return _shared_cache
@@ -54,6 +54,9 @@ def test_youtube_search():
                 print(f"   URL: {best_match['url']}")
             else:
                 print("⚠️  No best match found")
+            
+            cache_stats = searcher.cache_stats()
+            print(f"✅ Search cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses this run")
         else:
             print("❌ No results found")
             return False
@@ -2,7 +2,9 @@ import json
 import os
 from datetime import datetime, timedelta
 from typing import Dict, List
-from config import DATA_DIR, MOVIES_DB_FILE, RECOMMENDATIONS_FILE
+from config import DATA_DIR, MOVIES_DB_FILE
+from exporter import export_recommendations
+from recommendation_store import get_recommendation_store
 
 
 def ensure_data_directory():
@@ -11,25 +13,15 @@ def ensure_data_directory():
         os.makedirs(DATA_DIR)
 
 
-def save_recommendations(recommendations: List[Dict], date: str = None):
-    """Save daily recommendations to file."""
-    ensure_data_directory()
-    
+def save_recommendations(recommendations: List[Dict], date: str = None, genre: str = None):
+    """Save daily recommendations to the store."""
     if date is None:
         date = datetime.now().strftime("%Y-%m-%d")
     
-    data = {
-        "date": date,
-        "recommendations": recommendations,
-        "generated_at": datetime.now().isoformat()
-    }
-    
-    # Load existing recommendations
-    existing_data = load_all_recommendations()
-    existing_data[date] = data
+    if genre is None:
+        genre = get_genre_for_date(datetime.strptime(date, "%Y-%m-%d"))
     
-    with open(RECOMMENDATIONS_FILE, 'w') as f:
-        json.dump(existing_data, f, indent=2)
+    get_recommendation_store().save_day(date, recommendations, genre)
 
 
 def load_recommendations(date: str = None) -> List[Dict]:
@@ -37,22 +29,18 @@ def load_recommendations(date: str = None) -> List[Dict]:
     if date is None:
         date = datetime.now().strftime("%Y-%m-%d")
     
-    all_recommendations = load_all_recommendations()
-    return all_recommendations.get(date, {}).get("recommendations", [])
+    day_data = get_recommendation_store().get_day(date)
+    return day_data.get("recommendations", []) if day_data else []
 
 
 def load_all_recommendations() -> Dict:
-    """Load all recommendations from file."""
-    ensure_data_directory()
-    
-    if not os.path.exists(RECOMMENDATIONS_FILE):
-        return {}
-    
-    try:
-        with open(RECOMMENDATIONS_FILE, 'r') as f:
-            return json.load(f)
-    except (json.JSONDecodeError, FileNotFoundError):
-        return {}
+    """Load all recommendations keyed by date."""
+    return get_recommendation_store().get_range()
+
+
+def load_recommendations_range(start: str = None, end: str = None) -> Dict:
+    """Load recommendations between two dates (inclusive) keyed by date."""
+    return get_recommendation_store().get_range(start, end)
 
 
 def save_movie_database(movies: List[Dict]):
@@ -69,19 +57,29 @@ def save_movie_database(movies: List[Dict]):
         json.dump(data, f, indent=2)
 
 
+_movie_db_cache = {"mtime": None, "movies": []}
+
+
 def load_movie_database() -> List[Dict]:
-    """Load movie database from file."""
+    """Load movie database from file, re-reading it only when it changes."""
     ensure_data_directory()
     
     if not os.path.exists(MOVIES_DB_FILE):
         return []
     
+    mtime = os.path.getmtime(MOVIES_DB_FILE)
+    if _movie_db_cache["mtime"] == mtime:
+        return _movie_db_cache["movies"]
+    
     try:
         with open(MOVIES_DB_FILE, 'r') as f:
             data = json.load(f)
-            return data.get("movies", [])
+            movies = data.get("movies", [])
     except (json.JSONDecodeError, FileNotFoundError):
         return []
+    
+    _movie_db_cache.update(mtime=mtime, movies=movies)
+    return movies
 
 
 def format_movie_for_display(movie: Dict) -> str:
@@ -125,80 +123,29 @@ def get_genre_for_date(date: datetime = None) -> str:
 
 
 def get_stats() -> Dict:
-    """Get statistics about the recommendation system."""
-    all_recommendations = load_all_recommendations()
-    movie_db = load_movie_database()
-    
-    total_days = len(all_recommendations)
-    total_movies_recommended = sum(
-        len(day_data.get("recommendations", [])) 
-        for day_data in all_recommendations.values()
-    )
-    
-    # Genre distribution
-    genre_count = {}
-    for day_data in all_recommendations.values():
-        for movie in day_data.get("recommendations", []):
-            # Try to extract genre from the day's data or movie data
-            # This is a simplified approach
-            pass
+    """Get statistics about the recommendation system from the running aggregates."""
+    stats = get_recommendation_store().stats()
     
     return {
-        "total_days": total_days,
-        "total_movies_recommended": total_movies_recommended,
-        "movies_in_database": len(movie_db),
-        "last_recommendation_date": max(all_recommendations.keys()) if all_recommendations else None
+        "total_days": stats["total_days"],
+        "total_movies_recommended": stats["total_movies"],
+        "movies_in_database": len(load_movie_database()),
+        "last_recommendation_date": stats["last_date"],
+        "genre_distribution": stats["genre_distribution"],
+        "channel_distribution": stats["channel_distribution"],
+        "average_duration_minutes": stats["average_duration_minutes"]
     }
 
 
 def clean_old_recommendations(days_to_keep: int = 30):
     """Clean old recommendations to save space."""
-    all_recommendations = load_all_recommendations()
     cutoff_date = datetime.now() - timedelta(days=days_to_keep)
     cutoff_str = cutoff_date.strftime("%Y-%m-%d")
     
-    cleaned_data = {
-        date: data for date, data in all_recommendations.items()
-        if date >= cutoff_str
-    }
-    
-    with open(RECOMMENDATIONS_FILE, 'w') as f:
-        json.dump(cleaned_data, f, indent=2)
-    
-    removed_count = len(all_recommendations) - len(cleaned_data)
-    return removed_count
-
-
-def export_recommendations_csv(output_file: str = "recommendations_export.csv"):
-    """Export all recommendations to CSV format."""
-    import csv
-    
-    all_recommendations = load_all_recommendations()
-    
-    with open(output_file, 'w', newline='', encoding='utf-8') as csvfile:
-        fieldnames = [
-            'date', 'title', 'year', 'description', 'genre_analysis', 
-            'cast_crew', 'youtube_url', 'youtube_title', 'duration', 'channel'
-        ]
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        
-        for date, day_data in all_recommendations.items():
-            for movie in day_data.get("recommendations", []):
-                youtube_data = movie.get('youtube_data', {})
-                
-                row = {
-                    'date': date,
-                    'title': movie.get('title', ''),
-                    'year': movie.get('year', ''),
-                    'description': movie.get('description', ''),
-                    'genre_analysis': movie.get('genre_analysis', ''),
-                    'cast_crew': movie.get('cast_crew', ''),
-                    'youtube_url': youtube_data.get('url', ''),
-                    'youtube_title': youtube_data.get('title', ''),
-                    'duration': youtube_data.get('duration', ''),
-                    'channel': youtube_data.get('channel', '')
-                }
-                writer.writerow(row)
-    
-    return output_file
+    return get_recommendation_store().delete_before(cutoff_str)
+
+
+def export_recommendations_csv(output_file: str = "recommendations_export.csv",
+                               start: str = None, end: str = None):
+    """Export recommendations (optionally between two dates) to CSV format."""
+    return export_recommendations(output_file, 'csv', start, end)
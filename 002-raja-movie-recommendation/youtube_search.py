@@ -1,62 +1,244 @@
 import json
+import random
 import requests
-from typing import List, Dict, Optional
+import threading
+import time
+from typing import Any, Callable, List, Dict, Optional
 from youtubesearchpython import VideosSearch
-from config import YOUTUBE_API_KEY, MAX_SEARCH_RESULTS, SEARCH_QUERY_TEMPLATE
+from config import (
+    YOUTUBE_API_KEY, MAX_SEARCH_RESULTS, SEARCH_QUERY_TEMPLATE,
+    YOUTUBE_REQUESTS_PER_SECOND, YOUTUBE_REQUEST_BURST, YOUTUBE_QUEUE_TIMEOUT,
+    YOUTUBE_MAX_RETRIES, YOUTUBE_RETRY_BASE_SECONDS, YOUTUBE_BREAKER_FAILURES,
+    YOUTUBE_BREAKER_COOLDOWN_SECONDS
+)
+from ranking import (
+    RankingEngine, VideoCandidate, is_feature_length, parse_duration_seconds, parse_view_count
+)
+from metrics import record
+from search_cache import SearchCache, get_search_cache
+
+
+class YouTubeUnavailableError(Exception):
+    """YouTube is throttling or unreachable, as opposed to a movie not being found."""
+
+
+class YouTubeRequestScheduler:
+    """Process-wide pacing for YouTube requests: token bucket, jittered retries and a circuit breaker."""
+
+    def __init__(self, rate: float = YOUTUBE_REQUESTS_PER_SECOND,
+                 burst: int = YOUTUBE_REQUEST_BURST,
+                 queue_timeout: float = YOUTUBE_QUEUE_TIMEOUT,
+                 max_retries: int = YOUTUBE_MAX_RETRIES,
+                 retry_base: float = YOUTUBE_RETRY_BASE_SECONDS,
+                 failure_threshold: int = YOUTUBE_BREAKER_FAILURES,
+                 cooldown: float = YOUTUBE_BREAKER_COOLDOWN_SECONDS):
+        self.rate = rate
+        self.burst = burst
+        self.queue_timeout = queue_timeout
+        self.max_retries = max_retries
+        self.retry_base = retry_base
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+
+        self._tokens = float(burst)
+        self._refilled_at = time.monotonic()
+        self._condition = threading.Condition()
+        self._waiting = 0
+        self._in_flight = 0
+        self._consecutive_failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self._counters = {
+            "requests": 0, "retries": 0, "failures": 0,
+            "rejected_open": 0, "rejected_queue": 0, "circuit_opens": 0
+        }
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def _acquire(self) -> bool:
+        """Wait for a token; returns True if this request is the circuit's trial request.
+
+        The number of callers waiting here is the queue depth.
+        """
+        with self._condition:
+            self._check_circuit(claim_trial=False)
+            if self.rate <= 0:
+                return self._start_request()
+
+            deadline = time.monotonic() + self.queue_timeout
+            self._waiting += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if self._tokens >= 1:
+                        trial = self._start_request()
+                        self._tokens -= 1
+                        return trial
+                    if now >= deadline:
+                        self._counters["rejected_queue"] += 1
+                        record("youtube_rejected")
+                        raise YouTubeUnavailableError(
+                            f"YouTube request queue full: waited {self.queue_timeout:.0f}s for a slot"
+                        )
+                    self._condition.wait(min(deadline - now, (1 - self._tokens) / self.rate))
+                    # The circuit may have opened while this caller was queued
+                    self._check_circuit(claim_trial=False)
+            finally:
+                self._waiting -= 1
+
+    def _start_request(self) -> bool:
+        trial = self._check_circuit(claim_trial=True)
+        self._in_flight += 1
+        self._counters["requests"] += 1
+        return trial
+
+    def _check_circuit(self, claim_trial: bool) -> bool:
+        """Fail fast while the circuit is open; after the cooldown one trial request may pass."""
+        if self._opened_at is None:
+            return False
+        if time.monotonic() - self._opened_at >= self.cooldown and not self._trial_running:
+            if claim_trial:
+                self._trial_running = True
+                return True
+            return False
+        self._counters["rejected_open"] += 1
+        record("youtube_rejected")
+        raise YouTubeUnavailableError("YouTube circuit open after repeated failures; failing fast")
+
+    def _release(self, succeeded: bool, trial: bool):
+        with self._condition:
+            self._in_flight -= 1
+            if trial:
+                self._trial_running = False
+            if succeeded:
+                self._consecutive_failures = 0
+                self._opened_at = None
+            else:
+                self._consecutive_failures += 1
+                self._counters["failures"] += 1
+                if trial or (self._opened_at is None
+                             and self._consecutive_failures >= self.failure_threshold):
+                    if self._opened_at is None:
+                        self._counters["circuit_opens"] += 1
+                        print(f"⚠️  YouTube circuit opened after {self._consecutive_failures} failures")
+                    # A failed trial restarts the cooldown
+                    self._opened_at = time.monotonic()
+            self._condition.notify_all()
+
+    def call(self, func: Callable[..., Any], *args) -> Any:
+        """Run func under the rate limit, retrying transient failures with jittered backoff."""
+        attempt = 0
+        while True:
+            trial = self._acquire()
+            try:
+                result = func(*args)
+            except Exception as e:
+                self._release(succeeded=False, trial=trial)
+                if attempt >= self.max_retries or self._opened_at is not None:
+                    raise YouTubeUnavailableError(str(e)) from e
+                attempt += 1
+                with self._condition:
+                    self._counters["retries"] += 1
+                # Full jitter keeps concurrent retries from arriving together
+                time.sleep(random.uniform(0, self.retry_base * 2 ** attempt))
+                continue
+            self._release(succeeded=True, trial=trial)
+            return result
+
+    def stats(self) -> Dict:
+        """Queue depth, circuit state and request/rejection counters."""
+        with self._condition:
+            if self._opened_at is None:
+                state = "closed"
+            elif time.monotonic() - self._opened_at >= self.cooldown:
+                state = "half-open"
+            else:
+                state = "open"
+            return {
+                "queue_depth": self._waiting,
+                "in_flight": self._in_flight,
+                "circuit": state,
+                "consecutive_failures": self._consecutive_failures,
+                "rejected": self._counters["rejected_open"] + self._counters["rejected_queue"],
+                **self._counters
+            }
+
+
+_shared_scheduler = None
+_shared_scheduler_lock = threading.Lock()
+
+
+def get_request_scheduler() -> YouTubeRequestScheduler:
+    """Return the scheduler shared by every YouTubeSearcher in the process."""
+    global _shared_scheduler
+    with _shared_scheduler_lock:
+        if _shared_scheduler is None:
+            _shared_scheduler = YouTubeRequestScheduler()
+        return _shared_scheduler
 
 
 class YouTubeSearcher:
-    def __init__(self):
+    def __init__(self, cache: Optional[SearchCache] = None,
+                 scheduler: Optional[YouTubeRequestScheduler] = None):
         self.api_key = YOUTUBE_API_KEY
+        self.cache = cache if cache is not None else get_search_cache()
+        self.scheduler = scheduler if scheduler is not None else get_request_scheduler()
+        self.ranking_engine = RankingEngine()
         
     def search_movie(self, title: str, year: int) -> List[Dict]:
-        """Search for a movie on YouTube and return video details."""
+        """Search for a movie on YouTube and return video details.
+        
+        Raises YouTubeUnavailableError when YouTube is throttling or down, so callers
+        can tell that apart from a movie with no full-length upload.
+        """
+        cached = self.cache.get(title, year)
+        if cached is not None:
+            return cached
+        
+        # Failed lookups are not cached so the next run retries them
+        movies = self.scheduler.call(self._fetch_results, title, year)
+        self.cache.set(title, year, movies)
+        return movies
+    
+    def _fetch_results(self, title: str, year: int) -> List[Dict]:
+        """Run the YouTube search and parse the full-length results."""
         query = SEARCH_QUERY_TEMPLATE.format(title=title, year=year)
+        record("youtube_requests")
         
-        try:
-            # Use youtube-search-python for basic search
-            videos_search = VideosSearch(query, limit=MAX_SEARCH_RESULTS)
-            results = videos_search.result()
-            
-            movies = []
-            for video in results['result']:
-                # Filter for longer videos (likely full movies)
-                duration = self._parse_duration(video.get('duration', ''))
-                if duration and duration > 60:  # At least 60 minutes
-                    movie_data = {
-                        'title': video['title'],
-                        'url': video['link'],
-                        'thumbnail': video['thumbnails'][0]['url'] if video['thumbnails'] else '',
-                        'duration': video['duration'],
-                        'channel': video['channel']['name'],
-                        'views': video['viewCount']['text'] if video.get('viewCount') else 'N/A',
-                        'published': video.get('publishedTime', 'N/A'),
-                        'description': video.get('descriptionSnippet', [{}])[0].get('text', '') if video.get('descriptionSnippet') else ''
-                    }
-                    movies.append(movie_data)
-            
-            return movies
-            
-        except Exception as e:
-            print(f"Error searching for {title} ({year}): {str(e)}")
-            return []
+        # Use youtube-search-python for basic search
+        videos_search = VideosSearch(query, limit=MAX_SEARCH_RESULTS)
+        results = videos_search.result()
+        
+        movies = []
+        for video in results['result']:
+            # Filter for longer videos (likely full movies)
+            duration_seconds = parse_duration_seconds(video.get('duration', ''))
+            if is_feature_length(duration_seconds):
+                views = video['viewCount']['text'] if video.get('viewCount') else 'N/A'
+                movie_data = {
+                    'title': video['title'],
+                    'url': video['link'],
+                    'thumbnail': video['thumbnails'][0]['url'] if video['thumbnails'] else '',
+                    'duration': video['duration'],
+                    'channel': video['channel']['name'],
+                    'views': views,
+                    'published': video.get('publishedTime', 'N/A'),
+                    'description': video.get('descriptionSnippet', [{}])[0].get('text', '') if video.get('descriptionSnippet') else '',
+                    # Numeric features parsed once here so ranking never re-parses
+                    'duration_seconds': duration_seconds,
+                    'view_count': parse_view_count(views)
+                }
+                movies.append(movie_data)
+        
+        return movies
     
     def _parse_duration(self, duration_str: str) -> Optional[int]:
         """Parse duration string and return minutes."""
-        if not duration_str:
-            return None
-            
-        try:
-            # Handle formats like "1:30:45" or "45:30"
-            parts = duration_str.split(':')
-            if len(parts) == 3:  # hours:minutes:seconds
-                return int(parts[0]) * 60 + int(parts[1])
-            elif len(parts) == 2:  # minutes:seconds
-                return int(parts[0])
-            else:
-                return None
-        except (ValueError, IndexError):
-            return None
+        seconds = parse_duration_seconds(duration_str)
+        return seconds // 60 if seconds is not None else None
     
     def verify_movie_availability(self, title: str, year: int) -> bool:
         """Check if a movie is available on YouTube."""
@@ -65,19 +247,20 @@ class YouTubeSearcher:
     
     def get_best_match(self, title: str, year: int) -> Optional[Dict]:
         """Get the best matching video for a movie."""
-        results = self.search_movie(title, year)
-        if not results:
-            return None
-            
-        # Sort by duration (longer videos first) and views
-        def score_video(video):
-            duration = self._parse_duration(video['duration']) or 0
-            # Simple scoring: prioritize longer videos
-            return duration
-            
-        best_match = max(results, key=score_video)
-        return best_match
-
+        return self.pick_best_match(self.search_movie(title, year))
+    
+    def pick_best_match(self, results: List[Dict]) -> Optional[Dict]:
+        """Pick the best video from results already returned by search_movie."""
+        best = self.ranking_engine.best([VideoCandidate(video) for video in results])
+        return best.data if best else None
+    
+    def cache_stats(self) -> Dict:
+        """Return search cache hit/miss counters."""
+        return self.cache.stats()
+    
+    def request_stats(self) -> Dict:
+        """Return the request scheduler's queue depth, circuit state and rejections."""
+        return self.scheduler.stats()
 
 def test_youtube_search():
     """Test the YouTube search functionality."""
@@ -1,8 +1,14 @@
 import streamlit as st
-import ollama
+import time
 from PIL import Image
 import io
 import base64
+from ocr import (
+    DEFAULT_CONCURRENCY, MAX_CONCURRENCY, ocr_stream, ocr_batch, latency_stats,
+    build_markdown_report, build_zip_export
+)
+from ocr_cache import get_ocr_cache
+from preprocess import prepare_image
 
 # Page configuration
 st.set_page_config(
@@ -19,46 +25,175 @@ st.markdown("# Llava OCR")
 col1, col2 = st.columns([6,1])
 with col2:
     if st.button("Clear 🗑️"):
-        if 'ocr_result' in st.session_state:
-            del st.session_state['ocr_result']
+        for key in ('ocr_result', 'ocr_transfer', 'batch_results', 'batch_stats'):
+            if key in st.session_state:
+                del st.session_state[key]
         st.rerun()
 
 st.markdown('<p style="margin-top: -20px;">Extract structured text from images using Llava Vision!</p>', unsafe_allow_html=True)
 st.markdown("---")
 
+STREAM_RENDER_INTERVAL = 0.1  # Seconds between Markdown re-renders while tokens arrive
+
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def prepare_upload(image_bytes):
+    """Decode an upload once per distinct file, for both display and OCR."""
+    return prepare_image(image_bytes, keep_image=True)
+
+
+def describe_transfer(result):
+    if result.get('cached'):
+        return (f"⚡ From cache in {result['latency'] * 1000:.0f} ms "
+                f"(originally took {result['saved_seconds']:.1f}s)")
+    return (f"{result['tiles']} tile{'s' if result['tiles'] != 1 else ''}, "
+            f"sent {result['bytes_sent'] / 1024:.0f} KB of {result['bytes_original'] / 1024:.0f} KB, "
+            f"preprocess {result['preprocess_seconds'] * 1000:.0f} ms, OCR {result['ocr_seconds']:.1f}s"
+            + (f", first token {result['first_token_seconds']:.1f}s, {result['tokens_per_second']:.1f} tok/s"
+               if result.get('first_token_seconds') is not None else ""))
+
+
+def describe_stream(update):
+    if update['first_token_seconds'] is None:
+        return "Waiting for the first token..."
+    return (f"First token after {update['first_token_seconds']:.1f}s · "
+            f"{update['tokens']} tokens · {update['tokens_per_second']:.1f} tok/s")
+
+
+def render_batch_summary(stats):
+    cols = st.columns(5)
+    cols[0].metric("Images", stats['images'])
+    cols[1].metric("Failed", stats['failed'])
+    cols[2].metric("p50 latency", f"{stats['p50']:.1f}s")
+    cols[3].metric("p95 latency", f"{stats['p95']:.1f}s")
+    if 'images_per_minute' in stats:
+        cols[4].metric("Throughput", f"{stats['images_per_minute']:.1f}/min")
+    st.caption(f"Sent {stats['bytes_sent'] / 1024 / 1024:.1f} MB to the model "
+               f"for {stats['bytes_original'] / 1024 / 1024:.1f} MB of uploads"
+               + (f"; {stats['cache_hits']} served from cache, saving {stats['saved_seconds']:.0f}s"
+                  if stats.get('cache_hits') else ""))
+
+
+def render_batch_result(result):
+    label = f"{result['index'] + 1}. {result['name']} ({result['latency']:.1f}s)"
+    icon = "❌ " if result['error'] else "⚡ " if result.get('cached') else "✅ "
+    with st.expander(icon + label):
+        st.caption(describe_transfer(result))
+        if result['error']:
+            st.error(f"Error processing image: {result['error']}")
+        else:
+            st.markdown(result['text'])
+
+
 # Move upload controls to sidebar
+run_single = False
 with st.sidebar:
-    st.header("Upload Image")
-    uploaded_file = st.file_uploader("Choose an image...", type=['png', 'jpg', 'jpeg'])
-    
-    if uploaded_file is not None:
-        # Display the uploaded image
-        image = Image.open(uploaded_file)
-        st.image(image, caption="Uploaded Image")
-        
-        if st.button("Extract Text 🔍", type="primary"):
-            with st.spinner("Processing image..."):
-                try:
-                    response = ollama.chat(
-                        model='llava',
-                        messages=[{
-                            'role': 'user',
-                            'content': """Analyze the text in the provided image. Extract all readable content
-                                        and present it in a structured Markdown format that is clear, concise, 
-                                        and well-organized. Ensure proper formatting (e.g., headings, lists, or
-                                        code blocks) as necessary to represent the content effectively.""",
-                            'images': [uploaded_file.getvalue()]
-                        }]
-                    )
-                    st.session_state['ocr_result'] = response.message.content
-                except Exception as e:
-                    st.error(f"Error processing image: {str(e)}")
+    mode = st.radio("Mode", ["Single image", "Batch"], horizontal=True)
+    use_cache = st.checkbox(
+        "Reuse cached results", value=True,
+        help="Identical images OCR'd before, in any session, are answered from the on-disk cache"
+    )
+    cache = get_ocr_cache() if use_cache else None
+
+    if mode == "Single image":
+        st.header("Upload Image")
+        uploaded_file = st.file_uploader("Choose an image...", type=['png', 'jpg', 'jpeg'])
+
+        if uploaded_file is not None:
+            try:
+                prepared = prepare_upload(uploaded_file.getvalue())
+            except Exception as e:
+                prepared = None
+                st.error(f"Could not read image: {str(e)}")
+
+            if prepared is not None:
+                # Display the decoded, upright image
+                st.image(prepared.image, caption="Uploaded Image")
+
+                run_single = st.button("Extract Text 🔍", type="primary")
+    else:
+        st.header("Upload Images")
+        uploaded_files = st.file_uploader(
+            "Choose images...", type=['png', 'jpg', 'jpeg'], accept_multiple_files=True
+        )
+        concurrency = st.slider(
+            "Concurrent requests", 1, MAX_CONCURRENCY, DEFAULT_CONCURRENCY,
+            help="Requests in flight against the Ollama server; set OLLAMA_NUM_PARALLEL to match"
+        )
+        run_batch = st.button(
+            f"Extract Text from {len(uploaded_files)} Images 🔍", type="primary",
+            disabled=not uploaded_files
+        )
 
 # Main content area for results
-if 'ocr_result' in st.session_state:
-    st.markdown(st.session_state['ocr_result'])
+if mode == "Single image":
+    if run_single:
+        status = st.empty()
+        output = st.empty()
+        last_render = 0.0
+
+        # Re-render the growing Markdown at a steady rate rather than once per token
+        for update in ocr_stream(uploaded_file.getvalue(), prepared, name=uploaded_file.name, cache=cache):
+            result = update['result']
+            if result is None and time.perf_counter() - last_render < STREAM_RENDER_INTERVAL:
+                continue
+            status.caption(describe_stream(update))
+            output.markdown(update['text'] + ("" if result else " ▌"))
+            last_render = time.perf_counter()
+
+        if result['error']:
+            status.empty()
+            output.empty()
+            st.error(f"Error processing image: {result['error']}")
+        else:
+            st.session_state['ocr_result'] = result['text']
+            st.session_state['ocr_transfer'] = describe_transfer(result)
+            st.rerun()
+
+    elif 'ocr_result' in st.session_state:
+        if st.session_state.get('ocr_transfer'):
+            st.caption(st.session_state['ocr_transfer'])
+        st.markdown(st.session_state['ocr_result'])
+    else:
+        st.info("Upload an image and click 'Extract Text' to see the results here.")
 else:
-    st.info("Upload an image and click 'Extract Text' to see the results here.")
+    if run_batch:
+        images = [(file.name, file.getvalue()) for file in uploaded_files]
+        progress = st.progress(0.0, text=f"0 / {len(images)} images")
+        results = []
+        start = time.perf_counter()
+
+        # Results are shown as soon as each request finishes
+        for result in ocr_batch(images, concurrency, cache=cache):
+            results.append(result)
+            progress.progress(len(results) / len(images), text=f"{len(results)} / {len(images)} images")
+            render_batch_result(result)
+
+        st.session_state['batch_results'] = sorted(results, key=lambda r: r['index'])
+        st.session_state['batch_stats'] = latency_stats(results, time.perf_counter() - start)
+        st.rerun()
+
+    if st.session_state.get('batch_results'):
+        results = st.session_state['batch_results']
+        stats = st.session_state['batch_stats']
+        render_batch_summary(stats)
+
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button(
+                "Download Markdown 📄", build_markdown_report(results, stats),
+                file_name="ocr_results.md", mime="text/markdown"
+            )
+        with col2:
+            st.download_button(
+                "Download ZIP 🗜️", build_zip_export(results, stats),
+                file_name="ocr_results.zip", mime="application/zip"
+            )
+
+        for result in results:
+            render_batch_result(result)
+    else:
+        st.info("Upload images and click 'Extract Text' to OCR them as a batch.")
 
 # Footer
 st.markdown("---")
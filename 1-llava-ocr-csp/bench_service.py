@@ -0,0 +1,104 @@
+import argparse
+import glob
+import io
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+import requests
+from PIL import Image, ImageDraw
+
+
+def synthetic_page(number: int) -> bytes:
+    """A small text-like page, different per number so the result cache can be bypassed."""
+    image = Image.new("L", (600, 800), 255)
+    draw = ImageDraw.Draw(image)
+    for line in range(30):
+        draw.text((40, 30 + line * 25), f"Page {number} line {line}: lorem ipsum dolor sit amet", fill=0)
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def load_images(paths: List[str], count: int) -> List[Tuple[str, bytes]]:
+    files = sorted(path for pattern in paths for path in glob.glob(pattern))
+    if not files:
+        return [(f"page_{number}.png", synthetic_page(number)) for number in range(count)]
+    images = []
+    for number in range(count):
+        path = files[number % len(files)]
+        with open(path, "rb") as f:
+            images.append((os.path.basename(path), f.read()))
+    return images
+
+
+def send(url: str, name: str, image_bytes: bytes, use_cache: bool, timeout: float) -> Dict:
+    start = time.perf_counter()
+    try:
+        response = requests.post(
+            f"{url}/ocr", params={"cache": str(use_cache).lower()},
+            files={"file": (name, image_bytes)}, timeout=timeout
+        )
+        status = response.status_code
+    except requests.RequestException:
+        status = 0
+    return {"status": status, "latency": time.perf_counter() - start}
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def run(url: str, images: List[Tuple[str, bytes]], clients: int, use_cache: bool, timeout: float) -> Dict:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        results = list(executor.map(lambda image: send(url, *image, use_cache, timeout), images))
+    wall = time.perf_counter() - start
+
+    ok = [result["latency"] for result in results if result["status"] == 200]
+    return {
+        "requests": len(results),
+        "ok": len(ok),
+        "rejected": sum(1 for result in results if result["status"] == 429),
+        "errors": sum(1 for result in results if result["status"] not in (200, 429)),
+        "wall": wall,
+        "throughput": len(ok) / wall if wall else 0.0,
+        "mean": statistics.mean(ok) if ok else 0.0,
+        "p50": percentile(ok, 0.5) if ok else 0.0,
+        "p95": percentile(ok, 0.95) if ok else 0.0,
+        "p99": percentile(ok, 0.99) if ok else 0.0
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the OCR service")
+    parser.add_argument("images", nargs="*", help="Image files or globs (default: synthetic pages)")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--requests", type=int, default=40, help="Total requests to send")
+    parser.add_argument("--clients", type=int, default=8, help="Concurrent clients")
+    parser.add_argument("--cache", action="store_true", help="Allow answers from the result cache")
+    parser.add_argument("--timeout", type=float, default=300.0)
+    args = parser.parse_args()
+
+    images = load_images(args.images, args.requests)
+    print(f"📤 Sending {len(images)} requests from {args.clients} clients to {args.url}")
+    report = run(args.url, images, args.clients, args.cache, args.timeout)
+
+    print(f"✅ {report['ok']} ok, ⛔ {report['rejected']} rejected (429), ❌ {report['errors']} errors")
+    print(f"⏱️  {report['wall']:.1f}s wall, {report['throughput']:.2f} images/s "
+          f"({report['throughput'] * 60:.0f}/min)")
+    print(f"📊 Latency mean {report['mean']:.2f}s, p50 {report['p50']:.2f}s, "
+          f"p95 {report['p95']:.2f}s, p99 {report['p99']:.2f}s")
+
+    try:
+        server = requests.get(f"{args.url}/stats", timeout=10).json()
+        print(f"🖥️  Server: {server['completed']} completed, {server['rejected']} rejected, "
+              f"queue wait p95 {server['queue_wait'].get('p95', 0):.2f}s")
+    except (requests.RequestException, ValueError, KeyError):
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,393 @@
+import csv
+import io
+import queue
+import statistics
+import threading
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+import ollama
+import preprocess
+from ocr_cache import OcrCache, content_key
+from preprocess import PreparedImage, prepare_image, stitch_texts
+
+MODEL_NAME = "llava"
+DEFAULT_CONCURRENCY = 2  # Match OLLAMA_NUM_PARALLEL on the server
+MAX_CONCURRENCY = 8
+PREPROCESS_WORKERS = 2  # Decoding and resizing run ahead of the OCR requests
+
+OCR_PROMPT = """Analyze the text in the provided image. Extract all readable content
+                                        and present it in a structured Markdown format that is clear, concise,
+                                        and well-organized. Ensure proper formatting (e.g., headings, lists, or
+                                        code blocks) as necessary to represent the content effectively."""
+
+
+def _messages(image_bytes: bytes) -> List[Dict]:
+    return [{
+        'role': 'user',
+        'content': OCR_PROMPT,
+        'images': [image_bytes]
+    }]
+
+
+def extract_text(image_bytes: bytes, model: str = MODEL_NAME) -> str:
+    """Run one OCR request against the Ollama server and return the Markdown."""
+    response = ollama.chat(model=model, messages=_messages(image_bytes))
+    return response.message.content
+
+
+def _stream_tile(tile: bytes, number: int, events: queue.Queue, stop: threading.Event,
+                 model: str = MODEL_NAME):
+    """Stream one tile's OCR, posting ("token", ...) events and a final ("done"/"error", ...) event.
+
+    Setting `stop` abandons the stream, which closes the request and ends generation.
+    """
+    start = time.perf_counter()
+    chunks = 0
+    eval_count = None
+    try:
+        for chunk in ollama.chat(model=model, messages=_messages(tile), stream=True):
+            if stop.is_set():
+                return
+            if chunk.message.content:
+                chunks += 1
+                events.put(("token", number, chunk.message.content, time.perf_counter()))
+            if chunk.done:
+                eval_count = chunk.eval_count
+    except Exception as e:
+        events.put(("error", number, str(e), (start, time.perf_counter())))
+        return
+    # Ollama reports the generated token count on the final chunk; chunks are a close fallback
+    events.put(("done", number, eval_count or chunks, (start, time.perf_counter())))
+
+
+def _preprocess_variant() -> str:
+    # Preprocessing changes what the model sees, so its settings are part of the cache key
+    return (f"max_pixels={preprocess.MAX_PIXELS};max_side={preprocess.MAX_SIDE};"
+            f"tile_aspect={preprocess.TILE_ASPECT};tile_overlap={preprocess.TILE_OVERLAP};"
+            f"gray={preprocess.GRAYSCALE_TOLERANCE};quality={preprocess.JPEG_QUALITY};"
+            f"low_colour={preprocess.LOW_COLOUR_LIMIT};flatten=white")
+
+
+def cache_key(image_bytes: bytes, model: str = MODEL_NAME) -> str:
+    """Content address of an upload's OCR output: image bytes, prompt, model and preprocessing."""
+    return content_key(image_bytes, OCR_PROMPT, model, _preprocess_variant())
+
+
+def _timed_extract(tile: bytes) -> Tuple[str, float, float]:
+    start = time.perf_counter()
+    text = extract_text(tile)
+    return text, start, time.perf_counter()
+
+
+def _result(index: int, name: str, prepared: Optional[PreparedImage], texts: List[str],
+            spans: List[Tuple[float, float]], error: Optional[str]) -> Dict:
+    # Tiles run in parallel, so OCR time is from the first request start to the last finish
+    ocr_seconds = max(end for _, end in spans) - min(start for start, _ in spans) if spans else 0.0
+    preprocess_seconds = prepared.preprocess_seconds if prepared else 0.0
+    return {
+        "index": index,
+        "name": name,
+        "text": "" if error else stitch_texts(texts),
+        "error": error,
+        "tiles": len(prepared.tiles) if prepared else 0,
+        "bytes_original": prepared.original_bytes if prepared else 0,
+        "bytes_sent": prepared.sent_bytes if prepared else 0,
+        "preprocess_seconds": preprocess_seconds,
+        "ocr_seconds": ocr_seconds,
+        "latency": preprocess_seconds + ocr_seconds,
+        "cached": False,
+        "saved_seconds": 0.0
+    }
+
+
+def cached_result(image_bytes: bytes, cache: OcrCache, index: int = 0, name: str = "image") -> Optional[Dict]:
+    """The stored result for an identical upload, or None; skips preprocessing entirely."""
+    start = time.perf_counter()
+    entry = cache.get(cache_key(image_bytes))
+    if entry is None:
+        return None
+    lookup_seconds = time.perf_counter() - start
+    return {
+        "index": index,
+        "name": name,
+        "text": entry["text"],
+        "error": None,
+        "tiles": 0,
+        "bytes_original": len(image_bytes),
+        "bytes_sent": 0,
+        "preprocess_seconds": 0.0,
+        "ocr_seconds": lookup_seconds,
+        "latency": lookup_seconds,
+        "cached": True,
+        "saved_seconds": entry["ocr_seconds"]
+    }
+
+
+def _store(cache: Optional[OcrCache], image_bytes: bytes, result: Dict):
+    # Failures are never cached so a retry reaches the model again
+    if cache is not None and not result["error"]:
+        cache.set(cache_key(image_bytes), result["text"], result["latency"])
+
+
+def ocr_prepared(prepared: PreparedImage, concurrency: int = DEFAULT_CONCURRENCY,
+                 index: int = 0, name: str = "image") -> Dict:
+    """OCR a preprocessed image's tiles in parallel and stitch them back in order."""
+    executor = ThreadPoolExecutor(max_workers=max(1, min(concurrency, MAX_CONCURRENCY)))
+    try:
+        futures = [executor.submit(_timed_extract, tile) for tile in prepared.tiles]
+        outcomes = [future.result() for future in futures]
+    except Exception as e:
+        return _result(index, name, prepared, [], [], str(e))
+    finally:
+        # After a failed tile (or an interrupt) the remaining tiles are not waited for
+        executor.shutdown(wait=False, cancel_futures=True)
+    return _result(index, name, prepared, [text for text, _, _ in outcomes],
+                   [(start, end) for _, start, end in outcomes], None)
+
+
+def ocr_image(image_bytes: bytes, prepared: Optional[PreparedImage] = None,
+              concurrency: int = DEFAULT_CONCURRENCY, name: str = "image",
+              cache: Optional[OcrCache] = None) -> Dict:
+    """OCR one upload, answering from the cache when the same image was read before."""
+    if cache is not None:
+        hit = cached_result(image_bytes, cache, name=name)
+        if hit is not None:
+            return hit
+
+    if prepared is None:
+        try:
+            prepared = prepare_image(image_bytes)
+        except Exception as e:
+            return _result(0, name, None, [], [], f"Could not read image: {e}")
+    result = ocr_prepared(prepared, concurrency, name=name)
+    _store(cache, image_bytes, result)
+    return result
+
+
+def _stream_update(text: str, start: float, first_token: Optional[float], tokens: int,
+                   result: Optional[Dict] = None) -> Dict:
+    now = time.perf_counter()
+    generating = now - first_token if first_token is not None else 0.0
+    return {
+        "text": text,
+        "first_token_seconds": first_token - start if first_token is not None else None,
+        "tokens": tokens,
+        "tokens_per_second": tokens / generating if generating > 0 else 0.0,
+        "result": result
+    }
+
+
+def ocr_stream(image_bytes: bytes, prepared: Optional[PreparedImage] = None,
+               concurrency: int = DEFAULT_CONCURRENCY, name: str = "image",
+               cache: Optional[OcrCache] = None) -> Iterator[Dict]:
+    """OCR one upload with streaming requests, yielding the Markdown as it grows.
+
+    Every update carries the text so far, time to first token and tokens per second;
+    the last one also carries the finished result dict under "result". Tiles still
+    run in parallel and their partial text is shown in tile order.
+    """
+    start = time.perf_counter()
+    if cache is not None:
+        hit = cached_result(image_bytes, cache, name=name)
+        if hit is not None:
+            yield _stream_update(hit["text"], start, None, 0, hit)
+            return
+
+    if prepared is None:
+        try:
+            prepared = prepare_image(image_bytes)
+        except Exception as e:
+            yield _stream_update("", start, None, 0, _result(0, name, None, [], [], f"Could not read image: {e}"))
+            return
+
+    events = queue.Queue()
+    texts = [""] * len(prepared.tiles)
+    spans = []
+    error = None
+    first_token = None
+    streamed = 0  # Chunks seen so far, for the live rate
+    counted = 0  # Tokens reported by finished tiles, for the final rate
+    left = len(prepared.tiles)
+
+    # Managed by hand: if the consumer stops iterating, the generator is closed and the
+    # finally below abandons the tiles instead of waiting for every one to finish
+    stop = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=max(1, min(concurrency, MAX_CONCURRENCY)))
+    try:
+        for number, tile in enumerate(prepared.tiles):
+            executor.submit(_stream_tile, tile, number, events, stop)
+
+        while left:
+            kind, number, value, detail = events.get()
+            if kind == "token":
+                texts[number] += value
+                first_token = first_token or detail
+                streamed += 1
+                yield _stream_update("\n\n".join(text for text in texts if text), start, first_token, streamed)
+                continue
+
+            left -= 1
+            spans.append(detail)
+            if kind == "error":
+                error = error or value
+            else:
+                counted += value
+    finally:
+        stop.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    result = _result(0, name, prepared, texts, spans, error)
+    update = _stream_update(result["text"], start, first_token, counted)
+    result.update(
+        first_token_seconds=update["first_token_seconds"],
+        tokens=update["tokens"],
+        tokens_per_second=update["tokens_per_second"]
+    )
+    _store(cache, image_bytes, result)
+    update["result"] = result
+    yield update
+
+
+def ocr_batch(images: Sequence[Tuple[str, bytes]], concurrency: int = DEFAULT_CONCURRENCY,
+              cache: Optional[OcrCache] = None) -> Iterator[Dict]:
+    """OCR (name, bytes) pairs with at most `concurrency` requests in flight, yielding results as they finish.
+
+    Images are preprocessed in a small side pool while earlier tiles are being OCR'd;
+    every tile of every image shares the same bounded request pool. Cache hits are
+    yielded first, before any work is queued.
+    """
+    # Managed by hand: if the consumer stops iterating, the generator is closed and the
+    # finally below drops queued pages and tiles instead of waiting for all of them
+    prepare_pool = ThreadPoolExecutor(max_workers=PREPROCESS_WORKERS)
+    request_pool = ThreadPoolExecutor(max_workers=max(1, min(concurrency, MAX_CONCURRENCY)))
+    outstanding = {}
+    try:
+        for index, (name, image_bytes) in enumerate(images):
+            hit = cached_result(image_bytes, cache, index, name) if cache is not None else None
+            if hit is not None:
+                yield hit
+                continue
+            outstanding[prepare_pool.submit(prepare_image, image_bytes)] = ("prepare", index, name)
+        pending = {}  # index -> tiles collected so far for an image
+
+        while outstanding:
+            done, _ = wait(outstanding, return_when=FIRST_COMPLETED)
+            for future in done:
+                kind, index, name, *tile_number = outstanding.pop(future)
+
+                if kind == "prepare":
+                    try:
+                        prepared = future.result()
+                    except Exception as e:
+                        yield _result(index, name, None, [], [], f"Could not read image: {e}")
+                        continue
+                    pending[index] = {
+                        "prepared": prepared, "texts": [None] * len(prepared.tiles),
+                        "spans": [], "left": len(prepared.tiles), "error": None
+                    }
+                    for number, tile in enumerate(prepared.tiles):
+                        outstanding[request_pool.submit(_timed_extract, tile)] = ("tile", index, name, number)
+                    continue
+
+                image = pending[index]
+                try:
+                    text, start, end = future.result()
+                    image["texts"][tile_number[0]] = text
+                    image["spans"].append((start, end))
+                except Exception as e:
+                    image["error"] = image["error"] or str(e)
+                image["left"] -= 1
+                if image["left"] == 0:
+                    del pending[index]
+                    result = _result(index, name, image["prepared"], image["texts"], image["spans"], image["error"])
+                    _store(cache, images[index][1], result)
+                    yield result
+    finally:
+        for future in outstanding:
+            future.cancel()
+        prepare_pool.shutdown(wait=False, cancel_futures=True)
+        request_pool.shutdown(wait=False, cancel_futures=True)
+
+
+def latency_stats(results: List[Dict], wall_seconds: float = None) -> Dict:
+    """Summary of per-image latency, plus throughput when the batch wall time is known."""
+    latencies = sorted(result["latency"] for result in results)
+    if not latencies:
+        return {}
+
+    stats = {
+        "images": len(latencies),
+        "failed": sum(1 for result in results if result["error"]),
+        "min": latencies[0],
+        "mean": statistics.mean(latencies),
+        "p50": latencies[len(latencies) // 2],
+        "p95": latencies[min(len(latencies) - 1, int(round(0.95 * (len(latencies) - 1))))],
+        "max": latencies[-1],
+        "bytes_original": sum(result.get("bytes_original", 0) for result in results),
+        "bytes_sent": sum(result.get("bytes_sent", 0) for result in results),
+        "cache_hits": sum(1 for result in results if result.get("cached")),
+        "saved_seconds": sum(result.get("saved_seconds", 0.0) for result in results)
+    }
+    if wall_seconds:
+        stats["wall"] = wall_seconds
+        stats["images_per_minute"] = len(latencies) / wall_seconds * 60
+    return stats
+
+
+def build_markdown_report(results: List[Dict], stats: Dict) -> str:
+    """Combine every page's Markdown, in upload order, with a latency table."""
+    lines = ["# OCR Batch Results", ""]
+    if stats:
+        lines += [
+            f"{stats['images']} images, {stats['failed']} failed. "
+            f"Latency p50 {stats['p50']:.1f}s, p95 {stats['p95']:.1f}s, max {stats['max']:.1f}s"
+            + (f"; {stats['images_per_minute']:.1f} images/min." if "images_per_minute" in stats else ".")
+            + f" Sent {stats['bytes_sent'] / 1024:.0f} KB of {stats['bytes_original'] / 1024:.0f} KB uploaded."
+            + (f" {stats['cache_hits']} served from cache." if stats.get("cache_hits") else ""),
+            "",
+            "| # | Image | Tiles | Sent (KB) | Latency (s) | Status |",
+            "|---|-------|-------|-----------|-------------|--------|"
+        ]
+        for result in sorted(results, key=lambda r: r["index"]):
+            status = "❌ " + result["error"].replace("|", "\\|") if result["error"] else \
+                ("⚡ cached" if result.get("cached") else "✅")
+            lines.append(
+                f"| {result['index'] + 1} | {result['name']} | {result['tiles']} | "
+                f"{result['bytes_sent'] / 1024:.0f} | {result['latency']:.2f} | {status} |"
+            )
+        lines.append("")
+
+    for result in sorted(results, key=lambda r: r["index"]):
+        lines += ["---", "", f"## {result['index'] + 1}. {result['name']}", ""]
+        lines.append(f"*Error: {result['error']}*" if result["error"] else result["text"])
+        lines.append("")
+    return "\n".join(lines)
+
+
+def build_zip_export(results: List[Dict], stats: Dict) -> bytes:
+    """ZIP with one Markdown file per image, the combined report and a latency CSV."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for result in sorted(results, key=lambda r: r["index"]):
+            if not result["error"]:
+                stem = result["name"].rsplit(".", 1)[0]
+                archive.writestr(f"pages/{result['index'] + 1:04d}_{stem}.md", result["text"])
+
+        archive.writestr("ocr_results.md", build_markdown_report(results, stats))
+
+        latency_csv = io.StringIO()
+        writer = csv.writer(latency_csv)
+        writer.writerow([
+            "index", "image", "tiles", "bytes_original", "bytes_sent",
+            "preprocess_seconds", "ocr_seconds", "latency_seconds", "cached", "error"
+        ])
+        for result in sorted(results, key=lambda r: r["index"]):
+            writer.writerow([
+                result["index"] + 1, result["name"], result["tiles"], result["bytes_original"],
+                result["bytes_sent"], f"{result['preprocess_seconds']:.3f}", f"{result['ocr_seconds']:.3f}",
+                f"{result['latency']:.3f}", int(result.get("cached", False)), result["error"] or ""
+            ])
+        archive.writestr("latency.csv", latency_csv.getvalue())
+    return buffer.getvalue()
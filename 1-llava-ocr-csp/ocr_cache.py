@@ -0,0 +1,108 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+CACHE_FILE = os.getenv("OCR_CACHE_FILE", ".ocr_cache/ocr_cache.db")
+CACHE_MAX_BYTES = int(os.getenv("OCR_CACHE_MAX_MB", "200")) * 1024 * 1024
+
+
+def content_key(image_bytes: bytes, prompt: str, model: str, variant: str = "") -> str:
+    """SHA-256 over everything that determines the OCR output for an upload."""
+    digest = hashlib.sha256()
+    for part in (model.encode("utf-8"), prompt.encode("utf-8"), variant.encode("utf-8")):
+        digest.update(len(part).to_bytes(8, "big"))
+        digest.update(part)
+    digest.update(image_bytes)
+    return digest.hexdigest()
+
+
+class OcrCache:
+    """Content-addressed OCR results on disk, LRU-evicted to a size cap, safe across processes."""
+
+    def __init__(self, path: str = CACHE_FILE, max_bytes: int = CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            # WAL lets several Streamlit sessions and the OCR service share the file
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS ocr_results (
+                    key TEXT PRIMARY KEY,
+                    text TEXT NOT NULL,
+                    ocr_seconds REAL NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_ocr_results_accessed ON ocr_results (accessed_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=10)
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Return {"text", "ocr_seconds"} for a cached result, refreshing its LRU position."""
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT text, ocr_seconds FROM ocr_results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            conn.execute("UPDATE ocr_results SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self.hits += 1
+            return {"text": row[0], "ocr_seconds": row[1]}
+
+    def set(self, key: str, text: str, ocr_seconds: float):
+        """Store a result and evict least recently used entries beyond the size cap."""
+        size = len(text.encode("utf-8"))
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO ocr_results (key, text, ocr_seconds, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, text, ocr_seconds, size, now, now)
+            )
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM ocr_results").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+
+            evicted = []
+            for old_key, old_size in conn.execute("SELECT key, size FROM ocr_results ORDER BY accessed_at"):
+                if total <= self.max_bytes:
+                    break
+                evicted.append((old_key,))
+                total -= old_size
+            conn.executemany("DELETE FROM ocr_results WHERE key = ?", evicted)
+
+    def stats(self) -> Dict:
+        with self._lock, self._connect() as conn:
+            entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM ocr_results").fetchone()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes
+        }
+
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_ocr_cache() -> OcrCache:
+    """Return the process-wide OCR cache."""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = OcrCache()
+        return _shared_cache
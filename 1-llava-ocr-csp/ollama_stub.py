@@ -0,0 +1,75 @@
+import asyncio
+import base64
+import json
+import os
+import time
+from datetime import datetime, timezone
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+# Simulated model timings; PARALLEL mirrors OLLAMA_NUM_PARALLEL on a real server
+PREFILL_SECONDS = float(os.getenv("STUB_PREFILL_SECONDS", "0.5"))
+TOKENS_PER_SECOND = float(os.getenv("STUB_TOKENS_PER_SECOND", "40"))
+OUTPUT_TOKENS = int(os.getenv("STUB_OUTPUT_TOKENS", "60"))
+PARALLEL = int(os.getenv("STUB_PARALLEL", "2"))
+
+app = FastAPI(title="Ollama chat stub")
+slots = asyncio.Semaphore(PARALLEL)
+
+
+def _tokens(image_size: int):
+    words = ["# Page", "\n\n", f"Image of {image_size} bytes.", "\n\n"]
+    words += [f"word{i} " for i in range(max(0, OUTPUT_TOKENS - len(words)))]
+    return words
+
+
+def _chunk(model: str, content: str, done: bool, **extra) -> dict:
+    return {
+        "model": model,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "message": {"role": "assistant", "content": content},
+        "done": done,
+        **extra
+    }
+
+
+@app.post("/api/chat")
+async def chat(request: Request):
+    """Answer like Ollama's /api/chat: one JSON object, or NDJSON chunks when streaming."""
+    body = await request.json()
+    model = body.get("model", "llava")
+    images = [image for message in body.get("messages", []) for image in message.get("images") or []]
+    image_size = sum(len(base64.b64decode(image)) for image in images)
+    tokens = _tokens(image_size)
+
+    async def generate():
+        start = time.perf_counter()
+        async with slots:
+            await asyncio.sleep(PREFILL_SECONDS)
+            eval_start = time.perf_counter()
+            for token in tokens:
+                await asyncio.sleep(1 / TOKENS_PER_SECOND)
+                yield token
+            timings = {
+                "done_reason": "stop",
+                "total_duration": int((time.perf_counter() - start) * 1e9),
+                "prompt_eval_count": 600,
+                "eval_count": len(tokens),
+                "eval_duration": int((time.perf_counter() - eval_start) * 1e9)
+            }
+            yield timings
+
+    if body.get("stream", True):
+        async def stream():
+            async for part in generate():
+                if isinstance(part, dict):
+                    yield json.dumps(_chunk(model, "", True, **part)) + "\n"
+                else:
+                    yield json.dumps(_chunk(model, part, False)) + "\n"
+        return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+    parts = [part async for part in generate()]
+    return _chunk(model, "".join(parts[:-1]), True, **parts[-1])
+
+# Run with: uvicorn ollama_stub:app --port 11435
+# then point the app or service at it with OLLAMA_HOST=http://localhost:11435
@@ -0,0 +1,149 @@
+import io
+import time
+from typing import List, Optional
+from PIL import Image, ImageChops, ImageOps, ImageStat
+
+# LLaVA 1.6 tiles its input into 336px patches with at most 672x672 (or 1344x336)
+# worth of pixels; anything larger is downscaled by the encoder anyway
+MAX_PIXELS = 672 * 672
+MAX_SIDE = 1344
+TILE_ASPECT = 2.0  # Images taller than this many widths are split into tiles
+TILE_OVERLAP = 0.1  # Fraction of each tile repeated in the next so lines aren't cut
+GRAYSCALE_TOLERANCE = 6  # Mean channel difference below which a scan is treated as gray
+JPEG_QUALITY = 85
+LOW_COLOUR_LIMIT = 256  # Images with at most this many colours are also tried as PNG
+MODEL_FORMATS = ("JPEG", "PNG")  # Uploads in these formats can be sent unchanged
+
+
+class PreparedImage:
+    """An image decoded once, oriented, and re-encoded as one or more model-sized tiles."""
+
+    __slots__ = ('tiles', 'image', 'original_bytes', 'grayscale', 'preprocess_seconds')
+
+    def __init__(self, tiles: List[bytes], image: Optional[Image.Image], original_bytes: int,
+                 grayscale: bool, preprocess_seconds: float):
+        self.tiles = tiles
+        self.image = image
+        self.original_bytes = original_bytes
+        self.grayscale = grayscale
+        self.preprocess_seconds = preprocess_seconds
+
+    @property
+    def sent_bytes(self) -> int:
+        return sum(len(tile) for tile in self.tiles)
+
+
+def _is_grayscale(image: Image.Image) -> bool:
+    """Whether a colour image is really a gray scan (judged on a thumbnail)."""
+    if image.mode in ("L", "LA", "1"):
+        return True
+    thumb = image.convert("RGB")
+    thumb.thumbnail((64, 64))
+    red, green, blue = thumb.split()
+    differences = ImageStat.Stat(ImageChops.difference(red, green)).mean + \
+        ImageStat.Stat(ImageChops.difference(green, blue)).mean
+    return max(differences) < GRAYSCALE_TOLERANCE
+
+
+def _scale(width: int, height: int) -> float:
+    return min(1.0, MAX_SIDE / max(width, height), (MAX_PIXELS / (width * height)) ** 0.5)
+
+
+def _fit(image: Image.Image) -> Image.Image:
+    """Downscale to the model's effective input size; never upscale."""
+    width, height = image.size
+    scale = _scale(width, height)
+    if scale >= 1.0:
+        return image
+    return image.resize((max(1, int(width * scale)), max(1, int(height * scale))), Image.LANCZOS)
+
+
+def _flatten(image: Image.Image) -> Image.Image:
+    """Composite transparent areas onto white; a plain convert would turn them black."""
+    if image.mode == "P" and "transparency" in image.info:
+        image = image.convert("RGBA")
+    if image.mode not in ("RGBA", "LA"):
+        return image
+    background = Image.new(image.mode[:-1], image.size, "white")
+    background.paste(image, mask=image.getchannel("A"))
+    return background
+
+
+def _save(image: Image.Image, **options) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, **options)
+    return buffer.getvalue()
+
+
+def _encode(image: Image.Image) -> bytes:
+    """JPEG, or lossless PNG when that is smaller, as it usually is for text on a plain background."""
+    encoded = _save(image, format="JPEG", quality=JPEG_QUALITY, optimize=True)
+    if image.mode == "L" or image.getcolors(LOW_COLOUR_LIMIT) is not None:
+        png = image if image.mode == "L" else image.quantize(LOW_COLOUR_LIMIT)
+        encoded = min(encoded, _save(png, format="PNG", optimize=True), key=len)
+    return encoded
+
+
+def _tile_boxes(width: int, height: int) -> List[tuple]:
+    """Overlapping full-width crops, top to bottom, for documents much taller than wide."""
+    if height <= width * TILE_ASPECT:
+        return [(0, 0, width, height)]
+
+    tile_height = int(width * TILE_ASPECT)
+    step = int(tile_height * (1 - TILE_OVERLAP))
+    boxes = []
+    top = 0
+    while True:
+        bottom = min(height, top + tile_height)
+        boxes.append((0, top, width, bottom))
+        if bottom >= height:
+            return boxes
+        top += step
+
+
+def prepare_image(image_bytes: bytes, keep_image: bool = False) -> PreparedImage:
+    """Decode, auto-orient, tile, downscale, grayscale and re-encode an upload for OCR."""
+    start = time.perf_counter()
+    image = Image.open(io.BytesIO(image_bytes))
+    # The model ignores EXIF, so phone photos must be rotated upright in the pixels
+    oriented = image.getexif().get(0x0112, 1) == 1
+    # The model would see transparent areas as black, so those uploads are never sent as-is
+    sendable = image.format in MODEL_FORMATS and oriented and not (
+        image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+    )
+    image = _flatten(ImageOps.exif_transpose(image))
+
+    grayscale = _is_grayscale(image)
+    image = image.convert("L" if grayscale else "RGB")
+
+    tiles = [_encode(_fit(image.crop(box))) for box in _tile_boxes(*image.size)]
+
+    # An upright upload that is smaller than its re-encoding is sent as-is; the
+    # model's encoder downscales an oversized one itself
+    if sendable and len(tiles) == 1 and len(tiles[0]) >= len(image_bytes):
+        tiles = [image_bytes]
+
+    return PreparedImage(
+        tiles=tiles,
+        image=image if keep_image else None,
+        original_bytes=len(image_bytes),
+        grayscale=grayscale,
+        preprocess_seconds=time.perf_counter() - start
+    )
+
+
+def stitch_texts(texts: List[str], max_overlap_lines: int = 8) -> str:
+    """Join tile OCR in order, dropping lines repeated across the overlap between tiles."""
+    lines: List[str] = []
+    for text in texts:
+        tile_lines = text.strip().splitlines()
+        previous = [line.strip() for line in lines if line.strip()]
+        # Compare the tile's opening lines with the end of what is already stitched
+        for size in range(min(max_overlap_lines, len(previous), len(tile_lines)), 0, -1):
+            if previous[-size:] == [line.strip() for line in tile_lines[:size]]:
+                tile_lines = tile_lines[size:]
+                break
+        if lines and tile_lines:
+            lines.append("")
+        lines.extend(tile_lines)
+    return "\n".join(lines)
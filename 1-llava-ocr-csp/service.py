@@ -0,0 +1,171 @@
+import asyncio
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Dict
+from fastapi import FastAPI, File, HTTPException, Query, UploadFile
+from fastapi.responses import JSONResponse
+from ocr import ocr_image
+from ocr_cache import get_ocr_cache
+
+# Workers should match OLLAMA_NUM_PARALLEL so every dequeued job gets a model slot
+WORKERS = int(os.getenv("OCR_WORKERS", "2"))
+QUEUE_SIZE = int(os.getenv("OCR_QUEUE_SIZE", "16"))
+RETRY_AFTER_SECONDS = 2
+LATENCY_WINDOW = 1000  # Recent requests kept for percentiles
+
+
+class OcrJob:
+    """One accepted upload waiting for, or being served by, a worker."""
+
+    __slots__ = ('name', 'image_bytes', 'use_cache', 'future', 'enqueued_at')
+
+    def __init__(self, name: str, image_bytes: bytes, use_cache: bool, future: asyncio.Future):
+        self.name = name
+        self.image_bytes = image_bytes
+        self.use_cache = use_cache
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+
+
+class OcrService:
+    """Bounded queue drained by a fixed worker pool; full queue means reject, not wait."""
+
+    def __init__(self, workers: int = WORKERS, queue_size: int = QUEUE_SIZE):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.queue = None
+        self.executor = None
+        self.tasks = []
+        self.busy = 0
+        self.counters = {"accepted": 0, "rejected": 0, "completed": 0, "failed": 0, "cache_hits": 0}
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.queue_waits = deque(maxlen=LATENCY_WINDOW)
+        self.started_at = time.time()
+
+    async def start(self):
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ocr-worker")
+        self.tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        print(f"🚀 OCR service: {self.workers} workers, queue of {self.queue_size}")
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, name: str, image_bytes: bytes, use_cache: bool) -> OcrJob:
+        """Queue an upload, raising asyncio.QueueFull when the service is saturated."""
+        job = OcrJob(name, image_bytes, use_cache, asyncio.get_running_loop().create_future())
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.counters["rejected"] += 1
+            raise
+        self.counters["accepted"] += 1
+        return job
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        cache = get_ocr_cache()
+        while True:
+            job = await self.queue.get()
+            queue_seconds = time.perf_counter() - job.enqueued_at
+            self.busy += 1
+            try:
+                # One tile at a time per worker keeps requests in flight at WORKERS
+                result = await loop.run_in_executor(
+                    self.executor, ocr_image, job.image_bytes, None, 1, job.name,
+                    cache if job.use_cache else None
+                )
+            except Exception as e:
+                result = {"name": job.name, "error": str(e), "cached": False}
+            finally:
+                self.busy -= 1
+                self.queue.task_done()
+
+            result["queue_seconds"] = queue_seconds
+            result["total_seconds"] = time.perf_counter() - job.enqueued_at
+            self._record(result)
+            if not job.future.done():
+                job.future.set_result(result)
+
+    def _record(self, result: Dict):
+        self.counters["failed" if result["error"] else "completed"] += 1
+        if result.get("cached"):
+            self.counters["cache_hits"] += 1
+        self.latencies.append(result["total_seconds"])
+        self.queue_waits.append(result["queue_seconds"])
+
+    def stats(self) -> Dict:
+        return {
+            "workers": self.workers,
+            "busy": self.busy,
+            "queued": self.queue.qsize() if self.queue else 0,
+            "queue_size": self.queue_size,
+            "uptime_seconds": time.time() - self.started_at,
+            **self.counters,
+            "latency": _percentiles(self.latencies),
+            "queue_wait": _percentiles(self.queue_waits)
+        }
+
+
+def _percentiles(values) -> Dict:
+    ordered = sorted(values)
+    if not ordered:
+        return {}
+
+    def pick(fraction):
+        return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+    return {"p50": pick(0.5), "p95": pick(0.95), "p99": pick(0.99), "max": ordered[-1]}
+
+
+service = OcrService()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await service.start()
+    yield
+    await service.stop()
+
+
+app = FastAPI(title="Llava OCR service", lifespan=lifespan)
+
+
+@app.post("/ocr")
+async def ocr(file: UploadFile = File(...), cache: bool = Query(True)):
+    """OCR one uploaded image; 429 with Retry-After when the queue is full."""
+    image_bytes = await file.read()
+    if not image_bytes:
+        raise HTTPException(status_code=400, detail="Empty upload")
+
+    try:
+        job = service.submit(file.filename or "image", image_bytes, cache)
+    except asyncio.QueueFull:
+        return JSONResponse(
+            status_code=429,
+            content={"detail": "OCR queue is full, retry later"},
+            headers={"Retry-After": str(RETRY_AFTER_SECONDS)}
+        )
+
+    result = await job.future
+    if result["error"]:
+        status = 400 if result["error"].startswith("Could not read image") else 502
+        return JSONResponse(status_code=status, content=result)
+    return result
+
+
+@app.get("/stats")
+async def stats():
+    return service.stats()
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok", "queued": service.queue.qsize(), "busy": service.busy}
+
+# Run with: uvicorn service:app --port 8000
@@ -1,17 +1,17 @@
 import os
 import gc
-import tempfile
 import uuid
 import pandas as pd
 from typing import Optional, Dict, Any
 import logging
 
 from gitingest import ingest
-from llama_index.core import Settings, PromptTemplate, VectorStoreIndex, SimpleDirectoryReader
-from llama_index.core.node_parser import MarkdownNodeParser
+from llama_index.core import Settings, PromptTemplate, VectorStoreIndex
 import streamlit as st
 from dotenv import load_dotenv
 
+import index_store
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -59,18 +59,42 @@ def process_with_gitingets(github_url: str) -> tuple:
         logger.error(f"Error processing repository: {str(e)}")
         raise GitHubRAGError(f"Failed to process repository: {str(e)}")
 
-def create_query_engine(content_path: str, repo_name: str) -> Any:
+def fetch_repo_files(github_url: str) -> Dict[str, str]:
+    """Ingest the repository and split the digest into one section per file"""
+    summary, tree, content = process_with_gitingets(github_url)
+    files = index_store.split_digest(content)
+    # Fall back to a single document if the digest format isn't recognised
+    return files or {"digest.md": content}
+
+@st.cache_data(ttl=60, show_spinner=False)
+def resolve_commit(repo_url: str) -> Optional[str]:
+    """Current commit of the repository, rechecked at most once a minute"""
+    return index_store.resolve_commit(repo_url)
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def get_repo_index(repo_url: str, commit: str) -> tuple:
+    """Index for one commit, loaded from disk or updated from the last indexed commit, shared by every session"""
+    try:
+        return index_store.open_or_build(repo_url, commit, lambda: fetch_repo_files(repo_url))
+    except GitHubRAGError:
+        raise
+    except Exception as e:
+        logger.error(f"Error building index: {str(e)}")
+        raise GitHubRAGError(f"Failed to build index: {str(e)}")
+
+def describe_index_stats(stats: Dict[str, Any]) -> str:
+    """One-line summary of how much embedding work loading the index took"""
+    if stats.get("loaded"):
+        return f"Loaded saved index ({stats['embeddings_reused']} embeddings)."
+    summary = (f"Reused {stats['embeddings_reused']} embeddings, computed {stats['embeddings_computed']}")
+    if stats.get("base_commit"):
+        summary += (f" ({stats['files_added']} added, {stats['files_modified']} modified, "
+                    f"{stats['files_deleted']} deleted files since {stats['base_commit'][:7]})")
+    return summary + "."
+
+def create_query_engine(index: VectorStoreIndex) -> Any:
     """Create and configure query engine"""
     try:
-        loader = SimpleDirectoryReader(input_dir=content_path)
-        docs = loader.load_data()
-        node_parser = MarkdownNodeParser()
-        index = VectorStoreIndex.from_documents(
-            documents=docs, 
-            transformations=[node_parser], 
-            show_progress=True
-        )
-
         qa_prompt_tmpl_str = """
         You are an AI assistant specialized in analyzing GitHub repositories.
 
@@ -126,35 +150,39 @@ with st.sidebar:
                 st.error("Please enter a valid GitHub repository URL")
                 st.stop()
 
-            repo_name = get_repo_name(github_url)
-            file_key = f"{session_id}-{repo_name}"
+            repo_url = index_store.normalize_repo_url(github_url)
+            repo_name = get_repo_name(repo_url)
+            commit = resolve_commit(repo_url)
+            # Indexes are shared across sessions and processes, keyed by repository and commit
+            file_key = f"{repo_url}@{commit}" if commit else f"{session_id}-{repo_url}"
+            st.session_state.repo_key = file_key
             
             if file_key not in st.session_state.file_cache:
                 with st.spinner("Processing your repository..."):
-                    with tempfile.TemporaryDirectory() as temp_dir:
-                        try:
-                            summary, tree, content = process_with_gitingets(github_url)
-                            
-                            # Write content to temporary file
-                            content_path = os.path.join(temp_dir, f"{repo_name}_content.md")
-                            with open(content_path, "w", encoding="utf-8") as f:
-                                f.write(content)
-                            
-                            # Create and cache query engine
-                            query_engine = create_query_engine(temp_dir, repo_name)
-                            st.session_state.file_cache[file_key] = query_engine
-                            
-                            st.success("Repository loaded successfully! Ready to chat.")
-                            logger.info(f"Successfully processed repository: {repo_name}")
-                            
-                        except GitHubRAGError as e:
-                            st.error(str(e))
-                            logger.error(f"Error processing repository {repo_name}: {str(e)}")
-                            st.stop()
-                        except Exception as e:
-                            st.error("An unexpected error occurred while processing the repository")
-                            logger.error(f"Unexpected error: {str(e)}")
-                            st.stop()
+                    try:
+                        # Without a commit SHA there is nothing safe to share, so build privately
+                        if commit:
+                            index, stats = get_repo_index(repo_url, commit)
+                        else:
+                            index, stats = index_store.open_or_build(repo_url, None, lambda: fetch_repo_files(repo_url))
+                        
+                        # Create and cache query engine
+                        query_engine = create_query_engine(index)
+                        st.session_state.file_cache[file_key] = query_engine
+                        
+                        st.success("Repository loaded successfully! Ready to chat.")
+                        st.caption(describe_index_stats(stats))
+                        logger.info(f"Successfully loaded repository: {repo_name}"
+                                    + (f" at {commit[:12]}" if commit else ""))
+                        
+                    except GitHubRAGError as e:
+                        st.error(str(e))
+                        logger.error(f"Error processing repository {repo_name}: {str(e)}")
+                        st.stop()
+                    except Exception as e:
+                        st.error("An unexpected error occurred while processing the repository")
+                        logger.error(f"Unexpected error: {str(e)}")
+                        st.stop()
             else:
                 st.info("Repository already loaded. Ready to chat!")
                 
@@ -193,9 +221,7 @@ if prompt := st.chat_input("What's up?"):
             full_response = ""
             
             try:
-                repo_name = get_repo_name(github_url)
-                file_key = f"{session_id}-{repo_name}"
-                query_engine = st.session_state.file_cache.get(file_key)
+                query_engine = st.session_state.file_cache.get(st.session_state.get("repo_key"))
                 
                 if query_engine is None:
                     raise GitHubRAGError("Please load a repository first!")
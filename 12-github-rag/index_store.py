@@ -0,0 +1,324 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import subprocess
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from llama_index.core import Document, Settings, StorageContext, VectorStoreIndex, load_index_from_storage
+from llama_index.core.node_parser import MarkdownNodeParser
+
+try:
+    import fcntl
+except ImportError:  # Windows: builds are still atomic, just not deduplicated across processes
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+INDEX_DIR = os.getenv(
+    "GITHUB_RAG_INDEX_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".rag_indexes")
+)
+INDEX_VERSION = "2"  # Bump when chunking changes so old indexes aren't reused
+LS_REMOTE_TIMEOUT = 15
+META_FILE = "repo_meta.json"
+HASHES_FILE = "file_hashes.json"
+KEEP_COMMITS = 3  # Indexed commits kept per repository; older ones are pruned
+SCRATCH_DIR = ".scratch"  # Per repository; builds in progress, never listed as commits
+SCRATCH_MAX_AGE = 24 * 3600  # Leftovers of crashed builds older than this are removed
+
+# gitingest separates files with "FILE: path" (older releases: "File: path") between rules of "="
+_FILE_HEADER = re.compile(r"^={48}\n(?:FILE|File|SYMLINK): (.+?)(?: -> .*)?\n={48}\n", re.MULTILINE)
+
+_GITHUB_URL = re.compile(
+    r"^(?:https?://)?(?:www\.)?github\.com/([^/\s]+)/([^/\s#?]+)(/tree/[^\s#?]+)?", re.IGNORECASE
+)
+_SHA = re.compile(r"^[0-9a-f]{40}$")
+
+
+def normalize_repo_url(url: str) -> str:
+    """Canonical repository URL, so equivalent spellings share one index."""
+    match = _GITHUB_URL.match(url.strip())
+    if not match:
+        raise ValueError(f"Not a GitHub repository URL: {url}")
+    owner, repo, tree = match.groups()
+    if repo.lower().endswith(".git"):
+        repo = repo[:-4]
+    # Owner and repository names are case-insensitive on GitHub; branch and paths are not
+    return f"https://github.com/{owner.lower()}/{repo.lower()}" + (tree.rstrip("/") if tree else "")
+
+
+def resolve_commit(repo_url: str) -> Optional[str]:
+    """Commit SHA the URL currently points at, via `git ls-remote` (no clone needed)."""
+    base, _, tree = repo_url.partition("/tree/")
+    ref = tree.split("/", 1)[0] if tree else "HEAD"
+    if _SHA.match(ref):
+        return ref
+    try:
+        output = subprocess.run(
+            ["git", "ls-remote", base, ref],
+            capture_output=True, text=True, timeout=LS_REMOTE_TIMEOUT, check=True
+        ).stdout
+    except (OSError, subprocess.SubprocessError) as e:
+        logger.warning(f"Could not resolve commit for {repo_url}: {str(e)}")
+        return None
+    refs = dict(reversed(line.split("\t", 1)) for line in output.splitlines() if "\t" in line)
+    # Annotated tags list the tag object first; the peeled ^{} entry is the commit
+    for name in (ref, f"refs/heads/{ref}", f"refs/tags/{ref}^{{}}", f"refs/tags/{ref}"):
+        if name in refs:
+            return refs[name]
+    return None
+
+
+def _embed_model_name() -> str:
+    embed_model = Settings.embed_model
+    return getattr(embed_model, "model_name", None) or type(embed_model).__name__
+
+
+def split_digest(content: str) -> Dict[str, str]:
+    """Break a gitingest digest into {path: section}, each section keeping its file header."""
+    headers = list(_FILE_HEADER.finditer(content))
+    ends = [match.start() for match in headers[1:]] + [len(content)]
+    return {
+        match.group(1): content[match.start():end].rstrip() + "\n"
+        for match, end in zip(headers, ends)
+    }
+
+
+def hash_files(files: Dict[str, str]) -> Dict[str, str]:
+    return {path: hashlib.sha256(text.encode("utf-8")).hexdigest() for path, text in files.items()}
+
+
+def _nodes_for(files: Dict[str, str], paths) -> list:
+    """Chunk the given files; node ref_doc_id is the file path, so a file can be replaced later."""
+    documents = [Document(text=files[path], id_=path, metadata={"file_path": path}) for path in sorted(paths)]
+    return MarkdownNodeParser().get_nodes_from_documents(documents)
+
+
+def repo_dir(repo_url: str) -> str:
+    """Directory holding every indexed commit of a repository for the current embedding model."""
+    identity = f"{repo_url}|{_embed_model_name()}|{INDEX_VERSION}"
+    return os.path.join(INDEX_DIR, hashlib.sha256(identity.encode("utf-8")).hexdigest()[:16])
+
+
+def index_path(repo_url: str, commit: str) -> str:
+    return os.path.join(repo_dir(repo_url), commit)
+
+
+def load_index(path: str) -> Optional[Any]:
+    if not os.path.exists(os.path.join(path, META_FILE)):
+        return None
+    try:
+        return load_index_from_storage(StorageContext.from_defaults(persist_dir=path))
+    except Exception as e:
+        logger.error(f"Discarding unreadable index at {path}: {str(e)}")
+        shutil.rmtree(path, ignore_errors=True)
+        return None
+
+
+def _read_json(path: str) -> Optional[dict]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _indexed_commits(repo_url: str) -> list:
+    """(created_at, path) of every complete index for the repository, newest first."""
+    directory = repo_dir(repo_url)
+    if not os.path.isdir(directory):
+        return []
+    commits = []
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if name.startswith(".") or not os.path.isdir(path):
+            continue
+        meta = _read_json(os.path.join(path, META_FILE))
+        if meta and os.path.exists(os.path.join(path, HASHES_FILE)):
+            commits.append((meta.get("created_at", 0), path))
+    return sorted(commits, reverse=True)
+
+
+def _write_json(path: str, data: dict):
+    """Write then rename, so the file is either complete or absent."""
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(temp_path, path)
+
+
+def save_index(index: Any, path: str, meta: dict, file_hashes: Dict[str, str]):
+    """Persist to a scratch directory and rename it into place, so readers never see half an index.
+
+    Scratch directories live outside the commit listing, and META is written last,
+    so neither a crashed build nor a partly written one is taken for an indexed commit.
+    """
+    scratch_root = os.path.join(os.path.dirname(path), SCRATCH_DIR)
+    os.makedirs(scratch_root, exist_ok=True)
+    scratch = os.path.join(scratch_root, f"{os.path.basename(path)}-{uuid.uuid4().hex}")
+    index.storage_context.persist(persist_dir=scratch)
+    _write_json(os.path.join(scratch, HASHES_FILE), file_hashes)
+    _write_json(os.path.join(scratch, META_FILE), {**meta, "created_at": time.time()})
+    try:
+        os.rename(scratch, path)
+    except OSError:
+        # Another process finished the same commit first; theirs is equivalent
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+def _prune(repo_url: str):
+    for _, path in _indexed_commits(repo_url)[KEEP_COMMITS:]:
+        with _try_lock(path) as locked:
+            # A process holding the lock is building or waiting on this commit; leave it
+            if locked:
+                shutil.rmtree(path, ignore_errors=True)
+
+    scratch_root = os.path.join(repo_dir(repo_url), SCRATCH_DIR)
+    if os.path.isdir(scratch_root):
+        for name in os.listdir(scratch_root):
+            scratch = os.path.join(scratch_root, name)
+            try:
+                stale = time.time() - os.path.getmtime(scratch) > SCRATCH_MAX_AGE
+            except OSError:
+                continue
+            if stale:
+                shutil.rmtree(scratch, ignore_errors=True)
+
+
+def _is_current(lock_file, lock_path: str) -> bool:
+    """Whether the locked file is still the one at lock_path, rather than one _prune removed."""
+    try:
+        return os.fstat(lock_file.fileno()).st_ino == os.stat(lock_path).st_ino
+    except FileNotFoundError:
+        return False
+
+
+@contextmanager
+def _try_lock(path: str):
+    """Take a commit's build lock without waiting; yields whether it was acquired.
+
+    On success the lock file is removed while still held; _build_lock notices when
+    the file it waited on was removed and locks the new one instead.
+    """
+    if fcntl is None:
+        yield True
+        return
+    lock_path = f"{path}.lock"
+    with open(lock_path, "a") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            yield False
+            return
+        if not _is_current(lock_file, lock_path):
+            yield False
+            return
+        try:
+            yield True
+            os.remove(lock_path)
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+@contextmanager
+def _build_lock(path: str):
+    """Serialize builds of one commit across processes, so a repo is only embedded once."""
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    lock_path = f"{path}.lock"
+    while True:
+        lock_file = open(lock_path, "a")
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        # _prune may have removed the file while we waited; that lock guards nothing
+        if _is_current(lock_file, lock_path):
+            break
+        lock_file.close()
+    try:
+        yield
+    finally:
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+        lock_file.close()
+
+
+def _embedding_count(index: Any) -> int:
+    return len(index.index_struct.nodes_dict)
+
+
+def build_index(files: Dict[str, str]) -> Tuple[Any, dict]:
+    """Embed every file from scratch."""
+    nodes = _nodes_for(files, files)
+    index = VectorStoreIndex(nodes=nodes, show_progress=True)
+    return index, {"files_added": len(files), "files_modified": 0, "files_deleted": 0,
+                   "files_unchanged": 0, "embeddings_reused": 0, "embeddings_computed": len(nodes)}
+
+
+def update_index(index: Any, old_hashes: Dict[str, str], files: Dict[str, str],
+                 new_hashes: Dict[str, str]) -> dict:
+    """Re-embed only added or modified files and drop deleted ones; returns what was reused."""
+    added = [path for path in new_hashes if path not in old_hashes]
+    modified = [path for path in new_hashes if path in old_hashes and old_hashes[path] != new_hashes[path]]
+    deleted = [path for path in old_hashes if path not in new_hashes]
+
+    for path in modified + deleted:
+        index.delete_ref_doc(path, delete_from_docstore=True)
+    kept = _embedding_count(index)
+
+    nodes = _nodes_for(files, added + modified)
+    if nodes:
+        index.insert_nodes(nodes)
+    return {"files_added": len(added), "files_modified": len(modified), "files_deleted": len(deleted),
+            "files_unchanged": len(new_hashes) - len(added) - len(modified),
+            "embeddings_reused": kept, "embeddings_computed": len(nodes)}
+
+
+def open_or_build(repo_url: str, commit: Optional[str],
+                  fetch_files: Callable[[], Dict[str, str]]) -> Tuple[Any, dict]:
+    """Index for (repo, commit) and stats on how it was obtained.
+
+    A commit that is already on disk is just loaded. Otherwise the newest indexed
+    commit of the same repository is used as a base, and only files whose content
+    hash changed are re-chunked and re-embedded. Without a commit SHA there is
+    nothing safe to key on, so the index is built in memory only.
+    """
+    if commit is None:
+        return build_index(fetch_files())
+
+    path = index_path(repo_url, commit)
+    index = load_index(path)
+    if index is not None:
+        logger.info(f"Loaded persisted index for {repo_url}@{commit[:12]}")
+        return index, {"loaded": True, "embeddings_reused": _embedding_count(index), "embeddings_computed": 0}
+
+    with _build_lock(path):
+        # Another process may have finished this commit while we waited
+        index = load_index(path)
+        if index is not None:
+            return index, {"loaded": True, "embeddings_reused": _embedding_count(index), "embeddings_computed": 0}
+
+        start = time.perf_counter()
+        files = fetch_files()
+        hashes = hash_files(files)
+        index = stats = None
+        for _, base_path in _indexed_commits(repo_url)[:1]:
+            base = load_index(base_path)
+            old_hashes = _read_json(os.path.join(base_path, HASHES_FILE))
+            if base is not None and old_hashes is not None:
+                index = base
+                stats = update_index(index, old_hashes, files, hashes)
+                stats["base_commit"] = os.path.basename(base_path)
+        if index is None:
+            index, stats = build_index(files)
+
+        save_index(index, path, {"repo_url": repo_url, "commit": commit}, hashes)
+        _prune(repo_url)
+        logger.info(f"Indexed {repo_url}@{commit[:12]} in {time.perf_counter() - start:.1f}s: "
+                    f"{stats['embeddings_reused']} embeddings reused, {stats['embeddings_computed']} computed")
+        return index, stats
@@ -0,0 +1,55 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+CACHE_FILE = os.getenv("VERIFIER_CACHE_FILE", ".verifier_cache/fields.db")
+
+
+class FieldCache:
+    """Fields read from each card image, keyed by content hash and shared across processes.
+
+    Only what the model read is cached; the verdict is re-evaluated on every lookup so a
+    card that was valid yesterday can expire today.
+    """
+
+    def __init__(self, path: str = CACHE_FILE):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS card_fields (
+                    key TEXT PRIMARY KEY,
+                    template TEXT NOT NULL,
+                    fields TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=10)
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT template, fields FROM card_fields WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return {"template": row[0], "fields": json.loads(row[1])}
+
+    def set(self, key: str, template: str, fields: Dict):
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO card_fields (key, template, fields, created_at) VALUES (?, ?, ?, ?)",
+                (key, template, json.dumps(fields), time.time())
+            )
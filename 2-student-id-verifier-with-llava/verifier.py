@@ -0,0 +1,223 @@
+import calendar
+import hashlib
+import io
+import json
+import os
+import re
+import time
+from dataclasses import dataclass
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+import ollama
+from PIL import Image, ImageChops, ImageDraw, ImageOps, ImageStat
+from verdict_cache import FieldCache
+
+MODEL_NAME = "llava"
+TEMPLATES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates.json")
+CARD_WIDTH = 856  # Cards are normalized to 10 px per mm of an ID-1 card's width
+TEXT_FIELDS = ("name", "id_number", "expiry")
+BACKGROUND_TOLERANCE = 40  # Gray-level difference from the border that counts as card
+MIN_CARD_FRACTION = 0.2  # Smaller detections are noise; the whole photo is used instead
+PHOTO_MIN_STDDEV = 20  # A blank or missing photo area is nearly flat
+LABEL_WIDTH = 120
+JPEG_QUALITY = 90
+
+EXTRACT_PROMPT = """The image shows fields cropped from a student ID card, one per row,
+each labelled on the left. Read the text of every field exactly as printed.
+Respond with JSON only: {"name": "...", "id_number": "...", "expiry": "..."}.
+Use an empty string for a field you cannot read."""
+
+
+@dataclass(frozen=True)
+class CardTemplate:
+    """A card layout: its aspect ratio and field regions as fractions of the card."""
+    name: str
+    aspect: float
+    id_pattern: str
+    expiry_formats: Tuple[str, ...]
+    regions: Tuple[Tuple[str, Tuple[float, float, float, float]], ...]
+
+    def size(self) -> Tuple[int, int]:
+        if self.aspect >= 1:
+            return CARD_WIDTH, round(CARD_WIDTH / self.aspect)
+        return round(CARD_WIDTH * self.aspect), CARD_WIDTH
+
+
+@lru_cache(maxsize=None)
+def load_templates(path: str = TEMPLATES_FILE) -> Dict[str, CardTemplate]:
+    with open(path, encoding="utf-8") as f:
+        raw = json.load(f)
+    return {
+        name: CardTemplate(
+            name=name,
+            aspect=spec["aspect"],
+            id_pattern=spec["id_pattern"],
+            expiry_formats=tuple(spec["expiry_formats"]),
+            regions=tuple((field, tuple(box)) for field, box in spec["regions"].items())
+        )
+        for name, spec in raw.items()
+    }
+
+
+@lru_cache(maxsize=None)
+def region_boxes(template: CardTemplate) -> Dict[str, Tuple[int, int, int, int]]:
+    """Pixel boxes on the normalized card, worked out once per template."""
+    width, height = template.size()
+    return {
+        field: (round(left * width), round(top * height), round(right * width), round(bottom * height))
+        for field, (left, top, right, bottom) in template.regions
+    }
+
+
+@lru_cache(maxsize=None)
+def _templates_version(path: str = TEMPLATES_FILE) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def cache_key(image_bytes: bytes, template_name: Optional[str], model: str = MODEL_NAME) -> str:
+    digest = hashlib.sha256()
+    digest.update(f"{model}|{template_name or 'auto'}|{_templates_version()}|{EXTRACT_PROMPT}|".encode("utf-8"))
+    digest.update(image_bytes)
+    return digest.hexdigest()
+
+
+def detect_card(image: Image.Image) -> Image.Image:
+    """Crop the card from a photo by separating it from the background around the border."""
+    gray = ImageOps.grayscale(image)
+    width, height = gray.size
+    border = [gray.getpixel((x, y)) for x in (0, width - 1) for y in range(0, height, max(1, height // 20))]
+    background = sorted(border)[len(border) // 2]
+
+    mask = ImageChops.difference(gray, Image.new("L", gray.size, background))
+    mask = mask.point(lambda value: 255 if value > BACKGROUND_TOLERANCE else 0)
+    box = mask.getbbox()
+    if box is None:
+        return image
+    left, top, right, bottom = box
+    if (right - left) * (bottom - top) < MIN_CARD_FRACTION * width * height:
+        return image
+    return image.crop(box)
+
+
+def match_template(card: Image.Image, templates: Dict[str, CardTemplate]) -> CardTemplate:
+    aspect = card.width / card.height
+    return min(templates.values(), key=lambda template: abs(template.aspect - aspect))
+
+
+def crop_fields(card: Image.Image, template: CardTemplate) -> Dict[str, Image.Image]:
+    normalized = card.resize(template.size(), Image.LANCZOS)
+    return {field: normalized.crop(box) for field, box in region_boxes(template).items()}
+
+
+def build_field_strip(crops: Dict[str, Image.Image]) -> bytes:
+    """Stack the labelled text crops into one small image, so each card is a single request."""
+    rows = [(field, crops[field]) for field in TEXT_FIELDS if field in crops]
+    width = LABEL_WIDTH + max(crop.width for _, crop in rows)
+    strip = Image.new("RGB", (width, sum(crop.height for _, crop in rows)), "white")
+    draw = ImageDraw.Draw(strip)
+    top = 0
+    for field, crop in rows:
+        draw.text((8, top + crop.height // 2 - 6), field.replace("_", " ").upper(), fill="black")
+        strip.paste(crop.convert("RGB"), (LABEL_WIDTH, top))
+        top += crop.height
+    buffer = io.BytesIO()
+    strip.save(buffer, format="JPEG", quality=JPEG_QUALITY)
+    return buffer.getvalue()
+
+
+def photo_present(crop: Image.Image) -> bool:
+    """Checked locally: a printed portrait has far more contrast than an empty area."""
+    return ImageStat.Stat(ImageOps.grayscale(crop)).stddev[0] >= PHOTO_MIN_STDDEV
+
+
+def extract_fields(strip_bytes: bytes, model: str = MODEL_NAME) -> Dict[str, str]:
+    response = ollama.chat(
+        model=model,
+        format="json",
+        messages=[{
+            'role': 'user',
+            'content': EXTRACT_PROMPT,
+            'images': [strip_bytes]
+        }]
+    )
+    try:
+        parsed = json.loads(response.message.content)
+    except json.JSONDecodeError:
+        parsed = {}
+    return {field: str(parsed.get(field) or "").strip() for field in TEXT_FIELDS}
+
+
+def parse_expiry(text: str, formats: Tuple[str, ...]) -> Optional[date]:
+    for fmt in formats:
+        try:
+            parsed = datetime.strptime(text.strip(), fmt).date()
+        except ValueError:
+            continue
+        # Month-only expiries run to the end of that month
+        if "%d" not in fmt:
+            parsed = parsed.replace(day=calendar.monthrange(parsed.year, parsed.month)[1])
+        return parsed
+    return None
+
+
+def evaluate(fields: Dict, template: CardTemplate, today: Optional[date] = None) -> Tuple[str, List[str]]:
+    """Turn extracted fields into a verdict and the reasons behind it."""
+    today = today or date.today()
+    reasons = []
+    if not fields.get("photo"):
+        reasons.append("no photo")
+    if not fields.get("name"):
+        reasons.append("name unreadable")
+    if not re.match(template.id_pattern, fields.get("id_number", "").replace(" ", "").upper()):
+        reasons.append("ID number missing or malformed")
+    expiry = parse_expiry(fields.get("expiry", ""), template.expiry_formats)
+    if expiry is None:
+        reasons.append("expiry unreadable")
+    elif expiry < today:
+        reasons.append(f"expired on {expiry.isoformat()}")
+
+    if not reasons:
+        return "valid", reasons
+    if not any(fields.get(field) for field in TEXT_FIELDS):
+        return "unreadable", reasons
+    return "invalid", reasons
+
+
+def verify_card(image_bytes: bytes, template_name: Optional[str] = None,
+                cache: Optional[FieldCache] = None, model: str = MODEL_NAME) -> Dict:
+    """Verify one card photo; the model only ever sees the small text crops."""
+    start = time.perf_counter()
+    templates = load_templates()
+    key = cache_key(image_bytes, template_name, model)
+
+    entry = cache.get(key) if cache is not None else None
+    cached = entry is not None
+    try:
+        if cached:
+            template = templates[entry["template"]]
+            fields = entry["fields"]
+        else:
+            image = ImageOps.exif_transpose(Image.open(io.BytesIO(image_bytes))).convert("RGB")
+            card = detect_card(image)
+            template = templates[template_name] if template_name else match_template(card, templates)
+            crops = crop_fields(card, template)
+            fields = extract_fields(build_field_strip(crops), model)
+            fields["photo"] = photo_present(crops["photo"]) if "photo" in crops else False
+            # A reply with nothing readable is more likely a model hiccup than the card
+            if cache is not None and any(fields[field] for field in TEXT_FIELDS):
+                cache.set(key, template.name, fields)
+    except Exception as e:
+        return {"verdict": "error", "reasons": [str(e)], "fields": {}, "template": template_name,
+                "cached": cached, "seconds": time.perf_counter() - start}
+
+    verdict, reasons = evaluate(fields, template)
+    return {
+        "verdict": verdict,
+        "reasons": reasons,
+        "fields": fields,
+        "template": template.name,
+        "cached": cached,
+        "seconds": time.perf_counter() - start
+    }
@@ -0,0 +1,103 @@
+import argparse
+import csv
+import glob
+import json
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List
+from verdict_cache import FieldCache
+from verifier import MODEL_NAME, load_templates, verify_card
+
+DEFAULT_CONCURRENCY = 2  # Match OLLAMA_NUM_PARALLEL on the server
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+
+
+def find_images(patterns: List[str]) -> List[str]:
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, "**", "*")
+        paths.extend(path for path in glob.glob(pattern, recursive=True)
+                     if path.lower().endswith(IMAGE_EXTENSIONS))
+    return sorted(set(paths))
+
+
+def verify_file(path: str, template: str, cache: FieldCache, model: str) -> Dict:
+    with open(path, "rb") as f:
+        result = verify_card(f.read(), template, cache, model)
+    result["path"] = path
+    return result
+
+
+def write_report(results: List[Dict], output: str):
+    if output.endswith(".jsonl"):
+        with open(output, "w", encoding="utf-8") as f:
+            for result in results:
+                f.write(json.dumps(result, ensure_ascii=False) + "\n")
+        return
+
+    with open(output, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["path", "verdict", "name", "id_number", "expiry", "photo",
+                         "template", "cached", "seconds", "reasons"])
+        for result in results:
+            fields = result["fields"]
+            writer.writerow([
+                result["path"], result["verdict"], fields.get("name", ""), fields.get("id_number", ""),
+                fields.get("expiry", ""), fields.get("photo", ""), result["template"] or "",
+                int(result["cached"]), f"{result['seconds']:.3f}", "; ".join(result["reasons"])
+            ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify a batch of student ID card photos")
+    parser.add_argument("images", nargs="+", help="Image files, globs or directories")
+    parser.add_argument("--template", choices=sorted(load_templates()), help="Card layout (default: by shape)")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help="Cards verified at once; set OLLAMA_NUM_PARALLEL to match")
+    parser.add_argument("--model", default=MODEL_NAME)
+    parser.add_argument("--output", default="verdicts.csv", help="Report file (.csv or .jsonl)")
+    parser.add_argument("--no-cache", action="store_true", help="Re-read every card with the model")
+    args = parser.parse_args()
+
+    paths = find_images(args.images)
+    if not paths:
+        print("❌ No images found")
+        sys.exit(1)
+
+    cache = None if args.no_cache else FieldCache()
+    print(f"🪪 Verifying {len(paths)} cards with {args.concurrency} concurrent requests")
+
+    results = []
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as executor:
+        futures = [executor.submit(verify_file, path, args.template, cache, args.model) for path in paths]
+        for number, future in enumerate(as_completed(futures), 1):
+            results.append(future.result())
+            if number % 50 == 0 or number == len(paths):
+                elapsed = time.perf_counter() - start
+                print(f"   {number}/{len(paths)} cards, {number / elapsed:.2f} cards/s")
+    elapsed = time.perf_counter() - start
+
+    results.sort(key=lambda result: result["path"])
+    write_report(results, args.output)
+
+    verdicts = {}
+    for result in results:
+        verdicts[result["verdict"]] = verdicts.get(result["verdict"], 0) + 1
+    fresh = [result["seconds"] for result in results if not result["cached"]]
+    cached = len(results) - len(fresh)
+
+    print(f"\n📝 Wrote {args.output}")
+    print("📊 " + ", ".join(f"{verdict}: {count}" for verdict, count in sorted(verdicts.items())))
+    print(f"⏱️  {elapsed:.1f}s, {len(results) / elapsed:.2f} cards/s ({len(results) / elapsed * 3600:.0f}/hour)"
+          + (f", {cached} from cache" if cached else ""))
+    if fresh:
+        print(f"🔎 {len(fresh)} cards read by the model, mean {statistics.mean(fresh):.2f}s each")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+import argparse
+import hashlib
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Iterator, Optional
+import ollama
+import pypdfium2 as pdfium
+
+MODEL_NAME = "gemma3"
+DEFAULT_DPI = 150
+DEFAULT_CONCURRENCY = 2  # Match OLLAMA_NUM_PARALLEL on the server
+MAX_CONCURRENCY = 8
+READ_AHEAD = 2  # Pages rendered per request slot; bounds memory when an early page is slow
+MAX_ATTEMPTS = 2
+JPEG_QUALITY = 90
+
+OCR_PROMPT = """Transcribe all text on this scanned document page into clean Markdown.
+Preserve headings, lists, tables and reading order. Output only the page content,
+without commentary and without wrapping it in a code block."""
+
+
+def fingerprint(path: str, dpi: int, model: str) -> str:
+    """Identity of a run: the PDF's bytes plus everything that changes the OCR output."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    digest.update(f"{dpi}|{model}|{OCR_PROMPT}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class PageJournal:
+    """Append-only JSON Lines record of finished pages, so a rerun after a crash skips them."""
+
+    def __init__(self, path: str, run_id: str):
+        self.path = path
+        self.run_id = run_id
+        self.done: Dict[int, Dict] = {}
+
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                content = f.read()
+            # Only whole lines count; a torn last line is cut off before appending to it
+            complete = content.rfind(b"\n") + 1
+            lines = content[:complete].decode("utf-8", errors="replace").splitlines()
+            header = self._parse(lines[0]) if lines else None
+            if header and header.get("run_id") == run_id:
+                for line in lines[1:]:
+                    page = self._parse(line)
+                    if page:
+                        self.done[page["page"]] = page
+                print(f"♻️  Resuming: {len(self.done)} pages already done")
+                self._file = open(path, "r+", encoding="utf-8")
+                self._file.truncate(complete)
+                self._file.seek(0, os.SEEK_END)
+                return
+            print("🆕 Journal belongs to a different PDF or settings, starting over")
+
+        self._file = open(path, "w", encoding="utf-8")
+        self._write({"run_id": run_id})
+
+    @staticmethod
+    def _parse(line: str) -> Optional[Dict]:
+        # A damaged line is skipped and that page is simply redone
+        try:
+            return json.loads(line)
+        except json.JSONDecodeError:
+            return None
+
+    def _write(self, entry: Dict):
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def record(self, page: Dict):
+        self.done[page["page"]] = page
+        self._write({"page": page["page"], "text": page["text"], "seconds": page["seconds"]})
+
+    def close(self):
+        self._file.close()
+
+
+def render_page(document: pdfium.PdfDocument, page_number: int, dpi: int) -> bytes:
+    """Rasterize a single page to JPEG; only this page is held in memory."""
+    page = document[page_number - 1]
+    try:
+        image = page.render(scale=dpi / 72).to_pil().convert("RGB")
+    finally:
+        page.close()
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=JPEG_QUALITY)
+    return buffer.getvalue()
+
+
+def _strip_fences(text: str) -> str:
+    lines = text.strip().splitlines()
+    if len(lines) >= 2 and lines[0].startswith("```") and lines[-1].strip() == "```":
+        lines = lines[1:-1]
+    return "\n".join(lines).strip()
+
+
+def ocr_page(page_number: int, image_bytes: bytes, model: str = MODEL_NAME) -> Dict:
+    """OCR one rendered page, retrying once; errors are returned, not raised."""
+    start = time.perf_counter()
+    error = None
+    for attempt in range(MAX_ATTEMPTS):
+        try:
+            response = ollama.chat(
+                model=model,
+                messages=[{
+                    'role': 'user',
+                    'content': OCR_PROMPT,
+                    'images': [image_bytes]
+                }]
+            )
+            return {
+                "page": page_number,
+                "text": _strip_fences(response.message.content),
+                "error": None,
+                "seconds": time.perf_counter() - start,
+                "resumed": False
+            }
+        except Exception as e:
+            error = str(e)
+    return {"page": page_number, "text": "", "error": error,
+            "seconds": time.perf_counter() - start, "resumed": False}
+
+
+def ocr_pdf(path: str, dpi: int = DEFAULT_DPI, concurrency: int = DEFAULT_CONCURRENCY,
+            model: str = MODEL_NAME, journal: Optional[PageJournal] = None) -> Iterator[Dict]:
+    """Yield one result per page, in page order, as soon as every earlier page is finished.
+
+    Pages are rendered one at a time, just ahead of the request pool, so memory stays
+    bounded by the read-ahead window rather than the document size. Pages already in
+    the journal are emitted from it without being rendered.
+    """
+    concurrency = max(1, min(concurrency, MAX_CONCURRENCY))
+    window = concurrency * READ_AHEAD
+    done = journal.done if journal else {}
+
+    document = pdfium.PdfDocument(path)
+    try:
+        total = len(document)
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            in_flight = {}  # future -> page number
+            ready = {}  # finished pages waiting for an earlier page
+            next_render = 1
+            next_emit = 1
+
+            while next_emit <= total:
+                # PDFium isn't thread-safe, so rendering stays on this thread
+                while next_render <= total and len(in_flight) + len(ready) < window:
+                    if next_render not in done:
+                        image_bytes = render_page(document, next_render, dpi)
+                        in_flight[pool.submit(ocr_page, next_render, image_bytes, model)] = next_render
+                    next_render += 1
+
+                while next_emit <= total and (next_emit in ready or next_emit in done):
+                    if next_emit in ready:
+                        yield ready.pop(next_emit)
+                    else:
+                        yield {**done[next_emit], "error": None, "resumed": True}
+                    next_emit += 1
+
+                if in_flight:
+                    finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        del in_flight[future]
+                        result = future.result()
+                        if journal and not result["error"]:
+                            journal.record(result)
+                        ready[result["page"]] = result
+    finally:
+        document.close()
+
+
+def page_count(path: str) -> int:
+    document = pdfium.PdfDocument(path)
+    try:
+        return len(document)
+    finally:
+        document.close()
+
+
+def format_page(result: Dict) -> str:
+    header = f"<!-- Page {result['page']} -->"
+    if result["error"]:
+        return f"{header}\n\n*Page {result['page']} could not be read: {result['error']}*\n"
+    return f"{header}\n\n{result['text']}\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OCR a scanned PDF to Markdown with gemma3")
+    parser.add_argument("pdf", help="PDF file to OCR")
+    parser.add_argument("-o", "--output", help="Markdown output (default: next to the PDF)")
+    parser.add_argument("--dpi", type=int, default=DEFAULT_DPI, help="Rasterization resolution")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help="Pages OCR'd at once; set OLLAMA_NUM_PARALLEL to match")
+    parser.add_argument("--model", default=MODEL_NAME)
+    parser.add_argument("--restart", action="store_true", help="Ignore pages finished by an earlier run")
+    args = parser.parse_args()
+
+    output = args.output or os.path.splitext(args.pdf)[0] + ".md"
+    journal_path = output + ".journal.jsonl"
+    if args.restart and os.path.exists(journal_path):
+        os.remove(journal_path)
+
+    total = page_count(args.pdf)
+    print(f"📄 {args.pdf}: {total} pages at {args.dpi} DPI, {args.concurrency} concurrent requests")
+    journal = PageJournal(journal_path, fingerprint(args.pdf, args.dpi, args.model))
+
+    start = time.perf_counter()
+    failed = resumed = 0
+    try:
+        # The Markdown is rewritten in page order on every run, so it's always a clean prefix
+        with open(output, "w", encoding="utf-8") as out:
+            for result in ocr_pdf(args.pdf, args.dpi, args.concurrency, args.model, journal):
+                out.write(("\n---\n\n" if result["page"] > 1 else "") + format_page(result))
+                out.flush()
+                failed += bool(result["error"])
+                resumed += result["resumed"]
+                status = "♻️ " if result["resumed"] else "❌" if result["error"] else "✅"
+                print(f"{status} Page {result['page']}/{total} ({result['seconds']:.1f}s)")
+    finally:
+        journal.close()
+
+    elapsed = time.perf_counter() - start
+    fresh = total - resumed
+    print(f"\n📝 Wrote {output}")
+    print(f"⏱️  {elapsed:.1f}s for {fresh} new pages"
+          + (f" ({fresh / elapsed * 60:.1f} pages/min)" if fresh and elapsed else "")
+          + (f", {resumed} resumed" if resumed else ""))
+    if failed:
+        print(f"⚠️  {failed} pages failed; run the same command again to retry only those")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()